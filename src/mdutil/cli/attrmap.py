@@ -0,0 +1,117 @@
+from pathlib import Path
+from typing import Tuple
+
+import click
+
+from mdutil.core import (
+    AttributeField,
+    AttributeMapBuilder,
+    CompressionError,
+    PropertyError,
+    TiledMapError,
+    TileLayerError,
+    TilesetError,
+)
+
+from .utils import debug_exceptions
+
+
+def parse_field(ctx, param, values: Tuple[str]) -> Tuple[AttributeField]:
+    fields = []
+    for value in values:
+        name, _, bits = value.partition(":")
+        try:
+            fields.append(AttributeField(name, int(bits) if bits else 1))
+        except ValueError:
+            raise click.BadParameter(
+                f"Invalid field '{value}'. Expected 'property_name:bits'."
+            )
+
+        if not name or fields[-1].bits < 1:
+            raise click.BadParameter(
+                f"Invalid field '{value}'. Expected 'property_name:bits'."
+            )
+
+    return tuple(fields)
+
+
+@click.command()
+@click.argument(
+    "tiled_file_path", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument(
+    "output_folder", type=click.Path(exists=False, dir_okay=True, path_type=Path)
+)
+@click.option(
+    "--layer",
+    "-l",
+    multiple=True,
+    required=True,
+    help="Tile layer to export. Can be repeated.",
+)
+@click.option(
+    "--field",
+    "-p",
+    multiple=True,
+    required=True,
+    callback=parse_field,
+    help="Numeric tile property packed in each cell in the format 'name:bits', "
+    "e.g. 'solid:1'. Can be repeated, the first field takes the lowest bits.",
+)
+@click.option(
+    "--format",
+    "-f",
+    "output_format",
+    type=click.Choice(["bin", "c"]),
+    default="bin",
+    show_default=True,
+    help="Raw big endian binary or a C array with its header.",
+)
+@click.option(
+    "--compression",
+    "-c",
+    type=click.Choice(["none", "aplib", "best"]),
+    default="none",
+    show_default=True,
+    help="Compression of the bin format, 'best' keeps the smallest output. "
+    "Compressed files take the suffix of their codec.",
+)
+@click.pass_context
+@debug_exceptions
+def attrmap(
+    ctx,
+    tiled_file_path: Path,
+    output_folder: Path,
+    layer: Tuple[str],
+    field: Tuple[AttributeField],
+    output_format: str,
+    compression: str,
+):
+    """
+    Generate collision and attribute maps from the tile properties of a tiled file
+
+    TILED_FILE_PATH: Path to the input tiled file in json or tmx format\n
+    OUTPUT_FOLDER: Path to the output folder
+    """
+    try:
+        output_folder.mkdir(parents=True, exist_ok=True)
+        builder = AttributeMapBuilder(tiled_file_path)
+
+        for layer_name in layer:
+            output_path = output_folder / f"{tiled_file_path.stem}_{layer_name}"
+            for saved, written in builder.save(
+                output_path, layer_name, field, output_format, compression
+            ):
+                if written:
+                    click.echo(click.style(f"Saved '{saved}'.", fg="green"))
+                else:
+                    click.echo(f"Unchanged '{saved}'.")
+
+    except CompressionError as e:
+        raise click.ClickException(f"Compression error: {str(e)}")
+    except PropertyError as e:
+        raise click.ClickException(f"Property error: {str(e)}")
+    except TiledMapError as e:
+        raise click.ClickException(f"Tiled map error: {str(e)}")
+    except (TileLayerError, TilesetError) as e:
+        raise click.ClickException(f"Tile layer error: {str(e)}")
@@ -0,0 +1,76 @@
+from pathlib import Path
+from typing import Optional, Tuple
+
+import click
+
+from mdutil.core import MapChecker, find_maps
+
+from .genmap import validate_layer_id
+from .params import ParameterPair
+from .utils import debug_exceptions
+
+
+@click.command()
+@click.argument(
+    "paths",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "--layer",
+    "-l",
+    type=ParameterPair(value_types=(str, str), validator=validate_layer_id),
+    multiple=True,
+    help="Plane layers every map must define, in the same format used by genmap.",
+)
+@click.option(
+    "--debug-images",
+    type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
+    default=None,
+    help="Folder where debug images highlighting bad tiles are written.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of worker processes. Defaults to the number of CPUs.",
+)
+@click.pass_context
+@debug_exceptions
+def check(
+    ctx,
+    paths: Tuple[Path],
+    layer: ParameterPair,
+    debug_images: Optional[Path],
+    jobs: Optional[int],
+):
+    """
+    Validate tiled maps and their tilesets without rendering them
+
+    PATHS: Tiled files or folders searched recursively for tmx and tmj files
+    """
+    required_layers = []
+    for _, lo, hi in layer:
+        required_layers.extend(name for name in (lo, hi) if name != "_")
+
+    maps = find_maps(paths)
+    checker = MapChecker(required_layers, debug_images, jobs)
+    findings = checker.check(maps)
+
+    for finding in findings:
+        click.echo(click.style(str(finding), fg="red"), err=True)
+
+    summary = (
+        f"Checked {checker.checked_maps} maps and {checker.checked_tilesets} tilesets: "
+        f"{len(findings)} problems found."
+    )
+
+    if findings:
+        click.echo(click.style(summary, fg="red"), err=True)
+        if debug_images is not None:
+            click.echo(f"Debug images for bad tilesets written to '{debug_images}'.")
+        ctx.exit(1)
+
+    click.echo(click.style(summary, fg="green"))
@@ -0,0 +1,65 @@
+from pathlib import Path
+from typing import Optional, Tuple
+
+import click
+
+from mdutil.core import CompressionError
+from mdutil.core.compression import save_compressed
+
+from .utils import debug_exceptions
+
+
+@click.command()
+@click.argument(
+    "paths",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "--codec",
+    "-c",
+    type=click.Choice(["none", "aplib", "best"]),
+    default="best",
+    show_default=True,
+    help="Compression format, 'best' tries every codec and keeps the smallest output.",
+)
+@click.option(
+    "--output-folder",
+    "-o",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Folder of the compressed files, next to the inputs by default.",
+)
+@click.pass_context
+@debug_exceptions
+def compress(ctx, paths: Tuple[Path], codec: str, output_folder: Optional[Path]):
+    """
+    Compress binary files with the formats SGDK unpacks at runtime
+
+    Compressed files take the suffix of their codec: .apl for aPLib and .bin for
+    uncompressed data.
+
+    PATHS: Binary files to compress
+    """
+    try:
+        if output_folder is not None:
+            output_folder.mkdir(parents=True, exist_ok=True)
+
+        for path in paths:
+            data = path.read_bytes()
+            folder = path.parent if output_folder is None else output_folder
+            saved, used, written = save_compressed(
+                folder / path.stem, data, codec, source=path
+            )
+
+            summary = f"{used.name}, {len(data)} -> {saved.stat().st_size} bytes"
+            if written:
+                click.echo(click.style(f"Saved '{saved}' ({summary}).", fg="green"))
+            else:
+                click.echo(f"Unchanged '{saved}' ({summary}).")
+
+    except OSError as e:
+        raise click.ClickException(f"Can't compress file: {str(e)}")
+    except CompressionError as e:
+        raise click.ClickException(f"Compression error: {str(e)}")
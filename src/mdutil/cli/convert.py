@@ -0,0 +1,93 @@
+from pathlib import Path
+from typing import Optional, Tuple
+
+import click
+
+from mdutil.core import MapConverter, TiledMapError, TileLayerError, find_maps
+from mdutil.core.tmx.writer import COMPRESSIONS, ENCODINGS, TileDataEncoder
+
+from .utils import debug_exceptions
+
+
+@click.command()
+@click.argument(
+    "paths",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "--format",
+    "-f",
+    "map_format",
+    type=click.Choice(["tmx", "tmj"]),
+    default=None,
+    help="Output format. Maps keep their format by default.",
+)
+@click.option(
+    "--encoding",
+    "-e",
+    type=click.Choice(ENCODINGS),
+    default="base64",
+    show_default=True,
+    help="Tile layer encoding.",
+)
+@click.option(
+    "--compression",
+    "-c",
+    type=click.Choice(("none",) + COMPRESSIONS),
+    default="zstd",
+    show_default=True,
+    help="Tile layer compression for base64 encoded layers.",
+)
+@click.option(
+    "--level",
+    type=int,
+    default=None,
+    help="Compression level. Defaults to the codec default.",
+)
+@click.option(
+    "--threads",
+    "-t",
+    type=click.IntRange(min=-1),
+    default=-1,
+    show_default=True,
+    help="Zstd compression threads. -1 uses all the CPUs, 0 disables threading.",
+)
+@click.pass_context
+@debug_exceptions
+def convert(
+    ctx,
+    paths: Tuple[Path],
+    map_format: Optional[str],
+    encoding: str,
+    compression: str,
+    level: Optional[int],
+    threads: int,
+):
+    """
+    Rewrite tiled maps in another format or tile layer encoding
+
+    Converted maps are written next to the original ones. Maps that keep their
+    format are replaced.
+
+    PATHS: Tiled files or folders searched recursively for tmx and tmj files
+    """
+    if encoding == "csv":
+        compression = "none"
+
+    try:
+        encoder = TileDataEncoder(
+            encoding, None if compression == "none" else compression, level, threads
+        )
+        converter = MapConverter(encoder)
+
+        for src in find_maps(paths):
+            dst = src.with_suffix(f".{map_format}") if map_format else src
+            converter.convert(src, dst)
+            click.echo(click.style(f"Converted '{src}' to '{dst}'.", fg="green"))
+
+    except TiledMapError as e:
+        raise click.ClickException(f"Tiled map error: {str(e)}")
+    except TileLayerError as e:
+        raise click.ClickException(f"Tile layer error: {str(e)}")
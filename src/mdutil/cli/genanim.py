@@ -0,0 +1,124 @@
+from pathlib import Path
+from typing import Tuple
+
+import click
+
+from mdutil.core import (
+    MapBuilderError,
+    PaletteError,
+    TileAnimationBuilder,
+    TiledMapError,
+    TileLayerError,
+    TilesetError,
+)
+from mdutil.core.animation import NTSC_FPS, PAL_FPS
+
+from .utils import debug_exceptions
+
+
+@click.command()
+@click.argument(
+    "tiled_file_path", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument(
+    "output_folder", type=click.Path(exists=False, dir_okay=True, path_type=Path)
+)
+@click.option(
+    "--layer",
+    "-l",
+    multiple=True,
+    help="Tile layer whose animated tiles are exported. Defaults to all tile layers.",
+)
+@click.option(
+    "--tile-base",
+    type=click.IntRange(min=0, max=0x7FF),
+    default=0,
+    show_default=True,
+    help="VRAM tile index of the first tile of the first tileset.",
+)
+@click.option(
+    "--pal",
+    is_flag=True,
+    default=False,
+    help=f"Convert frame durations at {PAL_FPS} vblanks per second instead of "
+    f"{NTSC_FPS}.",
+)
+@click.option(
+    "--budget",
+    type=click.IntRange(min=32),
+    default=4096,
+    show_default=True,
+    help="Bytes of tile data uploaded at most in a vblank.",
+)
+@click.option(
+    "--max-period",
+    type=click.IntRange(min=1),
+    default=3600,
+    show_default=True,
+    help="Longest animation cycle in vblanks.",
+)
+@click.option(
+    "--format",
+    "-f",
+    "output_format",
+    type=click.Choice(["bin", "c"]),
+    default="bin",
+    show_default=True,
+    help="Raw big endian binary or C arrays with their headers.",
+)
+@click.pass_context
+@debug_exceptions
+def genanim(
+    ctx,
+    tiled_file_path: Path,
+    output_folder: Path,
+    layer: Tuple[str],
+    tile_base: int,
+    pal: bool,
+    budget: int,
+    max_period: int,
+    output_format: str,
+):
+    """
+    Generate the frame tables and VRAM upload schedule of animated tiles
+
+    Every animated tile placed in the map gets a frame table, and the tile changes
+    of all animations are merged into the DMA transfers of every vblank of a cycle.
+
+    TILED_FILE_PATH: Path to the input tiled file in json or tmx format\n
+    OUTPUT_FOLDER: Path to the output folder
+    """
+    try:
+        output_folder.mkdir(parents=True, exist_ok=True)
+
+        builder = TileAnimationBuilder(
+            tiled_file_path,
+            tile_base,
+            PAL_FPS if pal else NTSC_FPS,
+            budget,
+            max_period,
+        )
+        saved, schedule = builder.save(
+            output_folder / tiled_file_path.stem, layer or None, output_format
+        )
+
+        for path, written in saved:
+            if written:
+                click.echo(click.style(f"Saved '{path}'.", fg="green"))
+            else:
+                click.echo(f"Unchanged '{path}'.")
+
+        click.echo(
+            f"{len(schedule.transfers)} transfers every {schedule.period} vblanks, "
+            f"up to {schedule.peak_tiles} tiles in a vblank and "
+            f"{schedule.max_delay} vblanks late."
+        )
+
+    except MapBuilderError as e:
+        raise click.ClickException(f"Map build error: {str(e)}")
+    except PaletteError as e:
+        raise click.ClickException(f"Palette error: {str(e)}")
+    except TiledMapError as e:
+        raise click.ClickException(f"Tiled map error: {str(e)}")
+    except (TileLayerError, TilesetError) as e:
+        raise click.ClickException(f"Tileset error: {str(e)}")
@@ -1,14 +1,17 @@
 from pathlib import Path
+from typing import Optional
 
 import click
 
 from mdutil.core import (
     MapBuilderError,
     MapImageBuilder,
+    PaletteError,
     PropertyError,
     TiledMapError,
     TileLayerError,
     TilesetError,
+    create_writer,
 )
 
 from .params import ParameterPair
@@ -36,6 +39,28 @@ def validate_layer_id(id_: str, lo: str, hi: str):
     multiple=True,
     help="Plane to export in the format 'bg[a,b]=lo_prio_layer_name,hi_prio_layer_name'. Use '_' for excluding a layer from the export.",
 )
+@click.option(
+    "--format",
+    "-f",
+    "image_format",
+    type=click.Choice(["png", "bin", "npy"]),
+    default="png",
+    show_default=True,
+    help="Image format: png, raw color indexes or numpy arrays.",
+)
+@click.option(
+    "--png-level",
+    type=click.IntRange(min=0, max=9),
+    default=6,
+    show_default=True,
+    help="Zlib compression level of png images.",
+)
+@click.option(
+    "--png-filter",
+    type=click.Choice(["none", "sub", "up", "average", "paeth", "adaptive"]),
+    default=None,
+    help="Row filter of png images. Defaults to none for indexed images.",
+)
 @click.pass_context
 @debug_exceptions
 def genmap(
@@ -43,6 +68,9 @@ def genmap(
     tiled_file_path: Path,
     output_folder: Path,
     layer: ParameterPair,
+    image_format: str,
+    png_level: int,
+    png_filter: Optional[str],
 ):
     """
     Generate a (pair) png file that can be used as a SGDK MAP resource from a tiled file
@@ -56,22 +84,28 @@ def genmap(
         output_path = output_folder / tiled_file_path.stem
 
         builder = MapImageBuilder(tiled_file_path)
+        writer = create_writer(image_format, png_level, png_filter)
 
         for id_val, lo, hi in layer:
             lo_layer = lo if lo != "_" else None
             hi_layer = hi if hi != "_" else None
 
             if id_val == "bgb":
-                output = f"{output_path}_BGB.png"
+                output = f"{output_path}_BGB{writer.suffix}"
             elif id_val == "bga":
-                output = f"{output_path}_BGA.png"
+                output = f"{output_path}_BGA{writer.suffix}"
 
-            builder.save(output, lo_layer, hi_layer)
+            if builder.save(output, lo_layer, hi_layer, writer):
+                click.echo(click.style(f"Saved '{output}'.", fg="green"))
+            else:
+                click.echo(f"Unchanged '{output}'.")
 
     except click.UsageError as e:
         raise click.UsageError(str(e))
     except MapBuilderError as e:
         raise click.ClickException(f"Map build error: {str(e)}")
+    except PaletteError as e:
+        raise click.ClickException(f"Palette error: {str(e)}")
     except PropertyError as e:
         raise click.ClickException(f"Property error: {str(e)}")
     except TilesetError as e:
@@ -0,0 +1,106 @@
+from pathlib import Path
+from typing import Optional
+
+import click
+
+from mdutil.core import (
+    MapBuilderError,
+    PaletteError,
+    PlaneStreamBuilder,
+    TiledMapError,
+    TileLayerError,
+    TilesetError,
+)
+from mdutil.core.util import Size
+
+from .genmap import validate_layer_id
+from .genworld import parse_size
+from .params import ParameterPair
+from .utils import debug_exceptions
+
+
+@click.command()
+@click.argument(
+    "tiled_file_path", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument(
+    "output_folder", type=click.Path(exists=False, dir_okay=True, path_type=Path)
+)
+@click.option(
+    "--layer",
+    "-l",
+    type=ParameterPair(value_types=(str, str), validator=validate_layer_id),
+    multiple=True,
+    help="Plane to export in the format 'bg[a,b]=lo_prio_layer_name,hi_prio_layer_name'. Use '_' for excluding a layer from the export.",
+)
+@click.option(
+    "--plane",
+    callback=parse_size,
+    default="64x32",
+    show_default=True,
+    help="Size of the VDP plane in tiles in the format 'WIDTHxHEIGHT'.",
+)
+@click.option(
+    "--tile-base",
+    type=click.IntRange(min=0, max=0x7FF),
+    default=0,
+    show_default=True,
+    help="VRAM tile index of the first tile of the first tileset.",
+)
+@click.option(
+    "--format",
+    "-f",
+    "output_format",
+    type=click.Choice(["bin", "c"]),
+    default="bin",
+    show_default=True,
+    help="Raw big endian binary or C arrays with their headers.",
+)
+@click.pass_context
+@debug_exceptions
+def genstream(
+    ctx,
+    tiled_file_path: Path,
+    output_folder: Path,
+    layer: ParameterPair,
+    plane: Optional[Size],
+    tile_base: int,
+    output_format: str,
+):
+    """
+    Generate the column and row strips to stream a large map into a plane
+
+    Every plane gets its tilemap words as column and row strips, the DMA segments
+    that upload every strip wrapped around the plane and an index of the segments
+    of every strip.
+
+    TILED_FILE_PATH: Path to the input tiled file in json or tmx format\n
+    OUTPUT_FOLDER: Path to the output folder
+    """
+    try:
+        output_folder.mkdir(parents=True, exist_ok=True)
+        output_path = output_folder / tiled_file_path.stem
+
+        builder = PlaneStreamBuilder(tiled_file_path, plane, tile_base)
+
+        for id_val, lo, hi in layer:
+            lo_layer = lo if lo != "_" else None
+            hi_layer = hi if hi != "_" else None
+
+            output = Path(f"{output_path}_{id_val.upper()}")
+            for saved, written in builder.save(
+                output, lo_layer, hi_layer, output_format
+            ):
+                if written:
+                    click.echo(click.style(f"Saved '{saved}'.", fg="green"))
+                else:
+                    click.echo(f"Unchanged '{saved}'.")
+
+    except MapBuilderError as e:
+        raise click.ClickException(f"Map build error: {str(e)}")
+    except PaletteError as e:
+        raise click.ClickException(f"Palette error: {str(e)}")
+    except TiledMapError as e:
+        raise click.ClickException(f"Tiled map error: {str(e)}")
+    except (TileLayerError, TilesetError) as e:
+        raise click.ClickException(f"Tileset error: {str(e)}")
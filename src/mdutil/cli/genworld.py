@@ -0,0 +1,147 @@
+from pathlib import Path
+from typing import Optional
+
+import click
+
+from mdutil.core import (
+    MapBuilderError,
+    PaletteError,
+    PropertyError,
+    TiledMapError,
+    TileLayerError,
+    TilesetError,
+    WorldImageBuilder,
+    create_writer,
+)
+from mdutil.core.util import Size
+
+from .genmap import validate_layer_id
+from .params import ParameterPair
+from .utils import debug_exceptions
+
+
+def parse_size(ctx, param, value: Optional[str]) -> Optional[Size]:
+    if value is None:
+        return None
+
+    width, _, height = value.partition("x")
+    try:
+        size = Size(int(height), int(width))
+    except ValueError:
+        raise click.BadParameter(f"Invalid size '{value}'. Expected 'WIDTHxHEIGHT'.")
+
+    if size.width < 1 or size.height < 1:
+        raise click.BadParameter(f"Invalid size '{value}'. Expected 'WIDTHxHEIGHT'.")
+
+    return size
+
+
+@click.command()
+@click.argument(
+    "world_file_path", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument(
+    "output_folder", type=click.Path(exists=False, dir_okay=True, path_type=Path)
+)
+@click.option(
+    "--layer",
+    "-l",
+    type=ParameterPair(value_types=(str, str), validator=validate_layer_id),
+    multiple=True,
+    help="Plane to export in the format 'bg[a,b]=lo_prio_layer_name,hi_prio_layer_name'. Use '_' for excluding a layer from the export.",
+)
+@click.option(
+    "--split",
+    callback=parse_size,
+    default=None,
+    help="Split every plane into images of 'WIDTHxHEIGHT' pixels.",
+)
+@click.option(
+    "--memmap",
+    is_flag=True,
+    default=False,
+    help="Stitch into memory mapped npy files kept in the output folder.",
+)
+@click.option(
+    "--format",
+    "-f",
+    "image_format",
+    type=click.Choice(["png", "bin", "npy"]),
+    default="png",
+    show_default=True,
+    help="Image format: png, raw color indexes or numpy arrays.",
+)
+@click.option(
+    "--png-level",
+    type=click.IntRange(min=0, max=9),
+    default=6,
+    show_default=True,
+    help="Zlib compression level of png images.",
+)
+@click.option(
+    "--png-filter",
+    type=click.Choice(["none", "sub", "up", "average", "paeth", "adaptive"]),
+    default=None,
+    help="Row filter of png images. Defaults to none for indexed images.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of worker processes. Defaults to the number of CPUs.",
+)
+@click.pass_context
+@debug_exceptions
+def genworld(
+    ctx,
+    world_file_path: Path,
+    output_folder: Path,
+    layer: ParameterPair,
+    split: Optional[Size],
+    memmap: bool,
+    image_format: str,
+    png_level: int,
+    png_filter: Optional[str],
+    jobs: Optional[int],
+):
+    """
+    Generate the planes of a tiled world by stitching all of its maps
+
+    WORLD_FILE_PATH: Path to the tiled world file\n
+    OUTPUT_FOLDER: Path to the output folder
+    """
+    try:
+        output_folder.mkdir(parents=True, exist_ok=True)
+        output_path = output_folder / world_file_path.stem
+
+        builder = WorldImageBuilder(world_file_path, jobs)
+        writer = create_writer(image_format, png_level, png_filter, jobs)
+
+        for id_val, lo, hi in layer:
+            lo_layer = lo if lo != "_" else None
+            hi_layer = hi if hi != "_" else None
+
+            output = Path(f"{output_path}_{id_val.upper()}{writer.suffix}")
+            # The stitching buffer can't take the name of an npy output
+            buffer_suffix = ".buffer.npy" if writer.suffix == ".npy" else ".npy"
+            buffer_path = output.with_suffix(buffer_suffix) if memmap else None
+
+            for saved, written in builder.save(
+                output, lo_layer, hi_layer, split, buffer_path, writer
+            ):
+                if written:
+                    click.echo(click.style(f"Saved '{saved}'.", fg="green"))
+                else:
+                    click.echo(f"Unchanged '{saved}'.")
+
+    except MapBuilderError as e:
+        raise click.ClickException(f"Map build error: {str(e)}")
+    except PaletteError as e:
+        raise click.ClickException(f"Palette error: {str(e)}")
+    except PropertyError as e:
+        raise click.ClickException(f"Property error: {str(e)}")
+    except TiledMapError as e:
+        raise click.ClickException(f"Tiled map error: {str(e)}")
+    except (TileLayerError, TilesetError) as e:
+        raise click.ClickException(f"Tileset error: {str(e)}")
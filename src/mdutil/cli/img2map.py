@@ -0,0 +1,79 @@
+from pathlib import Path
+
+import click
+
+from mdutil.core import ImageMapConverter, TiledMapError, TilesetError
+from mdutil.core.util import Size
+
+from .utils import debug_exceptions
+
+
+@click.command()
+@click.argument(
+    "input_path", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument(
+    "output_path", type=click.Path(exists=False, dir_okay=False, path_type=Path)
+)
+@click.option("--tile-width", type=click.IntRange(min=1), default=8, show_default=True)
+@click.option("--tile-height", type=click.IntRange(min=1), default=8, show_default=True)
+@click.option(
+    "--flips/--no-flips",
+    default=True,
+    show_default=True,
+    help="Reuse the tile of a flipped copy of a tile.",
+)
+@click.option(
+    "--columns",
+    type=click.IntRange(min=1),
+    default=16,
+    show_default=True,
+    help="Number of tile columns of the tileset image.",
+)
+@click.option(
+    "--layer-name",
+    default="lo",
+    show_default=True,
+    help="Name of the tile layer of the map.",
+)
+@click.pass_context
+@debug_exceptions
+def img2map(
+    ctx,
+    input_path: Path,
+    output_path: Path,
+    tile_width: int,
+    tile_height: int,
+    flips: bool,
+    columns: int,
+    layer_name: str,
+):
+    """
+    Convert an indexed image into a deduplicated tileset and a tiled map
+
+    The map is written in tmx or tmj format depending on the output suffix, with its
+    tile layer encoded as zstd compressed base64. The tileset image is saved next to
+    it with the suffix _tileset.
+
+    INPUT_PATH: Path to the indexed png image\n
+    OUTPUT_PATH: Path to the output tmx or tmj file
+    """
+    try:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        converter = ImageMapConverter(
+            Size(tile_height, tile_width), flips, columns, layer_name
+        )
+        saved, image_tiles = converter.convert(input_path, output_path)
+
+        for path, written in saved:
+            if written:
+                click.echo(click.style(f"Saved '{path}'.", fg="green"))
+            else:
+                click.echo(f"Unchanged '{path}'.")
+
+        click.echo(f"{image_tiles.cells} cells, {len(image_tiles.tiles)} unique tiles.")
+
+    except TiledMapError as e:
+        raise click.ClickException(f"Tiled map error: {str(e)}")
+    except TilesetError as e:
+        raise click.ClickException(f"Tileset error: {str(e)}")
@@ -0,0 +1,73 @@
+from pathlib import Path
+from typing import Tuple
+
+import click
+
+from mdutil.core import TiledMapError, TileLayerError, TilesetError, inspect_map
+
+from .utils import debug_exceptions
+
+
+@click.command()
+@click.argument(
+    "paths",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.pass_context
+@debug_exceptions
+def info(ctx, paths: Tuple[Path]):
+    """
+    Describe tiled maps and the tile usage of their layers, without loading any
+    tileset image
+
+    PATHS: Tiled files in json or tmx format
+    """
+    for path in paths:
+        try:
+            map_info = inspect_map(path)
+        except TiledMapError as e:
+            raise click.ClickException(f"Tiled map error: {str(e)}")
+        except (TileLayerError, TilesetError) as e:
+            raise click.ClickException(f"Tileset error: {str(e)}")
+
+        click.echo(click.style(str(map_info.path), bold=True))
+        click.echo(
+            f"  {map_info.width}x{map_info.height} tiles of "
+            f"{map_info.tile_size.width}x{map_info.tile_size.height} px"
+            + (", infinite" if map_info.infinite else "")
+        )
+
+        for tileset in map_info.tilesets:
+            click.echo(
+                f"  Tileset '{tileset.name}': gids {tileset.first_gid}-"
+                f"{tileset.last_gid}, {tileset.tile_size.width}x"
+                f"{tileset.tile_size.height} px tiles, image '{tileset.image}'"
+            )
+
+        for layer in map_info.layers:
+            if layer.type == "objectgroup":
+                click.echo(f"  Object layer '{layer.name}': {layer.objects} objects")
+                continue
+
+            encoding = layer.encoding
+            if layer.compression:
+                encoding += f"/{layer.compression}"
+            if layer.chunks:
+                encoding += f", {layer.chunks} chunks"
+            click.echo(
+                f"  Tile layer '{layer.name}': {layer.width}x{layer.height} "
+                f"({encoding}), {layer.cells} cells, {layer.empty_ratio:.1%} empty, "
+                f"{layer.used_tiles} distinct tiles"
+            )
+            for name, count in layer.tileset_tiles.items():
+                if count:
+                    click.echo(f"    {count} tiles from '{name}'")
+            if layer.unknown_cells:
+                click.echo(
+                    click.style(
+                        f"    {layer.unknown_cells} cells outside of every tileset",
+                        fg="yellow",
+                    )
+                )
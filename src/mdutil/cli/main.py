@@ -1,6 +1,19 @@
 import click
 
+from .attrmap import attrmap
+from .check import check
+from .compress import compress
+from .convert import convert
+from .genanim import genanim
 from .genmap import genmap
+from .genstream import genstream
+from .genworld import genworld
+from .img2map import img2map
+from .info import info
+from .metatile import metatile
+from .preview import preview
+from .quantize import quantize
+from .serve import serve
 from .version import version
 
 
@@ -16,7 +29,20 @@ def cli(ctx, debug):
 
 
 # Register commands
+cli.add_command(attrmap)
+cli.add_command(check)
+cli.add_command(compress)
+cli.add_command(convert)
+cli.add_command(genanim)
 cli.add_command(genmap)
+cli.add_command(genstream)
+cli.add_command(genworld)
+cli.add_command(img2map)
+cli.add_command(info)
+cli.add_command(metatile)
+cli.add_command(preview)
+cli.add_command(quantize)
+cli.add_command(serve)
 cli.add_command(version)
 
 if __name__ == "__main__":
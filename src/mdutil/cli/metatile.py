@@ -0,0 +1,135 @@
+from pathlib import Path
+from typing import Tuple
+
+import click
+
+from mdutil.core import (
+    CompressionError,
+    MapBuilderError,
+    MetatileBuilder,
+    PaletteError,
+    TiledMapError,
+    TileLayerError,
+    TilesetError,
+    TilesetImage,
+)
+
+from .utils import debug_exceptions
+
+
+@click.command()
+@click.argument(
+    "tiled_file_path", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument(
+    "output_folder", type=click.Path(exists=False, dir_okay=True, path_type=Path)
+)
+@click.option(
+    "--layer",
+    "-l",
+    multiple=True,
+    help="Tile layer exported with low priority. Can be repeated.",
+)
+@click.option(
+    "--hi-layer",
+    "-H",
+    multiple=True,
+    help="Tile layer exported with high priority. Can be repeated.",
+)
+@click.option(
+    "--size",
+    type=click.Choice(["2", "4"]),
+    default="2",
+    show_default=True,
+    help="Width and height of the metatiles in tiles.",
+)
+@click.option(
+    "--flips/--no-flips",
+    default=True,
+    show_default=True,
+    help="Let blocks reuse the metatile of a flipped copy of them.",
+)
+@click.option(
+    "--tile-base",
+    type=click.IntRange(min=0, max=0x7FF),
+    default=0,
+    show_default=True,
+    help="VRAM tile index of the first tile of the first tileset.",
+)
+@click.option(
+    "--format",
+    "-f",
+    "output_format",
+    type=click.Choice(["bin", "c"]),
+    default="bin",
+    show_default=True,
+    help="Raw big endian binary or C arrays with their headers.",
+)
+@click.option(
+    "--compression",
+    "-c",
+    type=click.Choice(["none", "aplib", "best"]),
+    default="none",
+    show_default=True,
+    help="Compression of the bin format, 'best' keeps the smallest output. "
+    "Compressed files take the suffix of their codec.",
+)
+@click.pass_context
+@debug_exceptions
+def metatile(
+    ctx,
+    tiled_file_path: Path,
+    output_folder: Path,
+    layer: Tuple[str],
+    hi_layer: Tuple[str],
+    size: str,
+    flips: bool,
+    tile_base: int,
+    output_format: str,
+    compression: str,
+):
+    """
+    Compress tile layers into a dictionary of metatiles and block maps
+
+    All layers share the metatile dictionary, saved with the suffix _meta, and every
+    layer gets a block map saved with the layer name as suffix. Block map entries
+    hold the metatile index in the low 14 bits, then the horizontal and vertical
+    flip bits.
+
+    TILED_FILE_PATH: Path to the input tiled file in json or tmx format\n
+    OUTPUT_FOLDER: Path to the output folder
+    """
+    layers = [(name, TilesetImage.Priority.LO) for name in layer]
+    layers += [(name, TilesetImage.Priority.HI) for name in hi_layer]
+    if not layers:
+        raise click.UsageError("Export at least one layer with --layer or --hi-layer.")
+
+    try:
+        output_folder.mkdir(parents=True, exist_ok=True)
+        builder = MetatileBuilder(tiled_file_path, int(size), tile_base, flips)
+
+        saved, stats = builder.save(
+            output_folder / tiled_file_path.stem, layers, output_format, compression
+        )
+        for path, written in saved:
+            if written:
+                click.echo(click.style(f"Saved '{path}'.", fg="green"))
+            else:
+                click.echo(f"Unchanged '{path}'.")
+
+        click.echo(
+            f"{stats.blocks} blocks, {stats.metatiles} metatiles. "
+            f"{stats.tilemap_bytes} tilemap bytes -> {stats.metatile_bytes} metatile "
+            f"+ {stats.block_map_bytes} block map bytes ({stats.ratio:.1%})."
+        )
+
+    except CompressionError as e:
+        raise click.ClickException(f"Compression error: {str(e)}")
+    except MapBuilderError as e:
+        raise click.ClickException(f"Map build error: {str(e)}")
+    except PaletteError as e:
+        raise click.ClickException(f"Palette error: {str(e)}")
+    except TiledMapError as e:
+        raise click.ClickException(f"Tiled map error: {str(e)}")
+    except (TileLayerError, TilesetError) as e:
+        raise click.ClickException(f"Tileset error: {str(e)}")
@@ -0,0 +1,172 @@
+from pathlib import Path
+from typing import Optional, Tuple
+
+import click
+
+from mdutil.core import (
+    ContactSheetBuilder,
+    MapBuilderError,
+    PaletteError,
+    PreviewRenderer,
+    PropertyError,
+    TiledMapError,
+    TileLayerError,
+    TilesetError,
+    create_writer,
+    find_maps,
+)
+from mdutil.core.util import Size
+
+from .genmap import validate_layer_id
+from .genworld import parse_size
+from .params import ParameterPair
+from .utils import debug_exceptions
+
+
+@click.command()
+@click.argument(
+    "paths",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "--output-folder",
+    "-o",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=Path(),
+    help="Folder of the preview images, the current folder by default.",
+)
+@click.option(
+    "--layer",
+    "-l",
+    type=ParameterPair(value_types=(str, str), validator=validate_layer_id),
+    multiple=True,
+    help="Plane to preview in the same format used by genmap.",
+)
+@click.option(
+    "--size",
+    callback=parse_size,
+    default="128x128",
+    show_default=True,
+    help="Largest thumbnail size in 'WIDTHxHEIGHT' pixels.",
+)
+@click.option(
+    "--scale",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Smallest downscale factor of every map.",
+)
+@click.option(
+    "--method",
+    type=click.Choice(["stride", "average"]),
+    default="stride",
+    show_default=True,
+    help="Downscale by keeping a pixel of every block or by averaging the blocks.",
+)
+@click.option(
+    "--transparent/--opaque",
+    default=False,
+    help="Draw the first color of every palette line as transparent.",
+)
+@click.option(
+    "--columns",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+    help="Thumbnails per row of the contact sheet.",
+)
+@click.option(
+    "--thumbnails",
+    is_flag=True,
+    default=False,
+    help="Also save the thumbnail of every map.",
+)
+@click.option(
+    "--format",
+    "-f",
+    "image_format",
+    type=click.Choice(["png", "bin", "npy"]),
+    default="png",
+    show_default=True,
+    help="Image format: png, raw color indexes or numpy arrays.",
+)
+@click.option(
+    "--png-level",
+    type=click.IntRange(min=0, max=9),
+    default=6,
+    show_default=True,
+    help="Zlib compression level of png images.",
+)
+@click.option(
+    "--png-filter",
+    type=click.Choice(["none", "sub", "up", "average", "paeth", "adaptive"]),
+    default=None,
+    help="Row filter of png images. Defaults to none for indexed images.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of worker processes. Defaults to the number of CPUs.",
+)
+@click.pass_context
+@debug_exceptions
+def preview(
+    ctx,
+    paths: Tuple[Path],
+    output_folder: Path,
+    layer: ParameterPair,
+    size: Size,
+    scale: int,
+    method: str,
+    transparent: bool,
+    columns: int,
+    thumbnails: bool,
+    image_format: str,
+    png_level: int,
+    png_filter: Optional[str],
+    jobs: Optional[int],
+):
+    """
+    Render a contact sheet with an RGBA thumbnail of every map
+
+    A sheet named contact_sheet_ID is saved for every plane.
+
+    PATHS: Tiled files or folders searched recursively for tmx and tmj files
+    """
+    try:
+        output_folder.mkdir(parents=True, exist_ok=True)
+
+        maps = find_maps(paths)
+        renderer = PreviewRenderer(scale, method, transparent)
+        builder = ContactSheetBuilder(size, columns, renderer, jobs)
+        writer = create_writer(image_format, png_level, png_filter, jobs)
+
+        for id_val, lo, hi in layer:
+            lo_layer = lo if lo != "_" else None
+            hi_layer = hi if hi != "_" else None
+
+            plane = id_val.upper()
+            output = output_folder / f"contact_sheet_{plane}{writer.suffix}"
+            suffix = f"{plane}_thumb" if thumbnails else None
+            saved = builder.save(output, maps, lo_layer, hi_layer, suffix, writer)
+
+            for path, written in saved:
+                if written:
+                    click.echo(click.style(f"Saved '{path}'.", fg="green"))
+                else:
+                    click.echo(f"Unchanged '{path}'.")
+
+    except MapBuilderError as e:
+        raise click.ClickException(f"Map build error: {str(e)}")
+    except PaletteError as e:
+        raise click.ClickException(f"Palette error: {str(e)}")
+    except PropertyError as e:
+        raise click.ClickException(f"Property error: {str(e)}")
+    except TiledMapError as e:
+        raise click.ClickException(f"Tiled map error: {str(e)}")
+    except (TileLayerError, TilesetError) as e:
+        raise click.ClickException(f"Tileset error: {str(e)}")
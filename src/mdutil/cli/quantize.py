@@ -0,0 +1,80 @@
+from pathlib import Path
+from typing import Optional
+
+import click
+
+from mdutil.core import PaletteError, TilesetError, TilesetQuantizer
+from mdutil.core.util import Size
+
+from .utils import debug_exceptions
+
+
+def parse_color(ctx, param, value: Optional[str]):
+    if value is None:
+        return None
+
+    try:
+        color = int(value.lstrip("#"), 16)
+    except ValueError:
+        raise click.BadParameter(f"Invalid color '{value}'. Expected 'RRGGBB'.")
+
+    return ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
+
+
+@click.command()
+@click.argument(
+    "input_path", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.argument(
+    "output_path", type=click.Path(exists=False, dir_okay=False, path_type=Path)
+)
+@click.option("--tile-width", type=click.IntRange(min=1), default=8, show_default=True)
+@click.option("--tile-height", type=click.IntRange(min=1), default=8, show_default=True)
+@click.option("--margin", type=click.IntRange(min=0), default=0, show_default=True)
+@click.option("--spacing", type=click.IntRange(min=0), default=0, show_default=True)
+@click.option(
+    "--lines",
+    type=click.IntRange(min=1, max=4),
+    default=4,
+    show_default=True,
+    help="Number of palette lines available to the tileset.",
+)
+@click.option(
+    "--transparent",
+    callback=parse_color,
+    default=None,
+    help="Color in the format 'RRGGBB' treated as transparent, besides alpha.",
+)
+@click.pass_context
+@debug_exceptions
+def quantize(
+    ctx,
+    input_path: Path,
+    output_path: Path,
+    tile_width: int,
+    tile_height: int,
+    margin: int,
+    spacing: int,
+    lines: int,
+    transparent: Optional[tuple],
+):
+    """
+    Convert a true color tileset into an indexed png with Megadrive palettes
+
+    INPUT_PATH: Path to the RGB or RGBA tileset image\n
+    OUTPUT_PATH: Path to the indexed png image
+    """
+    try:
+        quantizer = TilesetQuantizer(
+            Size(tile_height, tile_width), margin, spacing, lines, transparent
+        )
+        quantizer.convert(input_path, output_path)
+    except (PaletteError, TilesetError) as e:
+        raise click.ClickException(f"Tileset error: {str(e)}")
+
+    color = "green" if quantizer.error == 0 else "yellow"
+    click.echo(
+        click.style(
+            f"Saved '{output_path}' (quantization error {quantizer.error:g}).", fg=color
+        )
+    )
@@ -0,0 +1,69 @@
+import asyncio
+from pathlib import Path
+from typing import Optional
+
+import click
+
+from mdutil.core import RenderServer
+
+from .utils import debug_exceptions
+
+
+@click.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Listen on a unix socket instead of stdin/stdout.",
+)
+@click.option(
+    "--max-maps",
+    type=click.IntRange(min=1),
+    default=16,
+    show_default=True,
+    help="Number of loaded maps kept in memory.",
+)
+@click.option(
+    "--max-tilesets",
+    type=click.IntRange(min=1),
+    default=64,
+    show_default=True,
+    help="Number of decoded tileset images kept in memory.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of worker threads. Defaults to the number of CPUs.",
+)
+@click.pass_context
+@debug_exceptions
+def serve(
+    ctx,
+    socket_path: Optional[Path],
+    max_maps: int,
+    max_tilesets: int,
+    jobs: Optional[int],
+):
+    """
+    Run a resident render server speaking line delimited JSON
+
+    Requests are objects like {"id": 1, "method": "render", "params": {...}}.
+    Methods: load, render, export, evict, stats and shutdown.
+    """
+    server = RenderServer(max_maps, max_tilesets, jobs)
+
+    if socket_path is None:
+        asyncio.run(server.serve_stdio())
+        return
+
+    if socket_path.exists():
+        raise click.ClickException(f"Socket path '{socket_path}' already exists.")
+
+    click.echo(f"Listening on '{socket_path}'.", err=True)
+    try:
+        asyncio.run(server.serve_unix(socket_path))
+    except KeyboardInterrupt:
+        pass
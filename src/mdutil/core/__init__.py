@@ -1,6 +1,68 @@
 from .exceptions import *
+from .animation import DmaSchedule, TileAnimation, TileAnimationBuilder
+from .attribute_map import AttributeField, AttributeMapBuilder
+from .contact_sheet import ContactSheetBuilder
+from .image_converter import ImageMapConverter, ImageTiles
+from .image_writer import (
+    ImageWriter,
+    NpyWriter,
+    PngWriter,
+    RawWriter,
+    create_writer,
+    save_image,
+)
+from .incremental_builder import IncrementalMapBuilder
 from .map_builder import MapImageBuilder
-from .img.palette import Palette
+from .map_converter import MapConverter
+from .map_info import LayerInfo, MapInfo, TilesetInfo, inspect_map
+from .map_checker import Finding, MapChecker, find_maps
+from .metatile import MetatileBuilder, MetatileStats
+from .plane_stream import PlaneStreamBuilder, StreamStrips
+from .render_server import RenderServer
+from .tilemap import TilemapBuilder
+from .world_builder import WorldImageBuilder, WorldMap, load_world
+from .img.palette import Palette, PaletteAllocator
+from .img.preview import PreviewRenderer
+from .img.quantizer import TilesetQuantizer
 from .img.tileset import TilesetImage
 
-__all__ = ["Palette", "MapImageBuilder", "TilesetImage"]
+__all__ = [
+    "AttributeField",
+    "AttributeMapBuilder",
+    "ContactSheetBuilder",
+    "DmaSchedule",
+    "Finding",
+    "ImageMapConverter",
+    "ImageTiles",
+    "ImageWriter",
+    "IncrementalMapBuilder",
+    "LayerInfo",
+    "MapChecker",
+    "MapConverter",
+    "MetatileBuilder",
+    "MetatileStats",
+    "NpyWriter",
+    "Palette",
+    "PaletteAllocator",
+    "PlaneStreamBuilder",
+    "PngWriter",
+    "PreviewRenderer",
+    "RawWriter",
+    "MapImageBuilder",
+    "MapInfo",
+    "RenderServer",
+    "StreamStrips",
+    "TileAnimation",
+    "TileAnimationBuilder",
+    "TilemapBuilder",
+    "TilesetImage",
+    "TilesetInfo",
+    "TilesetQuantizer",
+    "WorldImageBuilder",
+    "WorldMap",
+    "create_writer",
+    "find_maps",
+    "inspect_map",
+    "load_world",
+    "save_image",
+]
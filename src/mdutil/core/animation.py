@@ -0,0 +1,340 @@
+from collections import deque
+from dataclasses import dataclass
+from math import lcm
+from pathlib import Path
+from typing import Deque, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from mdutil.core.attribute_map import write_c_array
+from mdutil.core.exceptions import MapBuilderError
+from mdutil.core.tilemap import TilemapBuilder
+from mdutil.core.tmx.model import GID_MASK, LayerType
+from mdutil.core.util import write_if_changed
+
+# Vblanks per second of NTSC and PAL consoles
+NTSC_FPS = 60
+PAL_FPS = 50
+
+TILE_BYTES = 32
+
+# Cycles played at most for the uploads spilled from one cycle to the next to settle
+_MAX_CYCLES = 64
+
+
+@dataclass
+class TileAnimation:
+    """Animation of a VRAM tile: the source tile and the vblanks every frame is shown.
+
+    Source tiles are numbered in the tile data of all tilesets in gid order, the data
+    that is loaded to VRAM from the tile base.
+    """
+
+    slot: int
+    sources: np.ndarray
+    durations: np.ndarray
+
+    @property
+    def period(self) -> int:
+        return int(self.durations.sum())
+
+
+@dataclass
+class DmaSchedule:
+    """Tile uploads of every vblank of an animation cycle.
+
+    Every transfer is a row of (source tile, destination VRAM tile, tile count), and
+    the index has the first transfer and transfer count of every vblank. The game
+    plays the transfers of vblank (frame counter % period).
+    """
+
+    transfers: np.ndarray
+    index: np.ndarray
+    period: int
+    # Tiles uploaded in the busiest vblank and vblanks the latest upload lags behind
+    # the frame change it belongs to
+    peak_tiles: int
+    max_delay: int
+
+
+class TileAnimationBuilder:
+    """Export the tile animations of a map and the VRAM uploads that play them.
+
+    Every animated tile of the map gets a frame table. All animations are also merged
+    offline into a schedule of DMA transfers for every vblank of a cycle, the least
+    common multiple of the animation periods, so the game only has to queue them.
+    Tiles changing in the same vblank are coalesced into a single transfer wherever
+    both their VRAM slots and their source tiles are contiguous. Vblanks with more
+    uploads than the DMA budget spill the rest, in order, into the next vblanks.
+    """
+
+    def __init__(
+        self,
+        tiled_file_path: Union[str, Path],
+        tile_base: int = 0,
+        fps: int = NTSC_FPS,
+        dma_budget: int = 4096,
+        max_period: int = 3600,
+    ) -> None:
+        if dma_budget < TILE_BYTES:
+            raise MapBuilderError(
+                f"The DMA budget must be at least {TILE_BYTES} bytes, a tile."
+            )
+
+        self.fps = fps
+        self.budget_tiles = dma_budget // TILE_BYTES
+        self.max_period = max_period
+        self.tilemap_builder = TilemapBuilder(tiled_file_path, tile_base)
+        self.map_api = self.tilemap_builder.map_api
+
+    def _vblanks(self, duration: int) -> int:
+        """Duration of a frame in milliseconds as a whole number of vblanks"""
+        return max(round(duration * self.fps / 1000), 1)
+
+    def animations(self, layers: Optional[Sequence[str]] = None) -> List[TileAnimation]:
+        """Animations of the tiles placed in a set of tile layers, all of them by
+        default, in VRAM slot order"""
+        indexes, _ = self.tilemap_builder.luts()
+        base = self.tilemap_builder.tile_base
+
+        if layers is None:
+            layers = [layer.name for layer in self.map_api.get_layers(LayerType.TILE)]
+        used = np.zeros(len(indexes), dtype=bool)
+        for name in layers:
+            gids = self.map_api.get_gid_grid(name).ravel() & GID_MASK
+            used[gids[gids < len(indexes)]] = True
+
+        animations = []
+        for tileset in self.map_api.get_tilesets():
+            for tile_id, frames in tileset.tile_animations.items():
+                gid = tileset.first_gid + tile_id
+                if tile_id >= tileset.tile_count or not used[gid]:
+                    continue
+
+                frame_ids = np.array([frame.tile_id for frame in frames])
+                if ((frame_ids < 0) | (frame_ids >= tileset.tile_count)).any():
+                    raise MapBuilderError(
+                        f"An animation frame of tile {tile_id} in tileset "
+                        f"'{tileset.name}' is outside of the tileset."
+                    )
+
+                animations.append(
+                    TileAnimation(
+                        int(indexes[gid]),
+                        indexes[tileset.first_gid + frame_ids] - base,
+                        np.array([self._vblanks(frame.duration) for frame in frames]),
+                    )
+                )
+
+        return sorted(animations, key=lambda animation: animation.slot)
+
+    @staticmethod
+    def frame_tables(
+        animations: Sequence[TileAnimation],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Animation and frame tables.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: rows of (VRAM slot, first frame, frame
+            count) for every animation and rows of (source tile, vblanks) for every
+            frame
+        """
+        counts = np.array([len(animation.sources) for animation in animations])
+        firsts = np.cumsum(counts) - counts
+        table = np.stack(
+            ([animation.slot for animation in animations], firsts, counts), axis=-1
+        ).reshape(-1, 3)
+        frames = np.stack(
+            (
+                np.concatenate([a.sources for a in animations] or [[]]),
+                np.concatenate([a.durations for a in animations] or [[]]),
+            ),
+            axis=-1,
+        )
+
+        return table.astype(">u2"), frames.astype(">u2")
+
+    def _events(
+        self, animations: Sequence[TileAnimation], period: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Vblank, VRAM slot and new source tile of every tile change in a cycle"""
+        times, slots, sources = [], [], []
+        for animation in animations:
+            # Frames showing the same tile as the previous one don't upload anything
+            changed = animation.sources != np.roll(animation.sources, 1)
+            changed[0] = True
+            starts = (np.cumsum(animation.durations) - animation.durations)[changed]
+
+            repeats = np.arange(0, period, animation.period)
+            times.append(np.add.outer(repeats, starts).ravel())
+            slots.append(np.full(times[-1].size, animation.slot))
+            sources.append(np.tile(animation.sources[changed], len(repeats)))
+
+        if not times:
+            return (np.zeros(0, dtype=np.int64),) * 3
+
+        times, slots, sources = (np.concatenate(a) for a in (times, slots, sources))
+        order = np.lexsort((slots, times))
+
+        return times[order], slots[order], sources[order]
+
+    def schedule(self, animations: Sequence[TileAnimation]) -> DmaSchedule:
+        """Schedule the tile uploads of all animations over a whole cycle"""
+        period = lcm(*(animation.period for animation in animations), 1)
+        if period > self.max_period:
+            raise MapBuilderError(
+                f"The animations repeat every {period} vblanks, more than "
+                f"{self.max_period}. Use frame durations with common multiples."
+            )
+
+        times, slots, sources = self._events(animations, period)
+        if len(times) > self.budget_tiles * period:
+            raise MapBuilderError(
+                f"The animations upload {len(times)} tiles every {period} vblanks, "
+                f"more than the DMA budget of {self.budget_tiles} tiles per vblank."
+            )
+
+        # Changes of contiguous slots from contiguous sources in the same vblank
+        breaks = np.ones(len(times), dtype=bool)
+        breaks[1:] = (
+            (times[1:] != times[:-1])
+            | (slots[1:] != slots[:-1] + 1)
+            | (sources[1:] != sources[:-1] + 1)
+        )
+        starts = np.flatnonzero(breaks)
+        lengths = np.diff(np.append(starts, len(times)))
+        runs_at = np.searchsorted(times[starts], np.arange(period + 1))
+
+        runs = list(
+            zip(
+                times[starts].tolist(),
+                sources[starts].tolist(),
+                slots[starts].tolist(),
+                lengths.tolist(),
+            )
+        )
+
+        # The uploads left over at the end of a cycle spill into the next one, so
+        # cycles are played until the spill is the same every time
+        pending: Deque[List[int]] = deque()
+        previous = None
+        for _ in range(_MAX_CYCLES):
+            vblanks, delay, spill = self._play(runs, runs_at, period, pending)
+            if spill == previous:
+                break
+            previous = spill
+            pending = deque([time - period, *run] for time, *run in spill)
+        else:
+            raise MapBuilderError("The DMA schedule doesn't settle.")
+
+        transfers = [transfer for vblank in vblanks for transfer in vblank]
+        if len(transfers) > 0xFFFF:
+            raise MapBuilderError(
+                f"The schedule has {len(transfers)} transfers, more than 65535."
+            )
+
+        counts = np.array([len(vblank) for vblank in vblanks])
+        index = np.stack((np.cumsum(counts) - counts, counts), axis=-1)
+
+        return DmaSchedule(
+            np.array(transfers, dtype=">u2").reshape(-1, 3),
+            index.astype(">u2"),
+            period,
+            max((sum(t[2] for t in vblank) for vblank in vblanks), default=0),
+            delay,
+        )
+
+    def _play(
+        self,
+        runs: List[Tuple[int, int, int, int]],
+        runs_at: np.ndarray,
+        period: int,
+        pending: Deque[List[int]],
+    ) -> Tuple[List[List[Tuple[int, int, int]]], int, List[Tuple[int, ...]]]:
+        """Upload the runs of tile changes of a cycle within the DMA budget, after
+        the runs left over from the previous cycle.
+
+        Returns:
+            the transfers of every vblank, the largest delay of a run and the runs
+            left over at the end of the cycle
+        """
+        vblanks = []
+        delay = 0
+        for time in range(period):
+            pending.extend(list(run) for run in runs[runs_at[time] : runs_at[time + 1]])
+
+            transfers: List[Tuple[int, int, int]] = []
+            budget = self.budget_tiles
+            while pending and budget:
+                run = pending[0]
+                count = min(run[3], budget)
+                delay = max(delay, time - run[0])
+
+                last = transfers[-1] if transfers else None
+                if (
+                    last is not None
+                    and last[0] + last[2] == run[1]
+                    and last[1] + last[2] == run[2]
+                ):
+                    transfers[-1] = (last[0], last[1], last[2] + count)
+                else:
+                    transfers.append((run[1], run[2], count))
+
+                budget -= count
+                run[1] += count
+                run[2] += count
+                run[3] -= count
+                if not run[3]:
+                    pending.popleft()
+
+            vblanks.append(transfers)
+
+        return vblanks, delay, [tuple(run) for run in pending]
+
+    def save(
+        self,
+        output_path: Union[str, Path],
+        layers: Optional[Sequence[str]] = None,
+        output_format: str = "bin",
+    ) -> Tuple[List[Tuple[Path, bool]], DmaSchedule]:
+        """Export the animation and frame tables, suffixed _anim and _frames, and the
+        DMA schedule, suffixed _dma for the transfers and _dma_idx for the index of
+        every vblank. Files that are up to date are left untouched.
+
+        Returns:
+            Tuple[List[Tuple[Path, bool]], DmaSchedule]: every file and whether it
+            was written, and the schedule
+        """
+        animations = self.animations(layers)
+        table, frames = self.frame_tables(animations)
+        schedule = self.schedule(animations)
+        output_path = Path(output_path)
+
+        tables = (
+            ("anim", table),
+            ("frames", frames),
+            ("dma", schedule.transfers),
+            ("dma_idx", schedule.index),
+        )
+
+        saved = []
+        for suffix, array in tables:
+            path = output_path.with_name(f"{output_path.name}_{suffix}")
+            if output_format == "c":
+                saved.extend(write_c_array(path, array))
+                continue
+
+            path = path.with_name(f"{path.name}.bin")
+            content = array.tobytes()
+            saved.append(
+                (
+                    path,
+                    write_if_changed(
+                        path,
+                        [b"bin", array],
+                        lambda file, content=content: file.write(content),
+                    ),
+                )
+            )
+
+        return saved, schedule
@@ -0,0 +1,168 @@
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from mdutil.core.compression import save_compressed
+from mdutil.core.exceptions import PropertyError, TilesetError
+from mdutil.core.tmx.api import MapApi
+from mdutil.core.tmx.model import GID_MASK, TmxMap
+from mdutil.core.util import write_if_changed
+
+# Output types by the number of bits needed to pack all the fields
+_TYPES = ((8, ">u1", "u8"), (16, ">u2", "u16"), (32, ">u4", "u32"))
+
+
+@dataclass
+class AttributeField:
+    """Numeric tile property packed into a bit field of every attribute map cell"""
+
+    name: str
+    bits: int = 1
+    default: int = 0
+
+
+class AttributeMapBuilder:
+    """Build collision and attribute maps from per tile properties.
+
+    Every field is a numeric tile property packed in a bit field, the first field in
+    the lowest bits. All fields are combined in a single lookup table indexed by gid,
+    so building the map of a layer is a single gather over its gids.
+    """
+
+    def __init__(
+        self,
+        tiled_file_path: Union[str, Path],
+    ) -> None:
+        self.map_api = MapApi(TmxMap.from_file(tiled_file_path))
+
+    @staticmethod
+    def _dtype(fields: Sequence[AttributeField]) -> np.dtype:
+        bits = sum(field.bits for field in fields)
+        for size, dtype, _ in _TYPES:
+            if bits <= size:
+                return np.dtype(dtype)
+
+        raise PropertyError(f"The attribute fields need {bits} bits, more than 32.")
+
+    def lut(self, fields: Sequence[AttributeField]) -> np.ndarray:
+        """Packed attribute value for every gid"""
+        dtype = self._dtype(fields)
+
+        lut = np.zeros(1, dtype=np.int64)
+        shift = 0
+        for field in fields:
+            values = self.map_api.get_property_lut(field.name, field.default)
+            if values.min() < 0 or values.max() >= 1 << field.bits:
+                raise PropertyError(
+                    f"Values of tile property '{field.name}' don't fit in "
+                    f"{field.bits} bits."
+                )
+
+            if len(values) > len(lut):
+                lut = np.pad(lut, (0, len(values) - len(lut)))
+            lut[: len(values)] |= values << shift
+            shift += field.bits
+
+        return lut.astype(dtype)
+
+    def build(self, layer_name: str, fields: Sequence[AttributeField]) -> np.ndarray:
+        """Attribute map of a tile layer with shape (rows, columns)"""
+        lut = self.lut(fields)
+        gids = self.map_api.get_gid_grid(layer_name) & GID_MASK
+
+        if gids.size and gids.max() >= len(lut):
+            raise TilesetError(
+                f"Gid: {gids[gids >= len(lut)][0]} not found in tileset collection."
+            )
+
+        return lut[gids]
+
+    def save(
+        self,
+        output_path: Union[str, Path],
+        layer_name: str,
+        fields: Sequence[AttributeField],
+        output_format: str = "bin",
+        compression: str = "none",
+    ) -> List[Tuple[Path, bool]]:
+        """Export the attribute map of a layer. Files that are up to date are left
+        untouched.
+
+        The bin format is the raw big endian cells in row major order, compressed
+        with one of the codecs SGDK unpacks at runtime. The c format writes a header
+        and a source file with the cells as a constant array.
+
+        Returns:
+            List[Tuple[Path, bool]]: every file and whether it was written
+        """
+        attributes = self.build(layer_name, fields)
+        output_path = Path(output_path)
+
+        if output_format == "bin":
+            saved, _, written = save_compressed(
+                output_path, attributes.tobytes(), compression
+            )
+            return [(saved, written)]
+
+        return write_c_array(output_path, attributes)
+
+
+def _c_identifier(name: str) -> str:
+    identifier = re.sub(r"\W", "_", name).lower()
+    return f"_{identifier}" if identifier[:1].isdigit() else identifier
+
+
+def write_c_array(output_path: Path, array: np.ndarray) -> List[Tuple[Path, bool]]:
+    """Write a 2D array as a constant C array with SGDK types and its header, named
+    after the output path with the .h and .c suffixes appended. Files that are up to
+    date are left untouched.
+
+    Returns:
+        List[Tuple[Path, bool]]: the header and source files and whether they were
+        written
+    """
+    name = _c_identifier(output_path.name)
+    ctype = next(c for size, _, c in _TYPES if size == array.dtype.itemsize * 8)
+    rows, columns = array.shape
+
+    header_path = output_path.with_name(f"{output_path.name}.h")
+    guard = f"_{name.upper()}_H_"
+    header = (
+        f"#ifndef {guard}\n"
+        f"#define {guard}\n\n"
+        "#include <genesis.h>\n\n"
+        f"#define {name.upper()}_WIDTH {columns}\n"
+        f"#define {name.upper()}_HEIGHT {rows}\n\n"
+        f"extern const {ctype} {name}[{rows * columns}];\n\n"
+        f"#endif // {guard}\n"
+    )
+
+    def write_source(file: BinaryIO) -> None:
+        # Every distinct value is formatted once and gathered into place
+        values, inverse = np.unique(array, return_inverse=True)
+        digits = array.dtype.itemsize * 2
+        text = np.array([f"0x{value:0{digits}X}" for value in values.tolist()])
+        cells = text[inverse.reshape(array.shape)]
+        body = ",\n".join("    " + ", ".join(row) for row in cells.tolist())
+
+        file.write(
+            f'#include "{header_path.name}"\n\n'
+            f"const {ctype} {name}[{rows * columns}] = {{\n{body}\n}};\n".encode()
+        )
+
+    source_path = output_path.with_name(f"{output_path.name}.c")
+    return [
+        (
+            header_path,
+            write_if_changed(
+                header_path, [header], lambda file: file.write(header.encode())
+            ),
+        ),
+        (
+            source_path,
+            write_if_changed(source_path, [b"c", name, array], write_source),
+        ),
+    ]
@@ -0,0 +1,625 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from mdutil.core.exceptions import CompressionError
+from mdutil.core.util import write_if_changed
+
+# Compression identifiers of SGDK resources
+SGDK_COMPRESSION_NONE = 0
+SGDK_COMPRESSION_APLIB = 1
+SGDK_COMPRESSION_LZ4W = 2
+
+
+class Codec(ABC):
+    name: str
+    sgdk_id: int
+    # Suffix of the files compressed with the codec
+    suffix: str
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+
+class NoCompression(Codec):
+    name = "none"
+    sgdk_id = SGDK_COMPRESSION_NONE
+    suffix = ".bin"
+
+    def compress(self, data: bytes) -> bytes:
+        return bytes(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return bytes(data)
+
+
+def _previous_occurrences(keys: np.ndarray) -> np.ndarray:
+    """Index of the previous element with the same key as every element, or -1"""
+    previous = np.full(len(keys), -1, dtype=np.int64)
+    order = np.argsort(keys, kind="stable")
+    same = keys[order[1:]] == keys[order[:-1]]
+    previous[order[1:][same]] = order[:-1][same]
+
+    return previous
+
+
+def _prefixes(data: bytes, width: int) -> np.ndarray:
+    """Big endian value of the width bytes starting at every position"""
+    buffer = np.frombuffer(data, dtype=np.uint8).astype(np.uint32)
+    count = len(buffer) - width + 1
+    value = np.zeros(max(count, 0), dtype=np.uint32)
+    for index in range(width):
+        value = value << 8 | buffer[index : index + count]
+
+    return value
+
+
+class HashChain:
+    """Match finder over the 3 byte prefixes of a buffer.
+
+    The chains are built at once with numpy: positions are sorted by prefix and every
+    position is linked to the previous one with the same prefix. Matches are found
+    for blocks of positions at a time, the first time the parse asks for one of
+    them, so the positions a long match skips are seldom searched. All the chains of
+    a block are walked together, one step at a time, comparing 8 bytes at once
+    through a view of every 8 byte window of the buffer. Lengths are found up to
+    max_length bytes, and only the longer matches the parse asks for are extended
+    comparing slices. With an alignment, only the positions that are a multiple of
+    it are chained.
+    """
+
+    # Positions searched together
+    BLOCK_SIZE = 4096
+
+    def __init__(
+        self, data: bytes, max_chain: int = 64, align: int = 1, max_length: int = 256
+    ) -> None:
+        self.data = data
+        self.max_chain = max_chain
+        self.max_length = max_length
+
+        self._previous = np.full(len(data), -1, dtype=np.int64)
+        positions = np.arange(0, max(len(data) - 2, 0), align)
+        chained = _previous_occurrences(_prefixes(data, 3)[positions])
+        self._previous[positions[chained >= 0]] = positions[chained[chained >= 0]]
+        self.previous = self._previous.tolist()
+
+        padded = np.concatenate(
+            (np.frombuffer(data, dtype=np.uint8), np.zeros(max_length + 8, np.uint8))
+        )
+        windows = np.lib.stride_tricks.sliding_window_view(padded, 8)
+        self._windows = np.ascontiguousarray(windows[: len(data) + max_length])
+        self._windows = self._windows.view("<u8")[:, 0]
+
+        # Matches of the searched blocks, grouped by position
+        self._blocks: Dict[int, Tuple[List[int], List[int], List[int]]] = {}
+
+    def _lengths(self, positions: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+        """Length of the matches between pairs of positions, up to max_length"""
+        windows = self._windows
+        lengths = np.zeros(len(positions), dtype=np.int64)
+        active = np.arange(len(positions))
+        while len(active):
+            diff = (
+                windows[positions[active] + lengths[active]]
+                ^ windows[candidates[active] + lengths[active]]
+            )
+            same = diff == 0
+            # Equal bytes before the lowest differing one, as the view is little
+            # endian
+            low = diff[~same] & (~diff[~same] + np.uint64(1))
+            lengths[active[~same]] += np.log2(low).astype(np.int64) >> 3
+            lengths[active[same]] += 8
+            active = active[same]
+            active = active[lengths[active] < self.max_length]
+
+        return lengths
+
+    def _search(self, block: int) -> Tuple[List[int], List[int], List[int]]:
+        """Walk the chains of a block of positions together, keeping every match
+        longer than the previous ones of its position"""
+        first = block * self.BLOCK_SIZE
+        previous = self._previous[first : first + self.BLOCK_SIZE]
+        positions = first + np.flatnonzero(previous >= 0)
+        candidates = self._previous[positions]
+        limits = np.minimum(len(self.data) - positions, self.max_length)
+        longest = np.full(len(positions), 2, dtype=np.int64)
+
+        found = []
+        for _ in range(self.max_chain):
+            if not len(positions):
+                break
+
+            lengths = np.minimum(self._lengths(positions, candidates), limits)
+            better = lengths > longest
+            found.append(
+                (positions[better], lengths[better], (positions - candidates)[better])
+            )
+            longest = np.maximum(longest, lengths)
+
+            # Chains end with their first position, or once nothing can be longer
+            candidates = self._previous[candidates]
+            keep = (candidates >= 0) & (longest < limits)
+            positions, candidates = positions[keep], candidates[keep]
+            limits, longest = limits[keep], longest[keep]
+
+        positions, lengths, offsets = (
+            np.concatenate([step[index] for step in found] or [np.zeros(0, np.int64)])
+            for index in range(3)
+        )
+        order = np.argsort(positions, kind="stable")
+        starts = np.searchsorted(
+            positions[order], np.arange(first, first + self.BLOCK_SIZE + 1)
+        )
+
+        return starts.tolist(), lengths[order].tolist(), offsets[order].tolist()
+
+    def match_length(self, pos: int, candidate: int, limit: int, start: int = 0) -> int:
+        """Length of the match between two positions, knowing the first start bytes
+        are equal"""
+        data = self.data
+        length, step = start, 16
+        while length < limit:
+            if step > limit - length:
+                step = limit - length
+            if (
+                data[pos + length : pos + length + step]
+                == data[candidate + length : candidate + length + step]
+            ):
+                length += step
+                step *= 2
+            elif step == 1:
+                break
+            else:
+                step //= 2
+
+        return length
+
+    def matches(self, pos: int) -> List[Tuple[int, int]]:
+        """Longest matches at a position as (length, offset) pairs, each one longer
+        and further away than the previous one"""
+        block = pos // self.BLOCK_SIZE
+        if block not in self._blocks:
+            self._blocks[block] = self._search(block)
+
+        starts, lengths, offsets = self._blocks[block]
+        start, end = starts[pos % self.BLOCK_SIZE], starts[pos % self.BLOCK_SIZE + 1]
+        found = list(zip(lengths[start:end], offsets[start:end]))
+
+        # Matches reaching the longest length found at once are extended, and the
+        # rest of the chain is walked as it may hold even longer ones
+        if found and found[-1][0] == self.max_length:
+            data = self.data
+            limit = len(data) - pos
+            length, offset = found.pop()
+            candidate = pos - offset
+            longest = self.max_length - 1
+            for _ in range(self.max_chain):
+                if candidate < 0 or longest == limit:
+                    break
+
+                # Only candidates matching one byte past the longest match can
+                # improve it
+                if (
+                    data[candidate : candidate + longest + 1]
+                    == data[pos : pos + longest + 1]
+                ):
+                    longest = self.match_length(pos, candidate, limit, longest + 1)
+                    found.append((longest, pos - candidate))
+                candidate = self.previous[candidate]
+
+        return found
+
+
+class _BitWriter:
+    def __init__(self) -> None:
+        self.output = bytearray()
+        self._tag = 0
+        self._free = 0
+
+    def bit(self, value: int) -> None:
+        # Tag bytes are reserved in the output when the decoder would read them
+        if not self._free:
+            self._tag = len(self.output)
+            self.output.append(0)
+            self._free = 8
+
+        self._free -= 1
+        if value:
+            self.output[self._tag] |= 1 << self._free
+
+    def bits(self, value: int, count: int) -> None:
+        for shift in range(count - 1, -1, -1):
+            self.bit((value >> shift) & 1)
+
+    def byte(self, value: int) -> None:
+        self.output.append(value)
+
+    def gamma(self, value: int) -> None:
+        digits = bin(value)[3:]
+        for index, digit in enumerate(digits):
+            self.bit(digit == "1")
+            self.bit(index < len(digits) - 1)
+
+
+def _gamma_bits(value: int) -> int:
+    return 2 * (value.bit_length() - 1)
+
+
+def _length_bonus(offset: int) -> int:
+    return (offset >= 32000) + (offset >= 1280) + 2 * (offset < 128)
+
+
+class AplibCodec(Codec):
+    """aPLib raw streams, as unpacked by SGDK at runtime.
+
+    Matches come from a hash chain and the parse is lazy: a match is delayed by one
+    byte when the match at the next position saves more bits. Costs are computed
+    with the exact size of every aPLib code, including the short and single byte
+    matches and the reuse of the last offset after a literal.
+    """
+
+    name = "aplib"
+    sgdk_id = SGDK_COMPRESSION_APLIB
+    suffix = ".apl"
+
+    def __init__(self, max_chain: int = 64) -> None:
+        self.max_chain = max_chain
+
+    def _best(
+        self,
+        chain: HashChain,
+        nearest: List[List[int]],
+        pos: int,
+        after_literal: bool,
+        last_offset: Optional[int],
+    ) -> Tuple[int, int, Tuple]:
+        """Best code at a position as (saved bits, length, code), knowing the offset
+        of the nearest previous occurrence of the 1, 2 and 3 bytes at every position"""
+        data = chain.data
+        best = (0, 1, ("literal",))
+
+        def consider(length: int, bits: int, code: Tuple) -> None:
+            nonlocal best
+            saved = length * 9 - bits
+            if saved > best[0] or saved == best[0] and length > best[1]:
+                best = (saved, length, code)
+
+        # Single byte copied from the last 15 bytes, or a zero byte
+        if data[pos] == 0:
+            consider(1, 7, ("nibble", 0))
+        elif 0 < nearest[0][pos] <= 15:
+            consider(1, 7, ("nibble", nearest[0][pos]))
+
+        # Repeat the last offset, only possible right after a literal
+        if (
+            after_literal
+            and last_offset is not None
+            and data[pos : pos + 2] == data[pos - last_offset : pos - last_offset + 2]
+        ):
+            length = chain.match_length(pos, pos - last_offset, len(data) - pos, 2)
+            consider(
+                length, 2 + _gamma_bits(2) + _gamma_bits(length), ("repeat", length)
+            )
+
+        # Short matches of 2 or 3 bytes within 127 bytes
+        for length in (3, 2):
+            if pos + length <= len(data) and 0 < nearest[length - 1][pos] <= 127:
+                consider(length, 11, ("short", length, nearest[length - 1][pos]))
+                break
+
+        high_bias = 3 if after_literal else 2
+        for length, offset in chain.matches(pos):
+            coded = length - _length_bonus(offset)
+            if coded < 2:
+                continue
+
+            bits = 2 + _gamma_bits((offset >> 8) + high_bias) + 8 + _gamma_bits(coded)
+            consider(length, bits, ("match", length, offset))
+
+        return best
+
+    def compress(self, data: bytes) -> bytes:
+        data = bytes(data)
+        if not data:
+            raise CompressionError("aPLib can't compress empty data.")
+
+        chain = HashChain(data, self.max_chain)
+        nearest = []
+        for width in (1, 2, 3):
+            previous = _previous_occurrences(_prefixes(data, width))
+            offsets = np.where(previous >= 0, np.arange(len(previous)) - previous, 0)
+            nearest.append(offsets.tolist())
+        writer = _BitWriter()
+        writer.byte(data[0])
+
+        pos = 1
+        after_literal = True
+        last_offset: Optional[int] = None
+        while pos < len(data):
+            saved, length, code = self._best(
+                chain, nearest, pos, after_literal, last_offset
+            )
+
+            if length > 1 and pos + 1 < len(data):
+                # Lazy matching, a literal here may allow a better match next
+                next_saved = self._best(chain, nearest, pos + 1, True, last_offset)[0]
+                if next_saved > saved:
+                    code, length = ("literal",), 1
+
+            kind = code[0]
+            if kind == "literal":
+                writer.bit(0)
+                writer.byte(data[pos])
+                after_literal = True
+            elif kind == "nibble":
+                writer.bits(0b111, 3)
+                writer.bits(code[1], 4)
+                after_literal = True
+            elif kind == "short":
+                writer.bits(0b110, 3)
+                writer.byte(code[2] << 1 | (code[1] - 2))
+                last_offset = code[2]
+                after_literal = False
+            elif kind == "repeat":
+                writer.bits(0b10, 2)
+                writer.gamma(2)
+                writer.gamma(code[1])
+                after_literal = False
+            else:
+                _, length, offset = code
+                writer.bits(0b10, 2)
+                writer.gamma((offset >> 8) + (3 if after_literal else 2))
+                writer.byte(offset & 0xFF)
+                writer.gamma(length - _length_bonus(offset))
+                last_offset = offset
+                after_literal = False
+
+            pos += length
+
+        # End of stream
+        writer.bits(0b110, 3)
+        writer.byte(0)
+
+        return bytes(writer.output)
+
+    def decompress(self, data: bytes) -> bytes:
+        src = iter(data)
+        output = bytearray()
+        tag, free = 0, 0
+
+        def bit() -> int:
+            nonlocal tag, free
+            if not free:
+                tag, free = next(src), 8
+            free -= 1
+            return (tag >> free) & 1
+
+        def gamma() -> int:
+            value = 1
+            while True:
+                value = (value << 1) + bit()
+                if not bit():
+                    return value
+
+        def copy(offset: int, length: int) -> None:
+            if not 0 < offset <= len(output):
+                raise CompressionError(f"Invalid aPLib match offset: {offset}")
+            for _ in range(length):
+                output.append(output[-offset])
+
+        try:
+            output.append(next(src))
+            after_literal, last_offset = True, 0
+            while True:
+                if not bit():
+                    output.append(next(src))
+                    after_literal = True
+                elif not bit():
+                    high = gamma()
+                    if after_literal and high == 2:
+                        copy(last_offset, gamma())
+                    else:
+                        offset = ((high - (3 if after_literal else 2)) << 8) + next(src)
+                        copy(offset, gamma() + _length_bonus(offset))
+                        last_offset = offset
+                    after_literal = False
+                elif not bit():
+                    value = next(src)
+                    if not value >> 1:
+                        return bytes(output)
+                    copy(value >> 1, 2 + (value & 1))
+                    last_offset, after_literal = value >> 1, False
+                else:
+                    offset = sum(bit() << shift for shift in range(3, -1, -1))
+                    if offset:
+                        copy(offset, 1)
+                    else:
+                        output.append(0)
+                    after_literal = True
+        except StopIteration:
+            raise CompressionError("Truncated aPLib stream.") from None
+
+
+class Lz4wCodec(Codec):
+    """LZ4W streams, the word based LZ4 variant SGDK unpacks at runtime.
+
+    Everything is counted in 16 bit words. Every segment starts with a byte holding
+    the number of literal words in its high nibble and the match length in its low
+    nibble, and a byte with the match offset, followed by the literal words. A match
+    copies length + 1 words from offset + 1 words back, a zero length means the
+    segment has no match, and a segment without literals nor match ends the stream.
+
+    Matches come from a hash chain of the word aligned positions, with the same lazy
+    parse as aPLib. Only data of an even size can be compressed.
+
+    The layout hasn't been checked against streams of SGDK's own packer yet, so the
+    codec is not registered and is never picked by the best mode.
+    """
+
+    name = "lz4w"
+    sgdk_id = SGDK_COMPRESSION_LZ4W
+    suffix = ".lz4w"
+
+    # Longest literal run, match and match offset of a segment, in words
+    MAX_LITERALS = 15
+    MAX_MATCH = 16
+    MAX_OFFSET = 256
+
+    def __init__(self, max_chain: int = 64) -> None:
+        self.max_chain = max_chain
+
+    def _best(self, chain: HashChain, pos: int) -> Tuple[int, int]:
+        """Longest match at a position as (length, offset) in words, the closest
+        one of the longest ones"""
+        best = (0, 0)
+        for length, offset in chain.matches(pos):
+            if offset > self.MAX_OFFSET * 2:
+                break
+
+            length = min(length // 2, self.MAX_MATCH)
+            if length > best[0]:
+                best = (length, offset // 2)
+
+        return best
+
+    def compress(self, data: bytes) -> bytes:
+        data = bytes(data)
+        if len(data) % 2:
+            raise CompressionError("LZ4W can only compress data of an even size.")
+
+        chain = HashChain(data, self.max_chain, align=2)
+        output = bytearray()
+        literals = 0
+
+        def segment(match: int, offset: int) -> None:
+            start = pos - literals * 2
+            output.append(literals << 4 | match)
+            output.append(offset)
+            output.extend(data[start:pos])
+
+        pos = 0
+        while pos < len(data):
+            length, offset = self._best(chain, pos)
+
+            if length > 1 and pos + 2 < len(data):
+                # Lazy matching, a literal here may allow a longer match next
+                if self._best(chain, pos + 2)[0] > length:
+                    length = 0
+
+            if length < 2:
+                literals += 1
+                pos += 2
+                if literals == self.MAX_LITERALS:
+                    segment(0, 0)
+                    literals = 0
+                continue
+
+            segment(length - 1, offset - 1)
+            literals = 0
+            pos += length * 2
+
+        if literals:
+            segment(0, 0)
+        # End of stream
+        output.extend(b"\x00\x00")
+
+        return bytes(output)
+
+    def decompress(self, data: bytes) -> bytes:
+        output = bytearray()
+        pos = 0
+        while True:
+            if pos + 2 > len(data):
+                raise CompressionError("Truncated LZ4W stream.")
+
+            control, offset = data[pos], data[pos + 1]
+            literals, match = control >> 4, control & 0x0F
+            pos += 2
+            if not control:
+                return bytes(output)
+
+            if pos + literals * 2 > len(data):
+                raise CompressionError("Truncated LZ4W stream.")
+            output.extend(data[pos : pos + literals * 2])
+            pos += literals * 2
+
+            if match:
+                start = len(output) - (offset + 1) * 2
+                if start < 0:
+                    raise CompressionError(
+                        f"Invalid LZ4W match offset: {offset + 1} words"
+                    )
+                for word in range(start, start + (match + 1) * 2, 2):
+                    output.extend(output[word : word + 2])
+
+
+CODECS: Dict[str, Codec] = {
+    codec.name: codec for codec in (NoCompression(), AplibCodec())
+}
+
+BEST = "best"
+
+
+def compress(data: bytes, codec: str = BEST) -> Tuple[Codec, bytes]:
+    """Compress data with a codec, or with every codec keeping the smallest output.
+    Codecs that can't compress the data are skipped when looking for the best one.
+
+    Returns:
+        Tuple[Codec, bytes]: the codec used and the compressed data
+    """
+    if codec != BEST:
+        if codec not in CODECS:
+            raise CompressionError(f"Unsupported compression: {codec}")
+        return CODECS[codec], CODECS[codec].compress(data)
+
+    best = (CODECS["none"], bytes(data))
+    for candidate in CODECS.values():
+        if candidate.name == "none" or not data:
+            continue
+
+        try:
+            packed = candidate.compress(data)
+        except CompressionError:
+            continue
+
+        if len(packed) < len(best[1]):
+            best = (candidate, packed)
+
+    return best
+
+
+def save_compressed(
+    output_path: Union[str, Path],
+    data: bytes,
+    codec: str = BEST,
+    source: Optional[Union[str, Path]] = None,
+) -> Tuple[Path, Codec, bool]:
+    """Compress a binary blob and save it with the suffix of the codec used appended
+    to the output path. Files that are up to date are left untouched. With a source
+    file, the output is never allowed to replace it.
+
+    Returns:
+        Tuple[Path, Codec, bool]: the file, the codec used and whether it was written
+    """
+    output_path = Path(output_path)
+    used, packed = compress(data, codec)
+    output_path = output_path.with_name(f"{output_path.name}{used.suffix}")
+
+    if source is not None and output_path.resolve() == Path(source).resolve():
+        raise CompressionError(
+            f"The {used.name} output of '{source}' would replace it, "
+            "use another output folder."
+        )
+
+    written = write_if_changed(
+        output_path, [used.name.encode(), packed], lambda file: file.write(packed)
+    )
+    return output_path, used, written
@@ -0,0 +1,179 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from mdutil.core.exceptions import MapBuilderError
+from mdutil.core.image_writer import ImageWriter, PngWriter, save_image
+from mdutil.core.img.preview import PreviewRenderer
+from mdutil.core.img.tileset import TilesetImage
+from mdutil.core.map_builder import MapImageBuilder
+from mdutil.core.tmx.model import LayerType
+from mdutil.core.util import Size
+
+
+def _render_thumbnail(
+    path: Path,
+    layers: Sequence[Tuple[str, TilesetImage.Priority]],
+    renderer: PreviewRenderer,
+    thumbnail_size: Optional[Size],
+) -> np.ndarray:
+    builder = MapImageBuilder(path)
+
+    # Maps don't need to define every layer
+    names = {layer.name for layer in builder.map_api.get_layers(LayerType.TILE)}
+    tilemap_array = builder.render([layer for layer in layers if layer[0] in names])
+
+    # The smallest integer scale that fits the map in the thumbnail
+    scale = renderer.scale
+    if thumbnail_size is not None:
+        height, width = tilemap_array.shape
+        scale = max(
+            scale,
+            -(-height // thumbnail_size.height),
+            -(-width // thumbnail_size.width),
+        )
+
+    return renderer.render(tilemap_array, builder.palette, scale)
+
+
+def _thumbnail_names(map_paths: Sequence[Path]) -> List[str]:
+    """Distinct names of the thumbnails of maps: the map name, or for maps sharing a
+    name their path from the folder holding all of them, and then their suffix"""
+    paths = [Path(path).resolve() for path in map_paths]
+    if not paths:
+        return []
+
+    root = Path(os.path.commonpath([path.parent for path in paths]))
+    stems = Counter(path.stem for path in paths)
+    names = [
+        (
+            path.stem
+            if stems[path.stem] == 1
+            else "_".join(path.relative_to(root).with_suffix("").parts)
+        )
+        for path in paths
+    ]
+
+    clashes = Counter(names)
+    names = [
+        f"{name}_{path.suffix.lstrip('.')}" if clashes[name] > 1 else name
+        for name, path in zip(names, paths)
+    ]
+
+    repeated = sorted(name for name, count in Counter(names).items() if count > 1)
+    if repeated:
+        raise MapBuilderError(
+            f"Maps would share the thumbnail names: {', '.join(repeated)}."
+        )
+
+    return names
+
+
+class ContactSheetBuilder:
+    """Render RGBA thumbnails of many maps and lay them out in a contact sheet.
+
+    Maps are rendered in parallel worker processes, and every map is downscaled by the
+    smallest integer factor that fits it in the thumbnail size before its colors are
+    expanded, so workers send back small RGBA arrays only. Thumbnails are centered in
+    grid cells of the thumbnail size, in the order of the maps.
+    """
+
+    def __init__(
+        self,
+        thumbnail_size: Optional[Size] = Size(128, 128),
+        columns: int = 8,
+        renderer: Optional[PreviewRenderer] = None,
+        jobs: Optional[int] = None,
+    ) -> None:
+        if columns < 1:
+            raise MapBuilderError("A contact sheet needs at least 1 column.")
+
+        self.thumbnail_size = thumbnail_size
+        self.columns = columns
+        self.renderer = renderer or PreviewRenderer()
+        self.jobs = jobs or os.cpu_count() or 1
+
+    def thumbnails(
+        self,
+        map_paths: Sequence[Path],
+        layers: Sequence[Tuple[str, TilesetImage.Priority]],
+    ) -> List[np.ndarray]:
+        """RGBA thumbnails of a combination of tile layers of every map"""
+        if not map_paths:
+            return []
+
+        count = len(map_paths)
+        with ProcessPoolExecutor(max_workers=min(self.jobs, count)) as pool:
+            return list(
+                pool.map(
+                    _render_thumbnail,
+                    map_paths,
+                    [layers] * count,
+                    [self.renderer] * count,
+                    [self.thumbnail_size] * count,
+                )
+            )
+
+    def sheet(self, thumbnails: Sequence[np.ndarray]) -> np.ndarray:
+        """Lay out thumbnails in a transparent RGBA image, row by row"""
+        if self.thumbnail_size is not None:
+            cell = self.thumbnail_size
+        else:
+            cell = Size(
+                max((thumb.shape[0] for thumb in thumbnails), default=0),
+                max((thumb.shape[1] for thumb in thumbnails), default=0),
+            )
+
+        columns = max(min(self.columns, len(thumbnails)), 1)
+        rows = -(-len(thumbnails) // columns)
+        sheet = np.zeros((rows * cell.height, columns * cell.width, 4), dtype=np.uint8)
+
+        for index, thumb in enumerate(thumbnails):
+            row, column = divmod(index, columns)
+            height, width = thumb.shape[:2]
+            y = row * cell.height + (cell.height - height) // 2
+            x = column * cell.width + (cell.width - width) // 2
+            sheet[y : y + height, x : x + width] = thumb
+
+        return sheet
+
+    def save(
+        self,
+        output_path: Union[str, Path],
+        map_paths: Sequence[Path],
+        lo_layer: Optional[str] = None,
+        hi_layer: Optional[str] = None,
+        thumbnail_suffix: Optional[str] = None,
+        writer: Optional[ImageWriter] = None,
+    ) -> List[Tuple[Path, bool]]:
+        """Save the contact sheet of a plane of every map with an image writer, png by
+        default, and, with a thumbnail suffix, the thumbnail of every map next to it,
+        named after the map and the suffix. Maps sharing a name are told apart by
+        their folders and suffixes. Images that are up to date are left untouched.
+
+        Returns:
+            List[Tuple[Path, bool]]: every image and whether it was written
+        """
+        names = _thumbnail_names(map_paths) if thumbnail_suffix is not None else []
+        thumbnails = self.thumbnails(
+            map_paths, MapImageBuilder._plane_layers(lo_layer, hi_layer)
+        )
+        output_path = Path(output_path)
+        writer = writer or PngWriter()
+
+        saved = []
+        if thumbnail_suffix is not None:
+            for name, thumb in zip(names, thumbnails):
+                path = output_path.with_name(
+                    f"{name}_{thumbnail_suffix}{writer.suffix}"
+                )
+                saved.append((path, save_image(path, thumb, None, writer)))
+
+        saved.append(
+            (output_path, save_image(output_path, self.sheet(thumbnails), None, writer))
+        )
+        return saved
@@ -20,3 +20,15 @@ class TiledMapError(Exception):
 
 class PropertyError(Exception):
     pass
+
+
+class PaletteError(Exception):
+    pass
+
+
+class RequestError(Exception):
+    pass
+
+
+class CompressionError(Exception):
+    pass
@@ -0,0 +1,204 @@
+import io
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple, Union
+
+import numpy as np
+
+from mdutil.core.exceptions import TilesetError
+from mdutil.core.img.tileset import TilesetImage
+from mdutil.core.map_builder import save_png
+from mdutil.core.map_converter import MapConverter
+from mdutil.core.tmx.model import FLIPPED_HORIZONTALLY, FLIPPED_VERTICALLY
+from mdutil.core.tmx.writer import JsonMapWriter, TileDataEncoder, XmlMapWriter
+from mdutil.core.util import Size, write_if_changed
+
+# Tiled flags of the no flip, h, v and hv variants of a tile
+_VARIANT_FLAGS = np.array(
+    [
+        0,
+        FLIPPED_HORIZONTALLY,
+        FLIPPED_VERTICALLY,
+        FLIPPED_HORIZONTALLY | FLIPPED_VERTICALLY,
+    ],
+    dtype=np.uint32,
+)
+
+
+@dataclass
+class ImageTiles:
+    """Deduplicated tiles of an image and the gid grid that rebuilds it"""
+
+    tiles: np.ndarray
+    gids: np.ndarray
+
+    @property
+    def cells(self) -> int:
+        return self.gids.size
+
+
+class ImageMapConverter:
+    """Convert an indexed image into a deduplicated tileset and a tiled map.
+
+    The image is sliced and validated as a tileset, so every tile must use colors of
+    a single palette line. Tiles are deduplicated by packing every tile, and with
+    flips its mirrored copies, in opaque values compared all at once with np.unique.
+    Empty tiles, with every pixel at color index 0, become empty cells.
+    """
+
+    def __init__(
+        self,
+        tile_size: Size = Size(8, 8),
+        flips: bool = True,
+        tileset_columns: int = 16,
+        layer_name: str = "lo",
+        encoder: Optional[TileDataEncoder] = None,
+    ) -> None:
+        self.tile_size = tile_size
+        self.flips = flips
+        self.tileset_columns = tileset_columns
+        self.layer_name = layer_name
+        self.encoder = encoder or TileDataEncoder("base64", "zstd")
+
+    def slice(self, image: TilesetImage) -> ImageTiles:
+        height, width = image.tileset_array.shape
+        rows, columns = image.tiles_lo.shape[:2]
+        if (rows * self.tile_size.height, columns * self.tile_size.width) != (
+            height,
+            width,
+        ):
+            raise TilesetError(
+                f"The size of image {image.path} is not a multiple of the tile size."
+            )
+
+        tiles = image.tiles_lo.reshape(-1, *self.tile_size)
+        variants = [tiles]
+        if self.flips:
+            variants += [
+                tiles[:, :, ::-1],
+                tiles[:, ::-1, :],
+                tiles[:, ::-1, ::-1],
+            ]
+        stacked = np.ascontiguousarray(np.concatenate(variants)).reshape(
+            len(variants) * len(tiles), -1
+        )
+
+        keys = stacked.view(np.dtype((np.void, stacked.shape[1])))[:, 0]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        ranks = inverse.reshape(len(variants), len(tiles))
+
+        # The lowest ranked variant is shared by all the flipped copies of a tile
+        canonical = ranks.min(axis=0)
+        empty = ~stacked[: len(tiles)].any(axis=1)
+
+        # Tileset tiles in order of first appearance in the image, each one stored as
+        # it's drawn where it first appears
+        cells = np.flatnonzero(~empty)
+        used, appearance = np.unique(canonical[cells], return_index=True)
+        order = np.argsort(appearance, kind="stable")
+        used, origins = used[order], cells[appearance[order]]
+        tile_ids = np.zeros(len(unique), dtype=np.uint32)
+        tile_ids[used] = np.arange(1, len(used) + 1)
+        origin = np.zeros(len(unique), dtype=np.int64)
+        origin[used] = origins
+
+        # The first variant of the stored tile that draws every cell, unflipped
+        # whenever the cell looks the same as the stored tile
+        flip = (ranks[:, origin[canonical]] == ranks[0]).argmax(axis=0)
+
+        gids = tile_ids[canonical] | _VARIANT_FLAGS[flip]
+        gids[empty] = 0
+
+        return ImageTiles(tiles[origins], gids.reshape(rows, columns))
+
+    def tileset_array(self, tiles: np.ndarray) -> np.ndarray:
+        """Lay out tiles in a grid of color indexes, row by row"""
+        columns = max(min(self.tileset_columns, len(tiles)), 1)
+        rows = -(-len(tiles) // columns)
+        grid = np.zeros((rows * columns, *self.tile_size), dtype=np.uint8)
+        grid[: len(tiles)] = tiles
+
+        return (
+            grid.reshape(rows, columns, *self.tile_size)
+            .swapaxes(1, 2)
+            .reshape(rows * self.tile_size.height, columns * self.tile_size.width)
+        )
+
+    def convert(
+        self, input_path: Union[str, Path], output_path: Union[str, Path]
+    ) -> Tuple[List[Tuple[Path, bool]], ImageTiles]:
+        """Convert an indexed image into a map in tmx or tmj format, depending on the
+        output suffix, and its tileset image, saved next to it with the suffix
+        _tileset. Files that are up to date are left untouched.
+
+        Returns:
+            Tuple[List[Tuple[Path, bool]], ImageTiles]: every file and whether it was
+            written, and the deduplicated tiles
+        """
+        input_path, output_path = Path(input_path), Path(output_path)
+        map_format = MapConverter.map_format(output_path)
+
+        image = TilesetImage(self.tile_size, input_path)
+        image_tiles = self.slice(image)
+        if not len(image_tiles.tiles):
+            raise TilesetError(f"Image {input_path} has no tiles that aren't empty.")
+
+        tileset_path = output_path.with_name(f"{output_path.stem}_tileset.png")
+        tileset_array = self.tileset_array(image_tiles.tiles)
+        saved = [(tileset_path, save_png(tileset_path, tileset_array, image.palette))]
+
+        rows, columns = image_tiles.gids.shape
+        attributes = {
+            "version": "1.10",
+            "orientation": "orthogonal",
+            "renderorder": "right-down",
+            "width": columns,
+            "height": rows,
+            "tilewidth": self.tile_size.width,
+            "tileheight": self.tile_size.height,
+            "infinite": False,
+            "nextlayerid": 2,
+            "nextobjectid": 1,
+        }
+        if map_format == "tmj":
+            attributes["type"] = "map"
+
+        tileset = {
+            "firstgid": 1,
+            "name": tileset_path.stem,
+            "tilewidth": self.tile_size.width,
+            "tileheight": self.tile_size.height,
+            "tilecount": len(image_tiles.tiles),
+            "columns": tileset_array.shape[1] // self.tile_size.width,
+            "image": tileset_path.name,
+            "imagewidth": tileset_array.shape[1],
+            "imageheight": tileset_array.shape[0],
+        }
+        layer = {
+            "id": 1,
+            "name": self.layer_name,
+            "type": "tilelayer",
+            "width": columns,
+            "height": rows,
+            "data": image_tiles.gids.ravel(),
+        }
+
+        def write(file: BinaryIO) -> None:
+            with io.TextIOWrapper(file, encoding="utf-8") as text:
+                writer_class = XmlMapWriter if map_format == "tmx" else JsonMapWriter
+                writer = writer_class(text, self.encoder)
+                writer.begin(attributes, [], [tileset])
+                writer.write_layer(layer)
+                writer.end()
+
+        content = [
+            map_format.encode(),
+            self.layer_name,
+            tileset_path.name,
+            repr(self.tile_size),
+            repr(sorted(self.encoder.attributes.items())),
+            image_tiles.gids,
+        ]
+        saved.append((output_path, write_if_changed(output_path, content, write)))
+
+        return saved, image_tiles
@@ -0,0 +1,271 @@
+import os
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Tuple, Type, Union
+
+import numpy as np
+
+from mdutil.core.exceptions import MapBuilderError
+from mdutil.core.img.palette import Palette
+from mdutil.core.util import write_if_changed
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# PNG color types
+_PNG_GRAYSCALE = 0
+_PNG_INDEXED = 3
+_PNG_RGBA = 6
+
+# PNG row filter types, adaptive picks the best of them for every row
+PNG_FILTERS = ["none", "sub", "up", "average", "paeth"]
+ADAPTIVE = "adaptive"
+
+
+class ImageWriter(ABC):
+    name: str
+    # Suffix of the files saved with the writer
+    suffix: str
+
+    @abstractmethod
+    def write(
+        self, file: BinaryIO, image: np.ndarray, palette: Optional[Palette]
+    ) -> None:
+        """Write color indexes with shape (height, width), or RGBA pixels with shape
+        (height, width, 4), to a binary file"""
+        raise NotImplementedError
+
+    @property
+    def options(self) -> str:
+        """Every setting that changes the written bytes"""
+        return self.name
+
+
+class RawWriter(ImageWriter):
+    """Pixels row by row, one byte per color index or four per RGBA pixel, without
+    header or palette"""
+
+    name = "bin"
+    suffix = ".bin"
+
+    def write(
+        self, file: BinaryIO, image: np.ndarray, palette: Optional[Palette]
+    ) -> None:
+        file.write(np.ascontiguousarray(image, dtype=np.uint8).tobytes())
+
+
+class NpyWriter(ImageWriter):
+    """Pixels as a numpy array file, for tooling. The palette is not included."""
+
+    name = "npy"
+    suffix = ".npy"
+
+    def write(
+        self, file: BinaryIO, image: np.ndarray, palette: Optional[Palette]
+    ) -> None:
+        np.save(file, image, allow_pickle=False)
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    header = chunk_type + data
+    return struct.pack(">I", len(data)) + header + struct.pack(">I", zlib.crc32(header))
+
+
+def _adler32_combine(adler1: int, adler2: int, size2: int) -> int:
+    """Adler32 checksum of two joined buffers from the checksums of both, as
+    zlib's adler32_combine"""
+    base = 65521
+    remainder = size2 % base
+    sum1 = (adler1 & 0xFFFF) + (adler2 & 0xFFFF) + base - 1
+    sum2 = remainder * (adler1 & 0xFFFF) % base
+    sum2 += (adler1 >> 16) + (adler2 >> 16) + base - remainder
+
+    return sum1 % base | (sum2 % base) << 16
+
+
+def _filter_rows(
+    rows: np.ndarray, above: np.ndarray, bpp: int, png_filter: str
+) -> np.ndarray:
+    """Filter rows of bytes with the row above the first one, prefixing every row
+    with its filter type. Filters only read unfiltered bytes, so every filter of
+    every row is computed at once."""
+    up = np.vstack((above, rows[:-1]))[: len(rows)]
+    left = np.zeros_like(rows)
+    left[:, bpp:] = rows[:, :-bpp]
+    up_left = np.zeros_like(up)
+    up_left[:, bpp:] = up[:, :-bpp]
+
+    def paeth() -> np.ndarray:
+        a, b, c = (side.astype(np.int16) for side in (left, up, up_left))
+        pa, pb, pc = np.abs(b - c), np.abs(a - c), np.abs(a + b - 2 * c)
+        predictor = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+        return rows - predictor.astype(np.uint8)
+
+    filters = {
+        "none": lambda: rows,
+        "sub": lambda: rows - left,
+        "up": lambda: rows - up,
+        "average": lambda: rows - ((left.astype(np.uint16) + up) >> 1).astype(np.uint8),
+        "paeth": paeth,
+    }
+
+    output = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+    if png_filter != ADAPTIVE:
+        output[:, 0] = PNG_FILTERS.index(png_filter)
+        output[:, 1:] = filters[png_filter]()
+        return output
+
+    # Minimum sum of absolute differences, taking filtered bytes as signed
+    candidates = np.stack([filters[name]() for name in PNG_FILTERS])
+    costs = np.abs(candidates.view(np.int8).astype(np.int32)).sum(axis=2)
+    best = costs.argmin(axis=0)
+    output[:, 0] = best
+    output[:, 1:] = candidates[best, np.arange(len(best))]
+
+    return output
+
+
+class PngWriter(ImageWriter):
+    """Encode png images with a selectable zlib level and row filter.
+
+    Images are split in ranges of rows of about chunk_size bytes, and every range is
+    filtered and deflated on its own in a thread pool, as zlib and numpy release the
+    GIL. Ranges but the last end with a sync flush, so their deflate streams join
+    into a single valid stream. The range size doesn't depend on the number of
+    threads, so the same image always gives the same file.
+
+    Without a filter, indexed images aren't filtered and RGBA images use adaptive
+    filtering, as the png specification recommends.
+    """
+
+    name = "png"
+    suffix = ".png"
+
+    def __init__(
+        self,
+        level: int = 6,
+        png_filter: Optional[str] = None,
+        jobs: Optional[int] = None,
+        chunk_size: int = 1 << 20,
+    ) -> None:
+        if not 0 <= level <= 9:
+            raise MapBuilderError(f"Invalid zlib compression level {level}.")
+        if png_filter not in (None, ADAPTIVE, *PNG_FILTERS):
+            raise MapBuilderError(f"Unknown png filter '{png_filter}'.")
+
+        self.level = level
+        self.png_filter = png_filter
+        self.jobs = jobs or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    @property
+    def options(self) -> str:
+        return f"{self.name} {self.level} {self.png_filter} {self.chunk_size}"
+
+    def _deflate(
+        self, rows: np.ndarray, above: np.ndarray, bpp: int, png_filter: str, last: bool
+    ) -> Tuple[bytes, int, int]:
+        """Deflate a range of rows, with the adler32 checksum and size of the filtered
+        rows"""
+        filtered = _filter_rows(rows, above, bpp, png_filter)
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        data = compressor.compress(filtered)
+        data += compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+        return data, zlib.adler32(filtered), filtered.size
+
+    def write(
+        self, file: BinaryIO, image: np.ndarray, palette: Optional[Palette]
+    ) -> None:
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = image.shape[:2]
+
+        if image.ndim == 3:
+            color_type, bpp, png_filter = _PNG_RGBA, 4, self.png_filter or ADAPTIVE
+        else:
+            color_type = _PNG_GRAYSCALE if palette is None else _PNG_INDEXED
+            bpp, png_filter = 1, self.png_filter or "none"
+
+        file.write(PNG_SIGNATURE)
+        file.write(
+            _png_chunk(
+                b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+            )
+        )
+        if color_type == _PNG_INDEXED:
+            colors = np.asarray(palette.palette).astype(np.uint8).tobytes()
+            file.write(_png_chunk(b"PLTE", colors))
+
+        rows = image.reshape(height, width * bpp)
+        step = max(self.chunk_size // max(rows.shape[1], 1), 1)
+        starts = range(0, max(height, 1), step)
+        zero = np.zeros((1, rows.shape[1]), dtype=np.uint8)
+
+        def deflate(start: int) -> Tuple[bytes, int, int]:
+            above = rows[start - 1 : start] if start else zero
+            last = start + step >= height
+            return self._deflate(
+                rows[start : start + step], above, bpp, png_filter, last
+            )
+
+        # Every range goes in its own IDAT chunk, the first one after the zlib header
+        # and the last one before the checksum of the whole stream
+        prefix = zlib.compress(b"", self.level)[:2]
+        checksum = zlib.adler32(b"")
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            for index, (data, adler, size) in enumerate(pool.map(deflate, starts)):
+                checksum = _adler32_combine(checksum, adler, size)
+                if index == len(starts) - 1:
+                    data += struct.pack(">I", checksum)
+                file.write(_png_chunk(b"IDAT", prefix + data))
+                prefix = b""
+
+        file.write(_png_chunk(b"IEND", b""))
+
+
+IMAGE_WRITERS: Dict[str, Type[ImageWriter]] = {
+    writer.name: writer for writer in (PngWriter, RawWriter, NpyWriter)
+}
+
+
+def create_writer(
+    name: str,
+    level: int = 6,
+    png_filter: Optional[str] = None,
+    jobs: Optional[int] = None,
+) -> ImageWriter:
+    """Writer of an image format by name. Png options are ignored by other formats."""
+    if name == PngWriter.name:
+        return PngWriter(level, png_filter, jobs)
+
+    try:
+        return IMAGE_WRITERS[name]()
+    except KeyError:
+        raise MapBuilderError(f"Unknown image format '{name}'.")
+
+
+def save_image(
+    output_path: Union[str, Path],
+    image: np.ndarray,
+    palette: Optional[Palette],
+    writer: Optional[ImageWriter] = None,
+) -> bool:
+    """Save color indexes or RGBA pixels with a writer, png by default, when they, the
+    palette or the writer options changed.
+
+    Returns:
+        bool: whether the image was written
+    """
+    writer = writer or PngWriter()
+    content = [writer.options, image]
+    if palette is not None:
+        content.append(palette.palette)
+
+    try:
+        return write_if_changed(
+            output_path, content, lambda file: writer.write(file, image, palette)
+        )
+    except OSError as e:
+        raise OSError(f"Error while trying to save image file {output_path}.") from e
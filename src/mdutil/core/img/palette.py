@@ -1,23 +1,150 @@
-from typing import List
+from typing import Dict, List, Optional, Sequence
 
 import numpy as np
 from PIL import Image
 
+from mdutil.core.exceptions import PaletteError
+
+# Megadrive CRAM layout
+PALETTE_LINES = 4
+LINE_COLORS = 16
+PALETTE_COLORS = PALETTE_LINES * LINE_COLORS
+
+# Color indexes at or above this value encode high priority tiles
+HI_PRIORITY_OFFSET = 128
+
 
 class Palette:
     def __init__(self, image_path: str) -> None:
         self.palette = self._load(image_path)
 
     def _load(self, path: str) -> np.ndarray:
-        with Image.open(path).convert("P") as img:
-            # Generate an extended 192 color palette
-            raw_pal = np.array(img.getpalette()).reshape(-1, 3)
-            extended_pal = np.tile(raw_pal[:64], (3, 1)).flatten()
+        with Image.open(path) as img:
+            return self._from_image(img)
+
+    @classmethod
+    def _from_image(cls, img: Image.Image) -> np.ndarray:
+        # The palette of an indexed image is read without decoding its pixels
+        if img.mode != "P":
+            img = img.convert("P")
+
+        raw_pal = np.array(img.getpalette()).reshape(-1, 3)
+        return cls._extend(raw_pal)
+
+    @classmethod
+    def from_image(cls, img: Image.Image) -> "Palette":
+        """Create a palette from an already opened image"""
+        palette = cls.__new__(cls)
+        palette.palette = cls._from_image(img)
+        return palette
+
+    @staticmethod
+    def _extend(raw_pal: np.ndarray) -> np.ndarray:
+        # Generate an extended 192 color palette
+        raw_pal = raw_pal[:PALETTE_COLORS]
+        if len(raw_pal) < PALETTE_COLORS:
+            padding = np.zeros((PALETTE_COLORS - len(raw_pal), 3), dtype=raw_pal.dtype)
+            raw_pal = np.vstack((raw_pal, padding))
+
+        return np.tile(raw_pal, (3, 1)).flatten()
 
-            return extended_pal
+    @classmethod
+    def from_lines(cls, lines: np.ndarray) -> "Palette":
+        """Create a palette from an array of shape (4, 16, 3)"""
+        palette = cls.__new__(cls)
+        palette.palette = cls._extend(np.asarray(lines).reshape(-1, 3))
+        return palette
+
+    @property
+    def lines(self) -> np.ndarray:
+        """The four palette lines as an array of shape (4, 16, 3)"""
+        return self.palette[: PALETTE_COLORS * 3].reshape(PALETTE_LINES, LINE_COLORS, 3)
 
     def as_list(self) -> List[int]:
         return self.palette.tolist()
 
     def get_index_for_tile(self, tile: np.ndarray) -> List[int]:
         return np.unique(tile // 16).tolist()
+
+
+class PaletteAllocator:
+    """Merge the palettes of several tilesets into the four Megadrive palette lines.
+
+    Only the lines a tileset actually uses are allocated. Identical lines are shared
+    between tilesets, and a line keeps its original slot whenever that slot is free, so
+    a single tileset is never remapped.
+    """
+
+    def __init__(self) -> None:
+        self._slots: List[Optional[bytes]] = [None] * PALETTE_LINES
+        self._lines = np.zeros((PALETTE_LINES, LINE_COLORS, 3), dtype=np.int64)
+
+    def add(self, palette: Palette, used_lines: Sequence[int]) -> np.ndarray:
+        """Allocate the used lines of a palette and return its color index LUT.
+
+        Args:
+            palette (Palette): palette of the tileset
+            used_lines (Sequence[int]): palette lines referenced by the tileset pixels
+
+        Raises:
+            PaletteError: the merged palettes need more than four lines
+
+        Returns:
+            np.ndarray: 256 entry lookup table to remap the tileset color indexes
+        """
+        line_map: Dict[int, int] = {}
+
+        for line in sorted(set(int(line) for line in used_lines)):
+            if line >= PALETTE_LINES:
+                raise PaletteError(
+                    f"Color indexes in palette line {line} can't be mapped to CRAM."
+                )
+
+            colors = palette.lines[line]
+            key = colors.astype(np.uint8).tobytes()
+
+            if key in self._slots:
+                line_map[line] = self._slots.index(key)
+                continue
+
+            slot = line if self._slots[line] is None else self._free_slot()
+            self._slots[slot] = key
+            self._lines[slot] = colors
+            line_map[line] = slot
+
+        return self._build_lut(line_map)
+
+    def _free_slot(self) -> int:
+        for slot, key in enumerate(self._slots):
+            if key is None:
+                return slot
+
+        raise PaletteError(
+            f"The tileset palettes need more than {PALETTE_LINES} unique palette lines."
+        )
+
+    @staticmethod
+    def _build_lut(line_map: Dict[int, int]) -> np.ndarray:
+        lut = np.arange(256, dtype=np.uint8)
+        for src, dst in line_map.items():
+            lut[src * LINE_COLORS : (src + 1) * LINE_COLORS] = np.arange(
+                dst * LINE_COLORS, (dst + 1) * LINE_COLORS
+            )
+
+        # High priority indexes follow the low priority mapping
+        lut[HI_PRIORITY_OFFSET:] = lut[:HI_PRIORITY_OFFSET] + HI_PRIORITY_OFFSET
+        return lut
+
+    def merged_palette(self, fallback: Palette = None) -> Palette:
+        """Build the merged palette. Unallocated lines are taken from the fallback palette"""
+        lines = self._lines.copy()
+        if fallback is not None:
+            for slot, key in enumerate(self._slots):
+                if key is None:
+                    lines[slot] = fallback.lines[slot]
+
+        return Palette.from_lines(lines)
+
+    @staticmethod
+    def is_identity(lut: np.ndarray) -> bool:
+        return bool(np.array_equal(lut, np.arange(256, dtype=np.uint8)))
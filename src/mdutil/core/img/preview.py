@@ -0,0 +1,89 @@
+from typing import Optional
+
+import numpy as np
+
+from mdutil.core.exceptions import MapBuilderError
+from mdutil.core.img.palette import LINE_COLORS, Palette
+
+# Downscale methods
+STRIDE = "stride"
+AVERAGE = "average"
+
+# Largest block averaged with packed channels, 255 * 16 * 16 fits in 16 bits
+_MAX_PACKED_SCALE = 16
+
+
+def rgba_lut(palette: Optional[Palette], transparent: bool = False) -> np.ndarray:
+    """RGBA color of every color index as an array of shape (256, 4).
+
+    Indexes the palette doesn't define are opaque black, as with Pillow. With
+    transparent, the first color of every palette line is fully transparent.
+    """
+    lut = np.zeros((256, 4), dtype=np.uint8)
+    lut[:, 3] = 255
+    if palette is not None:
+        colors = palette.palette.reshape(-1, 3)[: len(lut)]
+        lut[: len(colors), :3] = colors
+
+    if transparent:
+        lut[::LINE_COLORS, 3] = 0
+
+    return lut
+
+
+class PreviewRenderer:
+    """Expand arrays of color indexes to RGBA images, optionally downscaled.
+
+    Colors are expanded with a single gather from a palette lookup table, with every
+    RGBA color packed in a word. Striding picks one pixel of every block before the
+    gather, so only the output pixels are expanded. Block averaging gathers every
+    pixel and sums the blocks through reshaped views, which gives smoother previews
+    of detailed maps.
+    """
+
+    def __init__(
+        self, scale: int = 1, method: str = STRIDE, transparent: bool = False
+    ) -> None:
+        if scale < 1:
+            raise MapBuilderError("The preview scale must be at least 1.")
+        if method not in (STRIDE, AVERAGE):
+            raise MapBuilderError(f"Unknown downscale method '{method}'.")
+
+        self.scale = scale
+        self.method = method
+        self.transparent = transparent
+
+    def render(
+        self,
+        tilemap_array: np.ndarray,
+        palette: Optional[Palette],
+        scale: Optional[int] = None,
+    ) -> np.ndarray:
+        """Expand color indexes to an RGBA image with shape (height, width, 4),
+        downscaled by an integer factor. Defaults to the scale of the renderer."""
+        scale = scale or self.scale
+        lut = rgba_lut(palette, self.transparent)
+
+        if scale > 1 and self.method == STRIDE:
+            tilemap_array = tilemap_array[::scale, ::scale]
+        if scale == 1 or self.method == STRIDE:
+            # Gather whole pixels packed in 32 bit words
+            rgba = lut.view(np.uint32).ravel().take(tilemap_array)
+            return rgba.view(np.uint8).reshape(*tilemap_array.shape, 4)
+
+        # Partial blocks at the right and bottom edges are dropped
+        height, width = (side // scale for side in tilemap_array.shape)
+        tilemap_array = tilemap_array[: height * scale, : width * scale]
+
+        if scale > _MAX_PACKED_SCALE:
+            blocks = lut[tilemap_array].reshape(height, scale, width, scale, 4)
+            total = blocks.sum(axis=(1, 3), dtype=np.uint32)
+        else:
+            # Channels are summed as 16 bit lanes of 64 bit words, which can't carry
+            # into each other for blocks of up to 16x16 pixels
+            packed = lut.astype(np.uint16).view(np.uint64).ravel().take(tilemap_array)
+            rows = packed.reshape(height, scale, -1).sum(axis=1, dtype=np.uint64)
+            words = rows.reshape(height, width, scale).sum(axis=2, dtype=np.uint64)
+            total = words.view(np.uint16).reshape(height, width, 4).astype(np.uint32)
+
+        return ((total + scale * scale // 2) // (scale * scale)).astype(np.uint8)
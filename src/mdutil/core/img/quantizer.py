@@ -0,0 +1,292 @@
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+from mdutil.core.exceptions import PaletteError, TilesetError
+from mdutil.core.img.palette import LINE_COLORS, PALETTE_LINES, Palette
+from mdutil.core.img.tileset import TilesetImage
+from mdutil.core.util import Size
+
+# Megadrive colors have 3 bits per channel, packed as r | g << 3 | b << 6
+MD_COLORS = 512
+TRANSPARENT = MD_COLORS
+
+# Channel levels of every packed color, plus the transparent entry
+COLOR_LEVELS = np.vstack(
+    (
+        np.stack([(np.arange(MD_COLORS) >> shift) & 7 for shift in (0, 3, 6)], axis=1),
+        np.zeros((1, 3), dtype=np.int64),
+    )
+).astype(np.float64)
+
+# Nearest level of every 8 bit channel value
+_LEVEL_LUT = np.rint(np.arange(256) * 7 / 255).astype(np.uint16)
+
+# Entry 0 of every palette line is transparent
+_OPAQUE_COLORS = LINE_COLORS - 1
+
+
+def to_md_colors(rgb: np.ndarray) -> np.ndarray:
+    """Pack an array of 8 bit RGB values into Megadrive colors"""
+    rgb = np.asarray(rgb)
+    return (
+        _LEVEL_LUT[rgb[..., 0]]
+        | _LEVEL_LUT[rgb[..., 1]] << 3
+        | _LEVEL_LUT[rgb[..., 2]] << 6
+    )
+
+
+class TilesetQuantizer:
+    """Convert true color tilesets into indexed Megadrive tilesets.
+
+    Colors are reduced to the 9 bit Megadrive color space and every tile gets one of
+    up to four palette lines of 15 colors, plus the transparent entry 0. When the
+    colors of all tiles fit in the palette lines they are packed without loss,
+    otherwise the palettes are refined k-means style: every tile takes the line with
+    the lowest error and every line is rebuilt from the colors of its tiles.
+
+    Nearest colors are found through a lookup table over the 512 packed colors for
+    every palette line, so pixels are never compared against palettes one by one.
+    """
+
+    def __init__(
+        self,
+        tile_size: Size,
+        margin: int = 0,
+        spacing: int = 0,
+        lines: int = PALETTE_LINES,
+        transparent: Optional[Tuple[int, int, int]] = None,
+        iterations: int = 8,
+    ) -> None:
+        if not 1 <= lines <= PALETTE_LINES:
+            raise PaletteError(f"Palette lines must be between 1 and {PALETTE_LINES}.")
+
+        self.tile_size = tile_size
+        self.margin = margin
+        self.spacing = spacing
+        self.lines = lines
+        self.transparent = transparent
+        self.iterations = iterations
+
+        # Sum of the squared channel level differences of the last quantization
+        self.error = 0.0
+
+    def _packed_colors(self, img: Image.Image) -> np.ndarray:
+        rgba = np.array(img.convert("RGBA"))
+        packed = to_md_colors(rgba)
+
+        clear = rgba[..., 3] < 128
+        if self.transparent is not None:
+            clear |= np.all(rgba[..., :3] == self.transparent, axis=-1)
+        packed[clear] = TRANSPARENT
+
+        return packed
+
+    def _tile_map(self, shape: Tuple[int, int]) -> np.ndarray:
+        """Tile index of every pixel, -1 for margins and spacing"""
+        rows, columns = TilesetImage.grid_size(
+            np.empty(shape, dtype=np.uint8), self.tile_size, self.margin, self.spacing
+        )
+
+        def axis_tiles(length: int, tile: int, count: int) -> np.ndarray:
+            offset = np.arange(length) - self.margin
+            index, inner = np.divmod(offset, tile + self.spacing)
+            inside = (offset >= 0) & (inner < tile) & (index < count)
+            return np.where(inside, index, -1)
+
+        row_index = axis_tiles(shape[0], self.tile_size.height, rows)
+        column_index = axis_tiles(shape[1], self.tile_size.width, columns)
+
+        tile_map = row_index[:, None] * columns + column_index[None, :]
+        tile_map[(row_index[:, None] < 0) | (column_index[None, :] < 0)] = -1
+
+        return tile_map
+
+    @staticmethod
+    def _pack_lines(
+        tile_colors: List[np.ndarray], lines: int
+    ) -> Optional[List[np.ndarray]]:
+        """Pack the color sets of all tiles in palette lines without loss, if possible"""
+        sets = sorted({frozenset(colors.tolist()) for colors in tile_colors}, key=len)
+        packed: List[set] = []
+
+        for colors in reversed(sets):
+            if len(colors) > _OPAQUE_COLORS:
+                return None
+
+            # Prefer the line that shares most colors with the tile
+            best = None
+            for line in packed:
+                if len(line | colors) <= _OPAQUE_COLORS:
+                    if best is None or len(line & colors) > len(best & colors):
+                        best = line
+            if best is None:
+                if len(packed) == lines:
+                    return None
+                packed.append(set(colors))
+            else:
+                best |= colors
+
+        return [np.array(sorted(line), dtype=np.int64) for line in packed]
+
+    @staticmethod
+    def _line_colors(histogram: np.ndarray) -> np.ndarray:
+        """Choose up to 15 packed colors representing a weighted color histogram"""
+        used = np.flatnonzero(histogram)
+        if len(used) <= _OPAQUE_COLORS:
+            return used
+
+        points, weights = COLOR_LEVELS[used], histogram[used]
+        centers = points[np.argsort(-weights, kind="stable")[:_OPAQUE_COLORS]]
+
+        for _ in range(16):
+            distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=-1)
+            nearest = distances.argmin(axis=1)
+
+            totals = np.bincount(nearest, weights, minlength=_OPAQUE_COLORS)
+            sums = np.stack(
+                [
+                    np.bincount(nearest, weights * points[:, axis], _OPAQUE_COLORS)
+                    for axis in range(3)
+                ],
+                axis=1,
+            )
+            updated = np.where(
+                totals[:, None] > 0, sums / np.maximum(totals, 1)[:, None], centers
+            )
+            if np.allclose(updated, centers):
+                break
+            centers = updated
+
+        levels = np.clip(np.rint(centers), 0, 7).astype(np.int64)
+        return np.unique(levels[:, 0] | levels[:, 1] << 3 | levels[:, 2] << 6)
+
+    @staticmethod
+    def _nearest(palettes: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Lookup tables with the nearest palette entry and its error for every packed
+        color in every palette line"""
+        indexes = np.zeros((len(palettes), MD_COLORS + 1), dtype=np.uint8)
+        errors = np.zeros((len(palettes), MD_COLORS + 1), dtype=np.float64)
+
+        for line, colors in enumerate(palettes):
+            if not len(colors):
+                errors[line, :TRANSPARENT] = np.inf
+                continue
+
+            distances = (
+                (COLOR_LEVELS[:TRANSPARENT, None, :] - COLOR_LEVELS[None, colors, :])
+                ** 2
+            ).sum(axis=-1)
+            nearest = distances.argmin(axis=1)
+            indexes[line, :TRANSPARENT] = nearest + 1
+            errors[line, :TRANSPARENT] = distances[np.arange(MD_COLORS), nearest]
+
+        return indexes, errors
+
+    def quantize(self, img: Image.Image) -> Tuple[np.ndarray, Palette]:
+        """Quantize a true color image.
+
+        Returns:
+            Tuple[np.ndarray, Palette]: the color indexes of the indexed image and its
+            palette
+        """
+        packed = self._packed_colors(img)
+        tile_map = self._tile_map(packed.shape)
+        tile_count = int(tile_map.max()) + 1
+        if tile_count <= 0:
+            raise TilesetError("The image is smaller than a single tile.")
+
+        # Every distinct (tile, color) pair with its pixel count
+        inside = tile_map >= 0
+        keys = tile_map[inside].astype(np.int64) * (MD_COLORS + 1) + packed[inside]
+        pairs, counts = np.unique(keys, return_counts=True)
+        pair_tiles, pair_colors = np.divmod(pairs, MD_COLORS + 1)
+
+        opaque = pair_colors != TRANSPARENT
+        pair_tiles, pair_colors = pair_tiles[opaque], pair_colors[opaque]
+        counts = counts[opaque]
+
+        bounds = np.searchsorted(pair_tiles, np.arange(1, tile_count))
+        palettes = self._pack_lines(np.split(pair_colors, bounds), self.lines)
+
+        def assign_lines(errors: np.ndarray) -> np.ndarray:
+            # Total error of every tile with every palette line
+            tile_errors = np.stack(
+                [
+                    np.bincount(
+                        pair_tiles, counts * line_errors[pair_colors], tile_count
+                    )
+                    for line_errors in errors
+                ]
+            )
+            assign = tile_errors.argmin(axis=0)
+            self.error = float(tile_errors[assign, np.arange(tile_count)].sum())
+            return assign
+
+        if palettes is not None:
+            indexes, errors = self._nearest(palettes)
+            assign = assign_lines(errors)
+        else:
+            # Start from tiles grouped by average brightness
+            totals = np.bincount(pair_tiles, counts, minlength=tile_count)
+            brightness = np.bincount(
+                pair_tiles,
+                counts * COLOR_LEVELS[pair_colors].sum(axis=1),
+                minlength=tile_count,
+            ) / np.maximum(totals, 1)
+            assign = np.empty(tile_count, dtype=np.int64)
+            assign[np.argsort(brightness, kind="stable")] = (
+                np.arange(tile_count) * self.lines // tile_count
+            )
+
+            for _ in range(self.iterations):
+                histograms = np.bincount(
+                    assign[pair_tiles] * MD_COLORS + pair_colors,
+                    counts,
+                    minlength=self.lines * MD_COLORS,
+                ).reshape(self.lines, MD_COLORS)
+                palettes = [self._line_colors(hist) for hist in histograms]
+
+                indexes, errors = self._nearest(palettes)
+                updated = assign_lines(errors)
+                if np.array_equal(updated, assign):
+                    break
+                assign = updated
+            else:
+                assign = updated
+
+        return self._indexed(packed, tile_map, assign, palettes, indexes)
+
+    @staticmethod
+    def _indexed(
+        packed: np.ndarray,
+        tile_map: np.ndarray,
+        assign: np.ndarray,
+        palettes: List[np.ndarray],
+        indexes: np.ndarray,
+    ) -> Tuple[np.ndarray, Palette]:
+        inside = tile_map >= 0
+        lines = np.zeros(packed.shape, dtype=np.int64)
+        lines[inside] = assign[tile_map[inside]]
+
+        indexed = (lines * LINE_COLORS + indexes[lines, packed]).astype(np.uint8)
+        indexed[~inside] = 0
+
+        rgb = np.zeros((PALETTE_LINES, LINE_COLORS, 3), dtype=np.int64)
+        for line, colors in enumerate(palettes):
+            rgb[line, 1 : len(colors) + 1] = COLOR_LEVELS[colors] * 36
+
+        return indexed, Palette.from_lines(rgb)
+
+    def convert(
+        self, input_path: Union[str, Path], output_path: Union[str, Path]
+    ) -> None:
+        """Quantize a true color image file and save it as an indexed png"""
+        with Image.open(input_path) as img:
+            indexed, palette = self.quantize(img)
+
+        with Image.fromarray(indexed, "P") as output:
+            output.putpalette(palette.as_list())
+            output.save(output_path, format="PNG", optimize=True)
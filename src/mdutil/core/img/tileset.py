@@ -1,13 +1,15 @@
+import copy
 from dataclasses import dataclass
 from enum import Enum, auto
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import List, Optional, Tuple
 
 import numpy as np
 from PIL import Image, ImageDraw
 
 from mdutil.core.exceptions import TilesetError
 from mdutil.core.img.palette import Palette
+from mdutil.core.img.preview import rgba_lut
 from mdutil.core.util import Size
 
 
@@ -28,34 +30,35 @@ class TileDebugger:
         tileset: np.ndarray,
         path: str,
         palette: Palette,
+        output_folder: Optional[Path] = None,
     ):
         self.errors = errors
         self.path = path
         self.tileset_array = tileset
         self.pal = palette
+        self.output_folder = Path(output_folder) if output_folder else Path()
 
     def generate_report(self) -> None:
-        self._create_debug_tileset()
+        debug_path = self.create_debug_tileset()
 
         error_messages = [str(error) for error in self.errors]
         raise TilesetError(
             "Bad tiles encountered in the tileset:\n {errors}\n\n  Created debug image: {path}".format(
-                errors="\n".join(error_messages), path=self.path
+                errors="\n".join(error_messages), path=debug_path
             )
         )
 
-    def _create_debug_tileset(self) -> None:
-        with Image.fromarray(self.tileset_array, "P") as background:
-            background.putpalette(self.pal.as_list())
-            background = background.convert("RGBA")
-
+    def create_debug_tileset(self) -> Path:
+        """Save a copy of the tileset with all bad tiles highlighted"""
+        rgba = rgba_lut(self.pal)[self.tileset_array]
+        with Image.fromarray(rgba, "RGBA") as background:
             with Image.new("RGBA", background.size, (0, 0, 0, 0)) as overlay:
                 draw = ImageDraw.Draw(overlay, mode="RGBA")
                 for error in self.errors:
                     draw.rectangle(error.rect, fill=(255, 0, 0, 128))
 
                 with Image.alpha_composite(background, overlay) as result:
-                    path = f"{Path(self.path).stem}_error.png"
+                    path = self.output_folder / f"{Path(self.path).stem}_error.png"
 
                     result.save(
                         path,
@@ -63,119 +66,199 @@ class TileDebugger:
                         optimize=True,
                     )
 
+        return path
+
 
 class TilesetImage:
     class Priority(Enum):
         LO = auto()
         HI = auto()
 
-    def __init__(self, tile_size: Size, path: Path):
+    def __init__(self, tile_size: Size, path: Path, margin: int = 0, spacing: int = 0):
         """Create a tileset from a png image"""
 
-        self.errors = []
-
         self.path = path
         self.tile_size = tile_size
+        self.margin = margin
+        self.spacing = spacing
 
-        # Dictionary of tiles by priority
-        self.tiles_hi: Dict[int, np.array] = {}
-        self.tiles_lo: Dict[int, np.array] = {}
+        self.tileset_array, self.palette = self._load(path)
 
-        self.tileset_array = self._load(path)
-        self.palette = Palette(path)
-
-        try:
-            self.tiles_lo = self._extract_tiles(self.tileset_array, tile_size)
-        except ValueError:
+        self.errors = self.find_bad_tiles(
+            self.tileset_array, tile_size, margin, spacing
+        )
+        if self.errors:
             debug = TileDebugger(
                 self.errors, self.tileset_array, self.path, self.palette
             )
             debug.generate_report()
 
-    def _load(self, img_path: str) -> np.ndarray:
+        # Read only views of shape (rows, columns, height, width) over the tileset
+        self.tiles_lo = self.tile_view(self.tileset_array, tile_size, margin, spacing)
+        self._tiles_hi = None
+
+    def _load(self, img_path: str) -> Tuple[np.ndarray, Palette]:
         with Image.open(img_path) as img:
             if img.mode == "P":
-                return np.array(img)
+                return np.array(img), Palette.from_image(img)
 
             raise TilesetError(
-                f"Tileset image: {img_path} is not an indexed color image."
+                f"Tileset image: {img_path} is not an indexed color image. "
+                "Convert it with 'mdutil quantize'."
             )
 
-    def _encode_hi_priority(self, tile_id: int) -> np.array:
-        if tile_id in self.tiles_hi:
-            return self.tiles_hi[tile_id]
-
-        # Add 128 to all color indexes in the tile
-        tile = self.tiles_lo[tile_id]
-        tile = tile + 128
+    @property
+    def tiles_hi(self) -> np.ndarray:
+        if self._tiles_hi is None:
+            # Add 128 to all color indexes of the tileset once
+            self._tiles_hi = self.tile_view(
+                self.tileset_array + 128, self.tile_size, self.margin, self.spacing
+            )
 
-        self.tiles_hi[tile_id] = tile
+        return self._tiles_hi
+
+    @property
+    def columns(self) -> int:
+        return self.tiles_lo.shape[1]
+
+    @property
+    def tile_count(self) -> int:
+        return self.tiles_lo.shape[0] * self.tiles_lo.shape[1]
+
+    @staticmethod
+    def grid_size(
+        tileset_array: np.ndarray, tile_size: Size, margin: int = 0, spacing: int = 0
+    ) -> Size:
+        """Number of tile rows and columns that fit in the tileset image"""
+        height, width = tileset_array.shape[:2]
+        return Size(
+            max((height - 2 * margin + spacing) // (tile_size.height + spacing), 0),
+            max((width - 2 * margin + spacing) // (tile_size.width + spacing), 0),
+        )
 
-        return tile
+    @staticmethod
+    def tile_view(
+        tileset_array: np.ndarray, tile_size: Size, margin: int = 0, spacing: int = 0
+    ) -> np.ndarray:
+        """Create a read only view of the tileset with shape (rows, columns, height, width).
 
-    def _extract_tiles(
-        self, tileset_array: np.ndarray, tile_size: Size
-    ) -> Dict[int, np.ndarray]:
-        """Extracts all tile data from the tileset and creates a dictionary for fast tile indexing.
+        Tiles are addressed through strides over the image data, honoring the tileset
+        margin and spacing, so no tile is copied. Use np.ascontiguousarray on a tile when
+        a consumer needs its own buffer.
 
         Args:
             tileset_array (np.ndarray): color index data as an array
             tile_size (Size): tile size in pixels
-
-        Raises:
-            ValueError: Tiles can only use a single palette. An error is raised if a tile
-            uses color indexes from more than one palette
+            margin (int): pixels around the tiles at the image border
+            spacing (int): pixels between adjacent tiles
 
         Returns:
-            Dict[int, np.ndarray]: Dict of all tiles in the tileset using the tile_id as key and an
-            array for the color index data
+            np.ndarray: the tile view
         """
-        tileset_size = Size(*tileset_array.shape[:2])
-        tiles_y, tiles_x = tileset_size // tile_size
-
-        tiles: Dict[int, np.ndarray] = {}
-        tile_id = 0
-
-        for y in range(tiles_y):
-            for x in range(tiles_x):
-                x_start = x * tile_size.width
-                y_start = y * tile_size.height
-
-                tile = tileset_array[
-                    y_start : y_start + tile_size.height,
-                    x_start : x_start + tile_size.width,
-                ].copy()
-
-                pal_index = self.palette.get_index_for_tile(tile)
-                if len(pal_index) > 1:
-                    self.errors.append(
-                        (
-                            BadTile(
-                                (x, y),
-                                pal_index,
-                                (
-                                    x_start,
-                                    y_start,
-                                    x_start + tile_size.width - 1,
-                                    y_start + tile_size.height - 1,
-                                ),
-                            )
-                        )
-                    )
-                else:
-                    tiles[tile_id] = tile
-                    tile_id += 1
+        rows, columns = TilesetImage.grid_size(
+            tileset_array, tile_size, margin, spacing
+        )
+        row_stride, col_stride = tileset_array.strides[:2]
+
+        return np.lib.stride_tricks.as_strided(
+            tileset_array[margin:, margin:],
+            shape=(rows, columns, tile_size.height, tile_size.width),
+            strides=(
+                row_stride * (tile_size.height + spacing),
+                col_stride * (tile_size.width + spacing),
+                row_stride,
+                col_stride,
+            ),
+            writeable=False,
+        )
 
-        if self.errors:
-            raise ValueError
+    @staticmethod
+    def find_bad_tiles(
+        tileset_array: np.ndarray, tile_size: Size, margin: int = 0, spacing: int = 0
+    ) -> List[BadTile]:
+        """Find all tiles that use color indexes from more than one palette line.
 
-        return tiles
+        The palette lines of every tile are reduced at once over the tile view of the
+        tileset, so no tile is inspected individually.
+
+        Args:
+            tileset_array (np.ndarray): color index data as an array
+            tile_size (Size): tile size in pixels
+            margin (int): pixels around the tiles at the image border
+            spacing (int): pixels between adjacent tiles
+
+        Returns:
+            List[BadTile]: the offending tiles in row major order
+        """
+        lines = TilesetImage.tile_view(tileset_array, tile_size, margin, spacing) // 16
+        mixed = lines.min(axis=(2, 3)) != lines.max(axis=(2, 3))
+
+        errors = []
+        for y, x in zip(*np.nonzero(mixed)):
+            x, y = int(x), int(y)
+            x_start = margin + x * (tile_size.width + spacing)
+            y_start = margin + y * (tile_size.height + spacing)
+
+            errors.append(
+                BadTile(
+                    (x, y),
+                    np.unique(lines[y, x]).tolist(),
+                    (
+                        x_start,
+                        y_start,
+                        x_start + tile_size.width - 1,
+                        y_start + tile_size.height - 1,
+                    ),
+                )
+            )
+
+        return errors
 
     def get_pal(self) -> np.ndarray:
         return self.palette.as_list()
 
+    def used_lines(self) -> List[int]:
+        """Palette lines referenced by the color indexes of the tiles. Margin and
+        spacing pixels are not part of any tile and are left out."""
+        return np.unique(self.tiles_lo // 16).tolist()
+
+    def remap(self, lut: np.ndarray, palette: Palette) -> "TilesetImage":
+        """Create a copy of the tileset with all color indexes remapped through a LUT.
+
+        Args:
+            lut (np.ndarray): 256 entry color index lookup table
+            palette (Palette): palette the remapped color indexes refer to
+
+        Returns:
+            TilesetImage: the remapped tileset
+        """
+        remapped = copy.copy(self)
+        remapped.tileset_array = np.take(lut, self.tileset_array)
+        remapped.palette = palette
+        remapped.tiles_lo = self.tile_view(
+            remapped.tileset_array, self.tile_size, self.margin, self.spacing
+        )
+        remapped._tiles_hi = None
+
+        return remapped
+
+    def get_tiles(self, tile_ids: np.ndarray, priority: Priority) -> np.ndarray:
+        """Gather the tiles for an array of tile ids into an array of shape (n, h, w)"""
+        tile_ids = np.asarray(tile_ids)
+        out_of_range = tile_ids >= self.tile_count
+        if out_of_range.any():
+            raise TilesetError(
+                f"Tile id: {tile_ids[out_of_range][0]} out of range in {self.path}."
+            )
+
+        tiles = self.tiles_lo if priority == TilesetImage.Priority.LO else self.tiles_hi
+        rows, columns = np.divmod(tile_ids, self.columns)
+        return tiles[rows, columns]
+
     def get_tile(self, tile_id: int, priority: Priority) -> np.ndarray:
-        if priority == TilesetImage.Priority.LO:
-            return self.tiles_lo[tile_id]
+        """Get a read only view of a tile"""
+        if not 0 <= tile_id < self.tile_count:
+            raise TilesetError(f"Tile id: {tile_id} out of range in {self.path}.")
 
-        return self._encode_hi_priority(tile_id)
+        tiles = self.tiles_lo if priority == TilesetImage.Priority.LO else self.tiles_hi
+        return tiles[divmod(tile_id, self.columns)]
@@ -0,0 +1,138 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from mdutil.core.exceptions import MapBuilderError
+from mdutil.core.img.tileset import TilesetImage
+from mdutil.core.map_builder import MapImageBuilder
+from mdutil.core.util import Rect
+
+
+class IncrementalMapBuilder:
+    """Keep a rendered plane up to date with the edits of its map.
+
+    The gids of every stacked layer are kept from the last render. On update they are
+    diffed against the edited map and only the changed cells are composited again,
+    patching the output buffer in place.
+    """
+
+    def __init__(
+        self,
+        builder: MapImageBuilder,
+        layers: Sequence[Tuple[str, TilesetImage.Priority]],
+        buffer: Optional[np.ndarray] = None,
+    ) -> None:
+        """Render the initial plane.
+
+        Args:
+            builder (MapImageBuilder): builder of the map
+            layers (Sequence[Tuple[str, TilesetImage.Priority]]): layer names and their
+            priority, stacked in order
+            buffer (Optional[np.ndarray]): an already rendered plane to patch in place
+            instead of rendering the whole map
+        """
+        self.builder = builder
+        self.layers = list(layers)
+        self.grids = self._grids(builder)
+
+        if buffer is None:
+            buffer = builder.render(self.layers)
+        elif buffer.shape != tuple(builder.map_api.get_size_in_px()):
+            raise MapBuilderError(
+                f"Output buffer of shape {buffer.shape} doesn't match the map size."
+            )
+
+        self.buffer = buffer
+
+    def _grids(self, builder: MapImageBuilder) -> Dict[str, np.ndarray]:
+        return {name: builder.gid_grid(name) for name, _ in self.layers}
+
+    def update(self, builder: MapImageBuilder) -> List[Rect]:
+        """Composite the cells that changed in an edited version of the map.
+
+        Args:
+            builder (MapImageBuilder): builder of the edited map
+
+        Returns:
+            List[Rect]: dirty rectangles in pixels. The whole plane is dirty when the
+            map size changed, and then the buffer is replaced instead of patched
+        """
+        grids = self._grids(builder)
+        self.builder = builder
+
+        if tuple(builder.map_api.get_size_in_px()) != self.buffer.shape:
+            self.grids = grids
+            self.buffer = builder.render(self.layers)
+            height, width = self.buffer.shape
+            return [Rect(0, 0, width, height)]
+
+        changed = np.zeros(next(iter(grids.values())).shape, dtype=bool)
+        for name, grid in grids.items():
+            changed |= grid != self.grids[name]
+
+        self.grids = grids
+
+        rows, columns = np.nonzero(changed)
+        if not len(rows):
+            return []
+
+        # Changed cells are cleared and every layer stacked again over them
+        cells = builder.cell_view(self.buffer)
+        cells[rows, columns] = 0
+        for name, priority in self.layers:
+            gids = grids[name][rows, columns]
+            filled = gids != 0
+            if filled.any():
+                cells[rows[filled], columns[filled]] = builder.map_api.get_tiles(
+                    gids[filled], priority
+                )
+
+        return self.dirty_rects(changed)
+
+    def dirty_rects(self, changed: np.ndarray) -> List[Rect]:
+        """Merge changed cells into rectangles in pixels.
+
+        Runs of changed cells are found per row and stacked into a rectangle while
+        the next row has a run with the same horizontal extent.
+        """
+        tile_height, tile_width = self.builder.map_api.get_tile_size()
+
+        # Run starts and ends for every row, padded so runs touching the borders close
+        padded = np.pad(changed, ((0, 0), (1, 1))).astype(np.int8)
+        edges = np.diff(padded, axis=1)
+        start_rows, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)
+
+        rects: List[Rect] = []
+        open_rects: Dict[Tuple[int, int], Rect] = {}
+        previous_row = None
+
+        for row, start, end in zip(start_rows, starts, ends):
+            row, start, end = int(row), int(start), int(end)
+            if row != previous_row:
+                # Close every rectangle that didn't continue into this row
+                if previous_row is not None:
+                    for key, rect in list(open_rects.items()):
+                        if rect.y + rect.height != row:
+                            rects.append(open_rects.pop(key))
+                previous_row = row
+
+            rect = open_rects.get((start, end))
+            if rect is not None and rect.y + rect.height == row:
+                rect.height += 1
+            else:
+                if rect is not None:
+                    rects.append(rect)
+                open_rects[(start, end)] = Rect(start, row, end - start, 1)
+
+        rects.extend(open_rects.values())
+
+        return [
+            Rect(
+                rect.x * tile_width,
+                rect.y * tile_height,
+                rect.width * tile_width,
+                rect.height * tile_height,
+            )
+            for rect in sorted(rects, key=lambda rect: (rect.y, rect.x))
+        ]
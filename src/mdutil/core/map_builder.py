@@ -1,13 +1,14 @@
 from pathlib import Path
-from typing import List, Optional, Tuple, Union
+from typing import List, Optional, Sequence, Tuple, Union
 
-import click
 import numpy as np
-from PIL import Image
 
+from mdutil.core.image_writer import ImageWriter, PngWriter, save_image
+from mdutil.core.img.palette import Palette, PaletteAllocator
 from mdutil.core.img.tileset import TilesetImage
 from mdutil.core.tmx.api import MapApi
-from mdutil.core.tmx.model import LayerType, TileLayer, TmxMap
+from mdutil.core.tmx.model import LayerType, TmxMap
+from mdutil.core.util import Rect
 
 
 class MapImageBuilder:
@@ -17,72 +18,148 @@ class MapImageBuilder:
     ) -> None:
 
         self.map_api = MapApi(TmxMap.from_file(tiled_file_path))
+        self.palette = self._merge_palettes()
 
-    def _build_tilemap_image(
-        self, layers: List[Tuple[TileLayer, TilesetImage.Priority]]
-    ) -> np.ndarray:
-
-        map_height, map_width = self.map_api.get_size_in_px()
-        tilemap_array = np.zeros((map_height, map_width), dtype=np.uint8)
-
-        self.tile_size = self.map_api.get_tile_size()
+    def _merge_palettes(self) -> Optional[Palette]:
+        """Allocate the palettes of all tilesets into the four palette lines and remap
+        the color indexes of every tileset that doesn't keep its original lines."""
+        tilesets = self.map_api.get_tilesets()
+        if not tilesets:
+            return None
 
-        def stack_layer(layer: TileLayer, priority: TilesetImage.Priority) -> None:
-            for i, gid in enumerate(layer):
-                if gid == 0:
-                    continue
+        allocator = PaletteAllocator()
+        luts = [
+            allocator.add(tileset.image.palette, tileset.image.used_lines())
+            for tileset in tilesets
+        ]
 
-                # Get the tile position in the composited image
-                map_x = (i % layer.width) * self.tile_size.width
-                map_y = (i // layer.width) * self.tile_size.height
+        palette = allocator.merged_palette(fallback=tilesets[0].image.palette)
+        for tileset, lut in zip(tilesets, luts):
+            if not PaletteAllocator.is_identity(lut):
+                tileset.remap_colors(lut, palette)
 
-                tilemap_array[
-                    map_y : map_y + self.tile_size.height,
-                    map_x : map_x + self.tile_size.width,
-                ] = self.map_api.get_tile(gid, priority)
+        return palette
 
-        for layer in layers:
-            stack_layer(
-                layer[0],
-                layer[1],
+    def render(
+        self,
+        layers: Sequence[Tuple[str, TilesetImage.Priority]],
+        rect: Optional[Rect] = None,
+    ) -> np.ndarray:
+        """Render a combination of tile layers into an array of color indexes.
+
+        Only the tiles that intersect the rectangle are composited. Areas outside of
+        the map are left at color index 0.
+
+        Args:
+            layers (Sequence[Tuple[str, TilesetImage.Priority]]): layer names and their
+            priority, stacked in order
+            rect (Optional[Rect]): area to render in pixels, relative to the top left
+            corner of the map. Defaults to the whole map
+
+        Returns:
+            np.ndarray: the rendered area with shape (rect.height, rect.width)
+        """
+        tile_size = self.map_api.get_tile_size()
+        if rect is None:
+            height, width = self.map_api.get_size_in_px()
+            rect = Rect(0, 0, width, height)
+
+        # Tile aligned area that covers the rectangle
+        tile_x, tile_y = rect.x // tile_size.width, rect.y // tile_size.height
+        columns = -(-(rect.x + rect.width) // tile_size.width) - tile_x
+        rows = -(-(rect.y + rect.height) // tile_size.height) - tile_y
+
+        tilemap_array = np.zeros(
+            (rows * tile_size.height, columns * tile_size.width), dtype=np.uint8
+        )
+
+        cells = self.cell_view(tilemap_array)
+
+        origin = self.map_api.get_origin()
+        for name, priority in layers:
+            layer = self.map_api.get_layer_by_name(LayerType.TILE, name)
+            cell_rows, cell_columns, gids = layer.cells_in(
+                origin.x + tile_x, origin.y + tile_y, columns, rows
             )
+            if len(gids):
+                cells[cell_rows, cell_columns] = self.map_api.get_tiles(gids, priority)
+
+        offset_x = rect.x - tile_x * tile_size.width
+        offset_y = rect.y - tile_y * tile_size.height
+        return tilemap_array[
+            offset_y : offset_y + rect.height, offset_x : offset_x + rect.width
+        ]
+
+    def cell_view(self, tilemap_array: np.ndarray) -> np.ndarray:
+        """View of a tile aligned image with shape (rows, columns, tile height, tile width)"""
+        tile_size = self.map_api.get_tile_size()
+        height, width = tilemap_array.shape
+
+        return tilemap_array.reshape(
+            height // tile_size.height,
+            tile_size.height,
+            width // tile_size.width,
+            tile_size.width,
+        ).swapaxes(1, 2)
+
+    def gid_grid(self, name: str) -> np.ndarray:
+        """Gids of a tile layer over the whole map as an array of shape (rows, columns)"""
+        return self.map_api.get_gid_grid(name)
+
+    def render_tiles(
+        self,
+        layers: Sequence[Tuple[str, TilesetImage.Priority]],
+        rect: Rect,
+    ) -> np.ndarray:
+        """Render an area given in tiles. See render"""
+        tile_size = self.map_api.get_tile_size()
+        return self.render(
+            layers,
+            Rect(
+                rect.x * tile_size.width,
+                rect.y * tile_size.height,
+                rect.width * tile_size.width,
+                rect.height * tile_size.height,
+            ),
+        )
+
+    @staticmethod
+    def _plane_layers(
+        lo_layer: Optional[str], hi_layer: Optional[str]
+    ) -> List[Tuple[str, TilesetImage.Priority]]:
+        layers = []
+        if lo_layer:
+            layers.append((lo_layer, TilesetImage.Priority.LO))
+        if hi_layer:
+            layers.append((hi_layer, TilesetImage.Priority.HI))
 
-        return tilemap_array
+        return layers
 
     def save(
         self,
         output_path: str,
         lo_layer: Optional[str] = None,
         hi_layer: Optional[str] = None,
-    ) -> None:
-
-        stacked_layers = []
-        if lo_layer:
-            stacked_layers.append(
-                (
-                    self.map_api.get_layer_by_name(LayerType.TILE, lo_layer),
-                    TilesetImage.Priority.LO,
-                ),
-            )
-        if hi_layer:
-            stacked_layers.append(
-                (
-                    self.map_api.get_layer_by_name(LayerType.TILE, hi_layer),
-                    TilesetImage.Priority.HI,
-                )
-            )
-
-        try:
-            with Image.fromarray(
-                self._build_tilemap_image(stacked_layers), mode="P"
-            ) as img:
-                # TODO Fix me
-                img.putpalette(self.map_api._map.tilesets[0].get_palette())
-                img.save(output_path, format="PNG", optimize=False)
-
-                click.echo(click.style(f"Saved '{output_path}'.", fg="green"))
-
-        except OSError as e:
-            raise OSError(
-                f"Error while trying to save image file {output_path}."
-            ) from e
+        writer: Optional[ImageWriter] = None,
+    ) -> bool:
+        """Save a plane with an image writer, png by default, unless the existing
+        image is up to date.
+
+        Returns:
+            bool: whether the image was written
+        """
+        tilemap_array = self.render(self._plane_layers(lo_layer, hi_layer))
+        return save_image(output_path, tilemap_array, self.palette, writer)
+
+
+def save_png(
+    output_path: Union[str, Path],
+    tilemap_array: np.ndarray,
+    palette: Optional[Palette],
+) -> bool:
+    """Save color indexes as an indexed png image when they or the palette changed.
+
+    Returns:
+        bool: whether the image was written
+    """
+    return save_image(output_path, tilemap_array, palette, PngWriter())
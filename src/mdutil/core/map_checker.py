@@ -0,0 +1,227 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from mdutil.core.img.palette import Palette
+from mdutil.core.img.tileset import TileDebugger, TilesetImage
+from mdutil.core.tmx.model import GID_MASK, TileLayer, TmxMapFactory
+from mdutil.core.util import Size
+
+MAP_EXTENSIONS = (".tmx", ".tmj")
+
+
+@dataclass
+class Finding:
+    path: Path
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}: {self.message}"
+
+
+@dataclass
+class _TilesetRef:
+    image_path: Path
+    tile_size: Size
+    margin: int
+    spacing: int
+    first_gid: int
+    tile_count: int
+
+
+@dataclass
+class _MapResult:
+    findings: List[Finding] = field(default_factory=list)
+    tilesets: List[_TilesetRef] = field(default_factory=list)
+
+
+def find_maps(paths: Iterable[Path]) -> List[Path]:
+    """Collect all tiled map files from a list of files and directories"""
+    maps = {}
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            found = sorted(
+                p for p in path.rglob("*") if p.suffix.lower() in MAP_EXTENSIONS
+            )
+        else:
+            found = [path]
+
+        # Overlapping arguments must not check the same map twice
+        for map_path in found:
+            maps.setdefault(map_path.resolve(), map_path)
+
+    return list(maps.values())
+
+
+def _check_gids(
+    path: Path, layer: TileLayer, tilesets: List[_TilesetRef]
+) -> List[Finding]:
+    # Flipped tiles are valid, only the tile part of the gid is checked
+    indices, gids = layer.sparse.indices, layer.sparse.gids & GID_MASK
+
+    valid = np.zeros(len(gids), dtype=bool)
+    for tileset in tilesets:
+        valid |= (gids >= tileset.first_gid) & (
+            gids < tileset.first_gid + tileset.tile_count
+        )
+
+    invalid = np.flatnonzero(~valid)
+    if invalid.size == 0:
+        return []
+
+    first = int(invalid[0])
+    position = divmod(int(indices[first]), max(layer.width, 1))[::-1]
+    return [
+        Finding(
+            path,
+            f"Layer '{layer.name}' has {invalid.size} gids not found in any tileset "
+            f"(first gid {int(gids[first])} at tile {position}).",
+        )
+    ]
+
+
+def _check_map(path: Path, required_layers: Sequence[str]) -> _MapResult:
+    result = _MapResult()
+
+    try:
+        data = TmxMapFactory().parse(path)
+    except Exception as e:
+        result.findings.append(Finding(path, f"Can't parse map: {e}"))
+        return result
+
+    map_tile_size = Size(data.get("tileheight", 0), data.get("tilewidth", 0))
+    for tileset in data.get("tilesets", []):
+        image = tileset.get("image")
+        if not image:
+            result.findings.append(
+                Finding(path, f"Tileset '{tileset.get('name', '')}' has no image.")
+            )
+            continue
+
+        result.tilesets.append(
+            _TilesetRef(
+                image_path=path.resolve().parent / image,
+                tile_size=Size(
+                    tileset.get("tileheight", map_tile_size.height),
+                    tileset.get("tilewidth", map_tile_size.width),
+                ),
+                margin=tileset.get("margin", 0),
+                spacing=tileset.get("spacing", 0),
+                first_gid=tileset.get("firstgid", 0),
+                tile_count=tileset.get("tilecount", 0),
+            )
+        )
+
+    tile_layers = []
+    for layer_data in data.get("layers", []):
+        if layer_data.get("type") != "tilelayer":
+            continue
+
+        try:
+            tile_layers.append(TileLayer.from_dict(layer_data))
+        except Exception as e:
+            result.findings.append(
+                Finding(path, f"Can't decode layer '{layer_data.get('name', '')}': {e}")
+            )
+
+    if not tile_layers and not result.findings:
+        result.findings.append(Finding(path, "Map has no tile layers."))
+
+    names = {layer.name for layer in tile_layers}
+    for name in required_layers:
+        if name not in names:
+            result.findings.append(Finding(path, f"Layer '{name}' is missing."))
+
+    for layer in tile_layers:
+        result.findings.extend(_check_gids(path, layer, result.tilesets))
+
+    return result
+
+
+def _check_tileset(ref: _TilesetRef, debug_folder: Optional[Path]) -> List[Finding]:
+    image_path = ref.image_path
+    if not image_path.exists():
+        return [Finding(image_path, "Tileset image not found.")]
+
+    try:
+        with Image.open(image_path) as img:
+            if img.mode != "P":
+                return [Finding(image_path, "Not an indexed color image.")]
+
+            tileset_array = np.array(img)
+    except OSError as e:
+        return [Finding(image_path, f"Can't read image: {e}")]
+
+    bad_tiles = TilesetImage.find_bad_tiles(
+        tileset_array, ref.tile_size, ref.margin, ref.spacing
+    )
+    if not bad_tiles:
+        return []
+
+    findings = [
+        Finding(
+            image_path, f"Tile at {tile.pos} uses colors from palettes {tile.indexes}"
+        )
+        for tile in bad_tiles
+    ]
+
+    if debug_folder is not None:
+        debug = TileDebugger(
+            bad_tiles, tileset_array, image_path, Palette(image_path), debug_folder
+        )
+        debug.create_debug_tileset()
+
+    return findings
+
+
+class MapChecker:
+    """Validate tiled maps and their tilesets without rendering them.
+
+    Maps are parsed and every unique tileset image is validated once, both in parallel
+    worker processes. All problems are collected instead of stopping on the first one.
+    """
+
+    def __init__(
+        self,
+        required_layers: Sequence[str] = (),
+        debug_folder: Optional[Path] = None,
+        jobs: Optional[int] = None,
+    ) -> None:
+        self.required_layers = tuple(required_layers)
+        self.debug_folder = debug_folder
+        self.jobs = jobs or os.cpu_count() or 1
+
+        self.checked_maps = 0
+        self.checked_tilesets = 0
+
+    def check(self, map_paths: Sequence[Path]) -> List[Finding]:
+        findings: List[Finding] = []
+        tilesets: Dict[Tuple, _TilesetRef] = {}
+
+        if self.debug_folder is not None:
+            self.debug_folder.mkdir(parents=True, exist_ok=True)
+
+        with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+            required = [self.required_layers] * len(map_paths)
+            for result in pool.map(_check_map, map_paths, required):
+                findings.extend(result.findings)
+                for ref in result.tilesets:
+                    key = (ref.image_path, *ref.tile_size, ref.margin, ref.spacing)
+                    tilesets.setdefault(key, ref)
+
+            refs = list(tilesets.values())
+            for tileset_findings in pool.map(
+                _check_tileset, refs, [self.debug_folder] * len(refs)
+            ):
+                findings.extend(tileset_findings)
+
+        self.checked_maps = len(map_paths)
+        self.checked_tilesets = len(refs)
+
+        return findings
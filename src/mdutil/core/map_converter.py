@@ -0,0 +1,270 @@
+import io
+import json
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from mdutil.core.exceptions import TiledMapError
+from mdutil.core.tmx.model.layer import TileData
+from mdutil.core.tmx.parser import XmlTmxParser
+from mdutil.core.tmx.writer import (
+    JsonMapWriter,
+    MapWriter,
+    TileDataEncoder,
+    XmlMapWriter,
+)
+from mdutil.core.util import atomic_write
+
+MAP_FORMATS = {".tmx": "tmx", ".tmj": "tmj", ".json": "tmj"}
+
+# Layer types of the tmj format by tmx element
+_LAYER_TYPES = {
+    "layer": "tilelayer",
+    "objectgroup": "objectgroup",
+    "imagelayer": "imagelayer",
+    "group": "group",
+}
+
+# Attributes that tmx files store as strings and tmj files as typed values
+_JSON_TYPES = {
+    "infinite": bool,
+    "visible": bool,
+    "locked": bool,
+    "repeatx": bool,
+    "repeaty": bool,
+    "opacity": float,
+    "rotation": float,
+    "offsetx": float,
+    "offsety": float,
+    "parallaxx": float,
+    "parallaxy": float,
+    "nextlayerid": int,
+    "nextobjectid": int,
+    "compressionlevel": int,
+    "hexsidelength": int,
+    "gid": int,
+    "width": int,
+    "height": int,
+    "tilewidth": int,
+    "tileheight": int,
+}
+
+
+def _json_attributes(data: Dict[str, Any]) -> Dict[str, Any]:
+    for attr, to_type in _JSON_TYPES.items():
+        value = data.get(attr)
+        if not isinstance(value, str):
+            continue
+
+        if to_type is bool:
+            data[attr] = value.lower() in ("1", "true")
+        else:
+            data[attr] = to_type(value)
+
+    for prop in data.get("properties", []):
+        value = prop.get("value")
+        if not isinstance(value, str):
+            continue
+
+        match prop.get("type"):
+            case "bool":
+                prop["value"] = value.lower() == "true"
+            case "int" | "object":
+                prop["value"] = int(value)
+            case "float":
+                prop["value"] = float(value)
+
+    return data
+
+
+class MapConverter:
+    """Rewrite tiled maps between the tmx and tmj formats and tile layer encodings.
+
+    Maps are converted one top level element at a time: every layer is decoded,
+    encoded again and written out before the next one is read, so only a single
+    decoded layer is held in memory. Tmx files are read incrementally too, tmj files
+    are loaded as a whole but each layer is released as soon as it's written.
+
+    Converting within the same format keeps the document as is, only tile layer
+    payloads change. Converting between formats keeps the map attributes and
+    properties, tilesets with their per tile properties and animations, and every
+    kind of layer: tile layers, object groups, image layers and groups of layers.
+
+    Paths inside the map are written unchanged, so the output is meant to live in
+    the same folder as the input.
+    """
+
+    def __init__(self, encoder: Optional[TileDataEncoder] = None) -> None:
+        self.encoder = encoder or TileDataEncoder()
+        self._parser = XmlTmxParser()
+
+    @staticmethod
+    def map_format(path: Path) -> str:
+        map_format = MAP_FORMATS.get(Path(path).suffix.lower())
+        if map_format is None:
+            raise TiledMapError(f"Unsupported tiled map format: {path}")
+
+        return map_format
+
+    def convert(self, src: Path, dst: Path) -> None:
+        """Convert a map. The output replaces dst atomically, and may be src itself"""
+        src, dst = Path(src), Path(dst)
+        src_format = self.map_format(src)
+        writer_class = XmlMapWriter if self.map_format(dst) == "tmx" else JsonMapWriter
+
+        def write(file: BinaryIO) -> None:
+            with io.TextIOWrapper(file, encoding="utf-8") as text:
+                writer = writer_class(text, self.encoder)
+                if src_format == "tmx":
+                    self._convert_tmx(src, writer)
+                else:
+                    self._convert_tmj(src, writer)
+
+        atomic_write(dst, write)
+
+    @classmethod
+    def _decode(cls, layer: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace the tile layer payloads of a tmj layer with arrays of gids"""
+        if layer.get("type") == "group":
+            layer["layers"] = [cls._decode(child) for child in layer["layers"]]
+        if layer.get("type") != "tilelayer":
+            return layer
+
+        encoding = layer.pop("encoding", None) or "csv"
+        compression = layer.pop("compression", None)
+        if "chunks" in layer:
+            for chunk in layer["chunks"]:
+                chunk["data"] = TileData.decode(
+                    chunk.get("data", []), encoding, compression
+                )
+        else:
+            layer["data"] = TileData.decode(
+                layer.get("data", []), encoding, compression
+            )
+
+        return layer
+
+    def _convert_tmj(self, src: Path, writer: MapWriter) -> None:
+        with open(src, "r", encoding="utf-8") as file:
+            content = json.load(file)
+
+        layers = content.pop("layers", [])
+        writer.begin(
+            content, content.pop("properties", []), content.pop("tilesets", [])
+        )
+
+        for index, layer in enumerate(layers):
+            layers[index] = None
+            writer.write_layer(self._decode(layer))
+
+        writer.end()
+
+    def _encode_tmx(self, element: ET.Element) -> None:
+        """Encode again, in place, the payloads of all tile layers in an element"""
+        for layer in element.iter("layer"):
+            data = layer.find("data")
+            if data is None:
+                continue
+
+            attributes = {"encoding": data.get("encoding")}
+            encoding = attributes["encoding"] or "csv"
+            compression = data.get("compression")
+
+            targets = [(chunk, int(chunk.get("width"))) for chunk in data.iter("chunk")]
+            for target, width in targets or [(data, int(layer.get("width", 0)))]:
+                gids = TileData.decode(
+                    self._parser._data_payload(target, attributes),
+                    encoding,
+                    compression,
+                )
+                for tile in target.findall("tile"):
+                    target.remove(tile)
+                target.text = self.encoder.to_xml(gids, width)
+
+            data.attrib.pop("compression", None)
+            data.attrib.update(self.encoder.attributes)
+
+    def _tileset_to_json(self, element: ET.Element) -> Dict[str, Any]:
+        tileset = _json_attributes(self._parser._tileset_to_dict(element))
+        for tile in tileset.get("tiles", []):
+            _json_attributes(tile)
+
+        return tileset
+
+    def _layer_to_json(self, element: ET.Element) -> Optional[Dict[str, Any]]:
+        layer_type = _LAYER_TYPES.get(element.tag)
+        if layer_type is None:
+            return None
+
+        # Child layers are converted on their own, in order
+        attributes = ET.Element(element.tag, element.attrib)
+        attributes.extend(child for child in element if child.tag not in _LAYER_TYPES)
+        layer = _json_attributes(self._parser._element_to_dict(attributes))
+        layer["type"] = layer_type
+        for obj in layer.get("objects", []):
+            _json_attributes(obj)
+
+        if layer_type == "tilelayer":
+            return self._decode(layer)
+        elif layer_type == "group":
+            children = (self._layer_to_json(child) for child in element)
+            layer["layers"] = [child for child in children if child is not None]
+        elif layer_type == "imagelayer":
+            image = element.find("image")
+            if image is not None:
+                layer["image"] = image.get("source", "")
+                for attr in ("width", "height"):
+                    if attr in image.attrib:
+                        layer[f"image{attr}"] = int(image.attrib[attr])
+                if "trans" in image.attrib:
+                    layer["transparentcolor"] = f"#{image.attrib['trans']}"
+
+        return layer
+
+    def _convert_tmx(self, src: Path, writer: MapWriter) -> None:
+        context = ET.iterparse(src, events=("start", "end"))
+        _, root = next(context)
+        attributes = _json_attributes(dict(root.attrib))
+
+        same_format = isinstance(writer, XmlMapWriter)
+        if same_format:
+            writer.begin(attributes, [], [])
+        else:
+            attributes = {"type": "map", **attributes}
+
+        properties: List[Dict[str, Any]] = []
+        tilesets: List[Dict[str, Any]] = []
+        begun = same_format
+        depth = 0
+        for event, element in context:
+            if event == "start":
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth:
+                continue
+
+            # Children of the map are released as soon as they are written
+            root.remove(element)
+            if same_format:
+                self._encode_tmx(element)
+                writer.write_element(element)
+            elif element.tag == "properties":
+                content = {"properties": self._parser._properties_to_list(element)}
+                properties = _json_attributes(content)["properties"]
+            elif element.tag == "tileset":
+                tilesets.append(self._tileset_to_json(element))
+            else:
+                layer = self._layer_to_json(element)
+                if layer is None:
+                    continue
+
+                if not begun:
+                    writer.begin(attributes, properties, tilesets)
+                    begun = True
+                writer.write_layer(layer)
+
+        if not begun:
+            writer.begin(attributes, properties, tilesets)
+        writer.end()
@@ -0,0 +1,127 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from mdutil.core.tmx.model import GID_MASK, LayerType, TmxMap, TmxMapFactory
+from mdutil.core.util import Size
+
+
+@dataclass
+class TilesetInfo:
+    name: str
+    first_gid: int
+    last_gid: int
+    tile_size: Size
+    image: str
+
+
+@dataclass
+class LayerInfo:
+    name: str
+    type: str
+    width: int = 0
+    height: int = 0
+    encoding: Optional[str] = None
+    compression: Optional[str] = None
+    chunks: int = 0
+    objects: int = 0
+    # Tile layer stats: non empty cells, distinct tiles and distinct tiles by tileset
+    cells: int = 0
+    used_tiles: int = 0
+    empty_ratio: float = 0.0
+    tileset_tiles: Dict[str, int] = field(default_factory=dict)
+    # Non empty cells with a gid outside of every tileset
+    unknown_cells: int = 0
+
+
+@dataclass
+class MapInfo:
+    path: Path
+    width: int
+    height: int
+    tile_size: Size
+    infinite: bool
+    layers: List[LayerInfo]
+    tilesets: List[TilesetInfo]
+
+
+def _tileset_lut(tmx_map: TmxMap, size: int) -> np.ndarray:
+    """Index of the tileset of every gid, -1 for gids outside of every tileset"""
+    lut = np.full(size, -1, dtype=np.int64)
+    for index, tileset in enumerate(tmx_map.tilesets):
+        lut[tileset.first_gid : tileset.first_gid + tileset.tile_count] = index
+
+    return lut
+
+
+def inspect_map(tiled_file_path: Union[str, Path]) -> MapInfo:
+    """Describe a map and the tile usage of its layers.
+
+    Tile layers are decoded but tileset images never are, so inspecting a map only
+    costs parsing it. Tile usage is counted with a bincount over the gids of every
+    layer, gathered by tileset through a lookup table. Gids past the last tileset
+    share a single bucket, so stray gids don't size the counts.
+    """
+    path = Path(tiled_file_path)
+    content = TmxMapFactory().parse(path)
+    tmx_map = TmxMap.from_dict(content)
+
+    size = max(
+        (ts.first_gid + ts.tile_count for ts in tmx_map.tilesets),
+        default=1,
+    )
+    tile_layers = iter(tmx_map.layers[LayerType.TILE])
+
+    layers = []
+    for data in content.get("layers", []):
+        info = LayerInfo(data.get("name", ""), data.get("type", ""))
+        layers.append(info)
+        if info.type == "objectgroup":
+            info.objects = len(data.get("objects", []))
+            continue
+
+        layer = next(tile_layers)
+        info.width, info.height = layer.width, layer.height
+        info.encoding = data.get("encoding") or "csv"
+        info.compression = data.get("compression")
+        info.chunks = len(data.get("chunks", []))
+
+        gids = layer.sparse.gids & GID_MASK
+        counts = np.bincount(np.minimum(gids, size), minlength=size + 1)
+        lut = _tileset_lut(tmx_map, size + 1)
+
+        used = np.flatnonzero(counts[:size])
+        used = used[used > 0]
+        per_tileset = np.bincount(lut[used] + 1, minlength=len(tmx_map.tilesets) + 1)
+        stray = np.unique(gids[gids >= size]) if counts[size] else []
+
+        info.cells = len(gids)
+        info.used_tiles = len(used) + len(stray)
+        area = layer.width * layer.height
+        info.empty_ratio = 1 - info.cells / area if area else 0.0
+        info.tileset_tiles = {
+            tileset.name: int(count)
+            for tileset, count in zip(tmx_map.tilesets, per_tileset[1:])
+        }
+        info.unknown_cells = int(counts[used[lut[used] < 0]].sum() + counts[size])
+
+    return MapInfo(
+        path=path,
+        width=tmx_map.width,
+        height=tmx_map.height,
+        tile_size=Size(tmx_map.tile_height, tmx_map.tile_width),
+        infinite=tmx_map.infinite,
+        layers=layers,
+        tilesets=[
+            TilesetInfo(
+                tileset.name,
+                tileset.first_gid,
+                tileset.last_gid,
+                Size(tileset.tile_height, tileset.tile_width),
+                tileset.image_name,
+            )
+            for tileset in tmx_map.tilesets
+        ],
+    )
@@ -0,0 +1,204 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from mdutil.core.attribute_map import write_c_array
+from mdutil.core.compression import save_compressed
+from mdutil.core.exceptions import MapBuilderError
+from mdutil.core.img.tileset import TilesetImage
+from mdutil.core.tilemap import TILE_HFLIP, TILE_VFLIP, TilemapBuilder
+
+# Fields of a block map entry
+BLOCK_INDEX_MASK = 0x3FFF
+BLOCK_HFLIP = 0x4000
+BLOCK_VFLIP = 0x8000
+
+
+@dataclass
+class MetatileStats:
+    """Size of a set of tile layers as plain tilemaps and as metatiles"""
+
+    cells: int
+    blocks: int
+    metatiles: int
+    tilemap_bytes: int
+    metatile_bytes: int
+    block_map_bytes: int
+
+    @property
+    def ratio(self) -> float:
+        """Compressed size over the plain tilemap size"""
+        compressed = self.metatile_bytes + self.block_map_bytes
+        return compressed / self.tilemap_bytes if self.tilemap_bytes else 0.0
+
+
+class MetatileBuilder:
+    """Compress tile layers into a dictionary of metatiles and a block map per layer.
+
+    Layers are converted to tilemap words, so metatiles keep the flip, palette and
+    priority bits of every tile. Blocks are read through a strided view of the words
+    and every block is packed in a single opaque value, so finding the unique blocks
+    is one np.unique over all of them.
+
+    With flips enabled a block can also reuse the metatile of a flipped copy of it:
+    the block map entry tells the game to mirror the metatile, reversing its columns
+    and toggling the horizontal flip bit of every word, or the same for rows.
+    """
+
+    def __init__(
+        self,
+        tiled_file_path: Union[str, Path],
+        block_size: int = 2,
+        tile_base: int = 0,
+        flips: bool = True,
+    ) -> None:
+        if block_size < 1:
+            raise MapBuilderError("The block size must be at least 1 tile.")
+
+        self.block_size = block_size
+        self.flips = flips
+        self.tilemap_builder = TilemapBuilder(tiled_file_path, tile_base)
+
+    def blocks(self, words: np.ndarray) -> np.ndarray:
+        """Blocks of a tilemap with shape (block rows, block columns, size, size).
+        Tilemaps are padded with empty cells to a whole number of blocks."""
+        size = self.block_size
+        rows, columns = words.shape
+        words = np.pad(words, ((0, -rows % size), (0, -columns % size)))
+
+        return np.lib.stride_tricks.as_strided(
+            words,
+            shape=(words.shape[0] // size, words.shape[1] // size, size, size),
+            strides=(
+                words.strides[0] * size,
+                words.strides[1] * size,
+                *words.strides,
+            ),
+            writeable=False,
+        )
+
+    @staticmethod
+    def _keys(blocks: np.ndarray) -> np.ndarray:
+        """Pack every block of shape (n, size, size) in an opaque value"""
+        rows = np.ascontiguousarray(blocks.reshape(len(blocks), -1))
+        return rows.view(np.dtype((np.void, rows.dtype.itemsize * rows.shape[1])))[:, 0]
+
+    def build(
+        self, layers: Sequence[Tuple[str, TilesetImage.Priority]]
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Build the metatiles shared by all layers and the block map of every layer.
+
+        Returns:
+            Tuple[np.ndarray, Dict[str, np.ndarray]]: the metatiles with shape
+            (n, size, size) and the block map of every layer by name
+        """
+        names = [name for name, _ in layers]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise MapBuilderError(
+                f"Layers can only be given once, repeated: {', '.join(duplicates)}."
+            )
+
+        grids = [self.blocks(self.tilemap_builder.build([layer])) for layer in layers]
+        size = self.block_size
+        blocks = np.concatenate([grid.reshape(-1, size, size) for grid in grids])
+
+        # Every block and, with flips, its mirrored copies
+        variants = [blocks]
+        if self.flips:
+            hflip = blocks[:, :, ::-1] ^ np.uint16(TILE_HFLIP)
+            vflip = blocks[:, ::-1, :] ^ np.uint16(TILE_VFLIP)
+            variants += [hflip, vflip, hflip[:, ::-1, :] ^ np.uint16(TILE_VFLIP)]
+
+        _, first, inverse = np.unique(
+            self._keys(np.concatenate(variants)), return_index=True, return_inverse=True
+        )
+        ranks = inverse.reshape(len(variants), len(blocks))
+
+        # The lowest ranked variant is shared by all the flipped copies of a block
+        flip = ranks.argmin(axis=0)
+        canonical = ranks[flip, np.arange(len(blocks))]
+        used, block_index = np.unique(canonical, return_inverse=True)
+        if len(used) > BLOCK_INDEX_MASK + 1:
+            raise MapBuilderError(
+                f"The layers have {len(used)} distinct blocks, more than "
+                f"{BLOCK_INDEX_MASK + 1}."
+            )
+
+        metatiles = np.concatenate(variants)[first[used]]
+
+        # Variants are ordered as no flip, h, v, hv
+        entries = (
+            block_index
+            | np.array([0, BLOCK_HFLIP, BLOCK_VFLIP, BLOCK_HFLIP | BLOCK_VFLIP])[flip]
+        )
+
+        block_maps = {}
+        start = 0
+        for (name, _), grid in zip(layers, grids):
+            count = grid.shape[0] * grid.shape[1]
+            block_maps[name] = (
+                entries[start : start + count].reshape(grid.shape[:2]).astype(np.uint16)
+            )
+            start += count
+
+        return metatiles, block_maps
+
+    def stats(
+        self, metatiles: np.ndarray, block_maps: Dict[str, np.ndarray]
+    ) -> MetatileStats:
+        blocks = sum(block_map.size for block_map in block_maps.values())
+        cells = blocks * self.block_size**2
+
+        return MetatileStats(
+            cells=cells,
+            blocks=blocks,
+            metatiles=len(metatiles),
+            tilemap_bytes=cells * 2,
+            metatile_bytes=metatiles.size * 2,
+            block_map_bytes=blocks * 2,
+        )
+
+    def save(
+        self,
+        output_path: Union[str, Path],
+        layers: Sequence[Tuple[str, TilesetImage.Priority]],
+        output_format: str = "bin",
+        compression: str = "none",
+    ) -> Tuple[List[Tuple[Path, bool]], MetatileStats]:
+        """Export the metatiles of a set of layers, suffixed _meta, and the block map
+        of every layer, suffixed with the layer name. Files that are up to date are
+        left untouched.
+
+        Tables are raw big endian words, compressed with one of the codecs SGDK
+        unpacks at runtime, or C arrays with a metatile per row.
+
+        Returns:
+            Tuple[List[Tuple[Path, bool]], MetatileStats]: every file and whether it
+            was written, and the compression statistics
+        """
+        if any(name == "meta" for name, _ in layers):
+            raise MapBuilderError(
+                "A layer named 'meta' can't be exported, its block map would "
+                "replace the metatiles."
+            )
+
+        metatiles, block_maps = self.build(layers)
+        output_path = Path(output_path)
+
+        tables = [("meta", metatiles.reshape(len(metatiles), -1))]
+        tables += list(block_maps.items())
+
+        saved = []
+        for suffix, array in tables:
+            path = output_path.with_name(f"{output_path.name}_{suffix}")
+            if output_format == "c":
+                saved.extend(write_c_array(path, array))
+            else:
+                data = array.astype(">u2").tobytes()
+                path, _, written = save_compressed(path, data, compression)
+                saved.append((path, written))
+
+        return saved, self.stats(metatiles, block_maps)
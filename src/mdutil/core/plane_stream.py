@@ -0,0 +1,148 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from mdutil.core.attribute_map import write_c_array
+from mdutil.core.exceptions import MapBuilderError
+from mdutil.core.map_builder import MapImageBuilder
+from mdutil.core.tilemap import TilemapBuilder
+from mdutil.core.util import Size, write_if_changed
+
+# Plane sizes in tiles supported by the VDP
+PLANE_SIDES = (32, 64, 128)
+PLANE_MAX_CELLS = 64 * 64
+
+
+@dataclass
+class StreamStrips:
+    """Tilemap words of a plane as strips, with the DMA transfers that upload them.
+
+    Every segment is a row of (source byte offset in words, length in words,
+    destination byte offset in the plane). A strip of the map is split where it wraps
+    around the plane, so every segment is a single transfer with a constant VRAM
+    increment. The index has the first segment and segment count of every strip.
+    """
+
+    words: np.ndarray
+    segments: np.ndarray
+    index: np.ndarray
+    increment: int
+
+
+class PlaneStreamBuilder:
+    """Precompute the data to stream large maps into a plane while scrolling.
+
+    Column strips are uploaded when scrolling horizontally and row strips when
+    scrolling vertically. Map cell (row, column) goes to plane cell
+    (row % plane height, column % plane width).
+    """
+
+    def __init__(
+        self,
+        tiled_file_path: Union[str, Path],
+        plane_size: Size = Size(32, 64),
+        tile_base: int = 0,
+    ) -> None:
+        if (
+            plane_size.width not in PLANE_SIDES
+            or plane_size.height not in PLANE_SIDES
+            or plane_size.width * plane_size.height > PLANE_MAX_CELLS
+        ):
+            raise MapBuilderError(
+                f"Invalid plane size {plane_size.width}x{plane_size.height}. Sides "
+                f"must be one of {PLANE_SIDES} with at most {PLANE_MAX_CELLS} cells."
+            )
+
+        self.plane_size = plane_size
+        self.tilemap_builder = TilemapBuilder(tiled_file_path, tile_base)
+
+    def strips(self, tilemap: np.ndarray, columns: bool) -> StreamStrips:
+        """Split a tilemap into column or row strips and their DMA segments"""
+        plane_height, plane_width = self.plane_size
+        words = np.ascontiguousarray(tilemap.T if columns else tilemap)
+        count, length = words.shape
+        period = plane_height if columns else plane_width
+
+        # Every strip is split at the same plane wrap positions
+        starts = np.arange(0, length, period)
+        strips = np.arange(count)[:, None]
+        if count * len(starts) > 0xFFFF:
+            raise MapBuilderError(
+                f"The {'column' if columns else 'row'} strips have "
+                f"{count * len(starts)} segments, more than the 65535 the index "
+                "can address."
+            )
+
+        source = (strips * length + starts) * 2
+        lengths = np.broadcast_to(np.minimum(period, length - starts), source.shape)
+        if columns:
+            destination = np.broadcast_to((strips % plane_width) * 2, source.shape)
+        else:
+            destination = np.broadcast_to(
+                (strips % plane_height) * plane_width * 2, source.shape
+            )
+
+        segments = np.stack((source, lengths, destination), axis=-1).reshape(-1, 3)
+        index = np.stack(
+            (np.arange(count) * len(starts), np.full(count, len(starts))), axis=-1
+        )
+
+        return StreamStrips(
+            words.astype(">u2"),
+            segments.astype(">u4"),
+            index.astype(">u2"),
+            plane_width * 2 if columns else 2,
+        )
+
+    def save(
+        self,
+        output_path: Union[str, Path],
+        lo_layer: Optional[str] = None,
+        hi_layer: Optional[str] = None,
+        output_format: str = "bin",
+    ) -> List[Tuple[Path, bool]]:
+        """Export the column and row strips of a plane with their segment and index
+        tables. Files that are up to date are left untouched.
+
+        Every table is saved to its own file, suffixed _cols or _rows and then _seg or
+        _idx for the tables, either as raw big endian data or as C arrays.
+
+        Returns:
+            List[Tuple[Path, bool]]: every file and whether it was written
+        """
+        tilemap = self.tilemap_builder.build(
+            MapImageBuilder._plane_layers(lo_layer, hi_layer)
+        )
+        output_path = Path(output_path)
+
+        saved = []
+        for name, columns in (("cols", True), ("rows", False)):
+            strips = self.strips(tilemap, columns)
+            tables = (
+                (f"{name}", strips.words),
+                (f"{name}_seg", strips.segments),
+                (f"{name}_idx", strips.index),
+            )
+
+            for suffix, array in tables:
+                path = output_path.with_name(f"{output_path.name}_{suffix}")
+                if output_format == "c":
+                    saved.extend(write_c_array(path, array))
+                    continue
+
+                path = path.with_name(f"{path.name}.bin")
+                content = array.tobytes()
+                saved.append(
+                    (
+                        path,
+                        write_if_changed(
+                            path,
+                            [b"bin", array],
+                            lambda file, content=content: file.write(content),
+                        ),
+                    )
+                )
+
+        return saved
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mdutil.core.exceptions import RequestError
+from mdutil.core.img.tileset import TilesetImage
+from mdutil.core.map_builder import MapImageBuilder
+from mdutil.core.tmx.model import LayerType, Tileset
+from mdutil.core.util import FileCache, Rect
+
+PRIORITIES = {
+    "lo": TilesetImage.Priority.LO,
+    "hi": TilesetImage.Priority.HI,
+}
+
+
+class RenderServer:
+    """Long running render server speaking a line delimited JSON protocol.
+
+    Every request is a JSON object with an "id", a "method" and its "params". Every
+    response echoes the id and carries either a "result" or an "error". Requests are
+    processed concurrently, so responses may arrive out of order.
+
+    Loaded maps and decoded tileset images stay in LRU caches between requests, and
+    all parsing and rendering runs in a pool of worker threads. A map is loaded again
+    when its file or any of its tileset images change.
+    """
+
+    def __init__(
+        self,
+        max_maps: int = 16,
+        max_tilesets: int = 64,
+        jobs: Optional[int] = None,
+    ) -> None:
+        self.maps = FileCache(max_entries=max_maps)
+        Tileset.image_cache.resize(max_tilesets)
+
+        self.executor = ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1)
+        self.methods: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+            "load": self.load,
+            "render": self.render,
+            "export": self.export,
+            "evict": self.evict,
+            "stats": self.stats,
+        }
+
+        self._stopped: Optional[asyncio.Event] = None
+
+    @staticmethod
+    def _image_mtimes(builder: MapImageBuilder) -> Tuple[int, ...]:
+        return tuple(
+            os.stat(tileset.base_path.resolve().parent / tileset.image_name).st_mtime_ns
+            for tileset in builder.map_api.get_tilesets()
+        )
+
+    def _load_builder(self, path: Path) -> Tuple[MapImageBuilder, Tuple[int, ...]]:
+        builder = MapImageBuilder(path)
+        return builder, self._image_mtimes(builder)
+
+    def _builder(self, path: str) -> MapImageBuilder:
+        if not path:
+            raise RequestError("Missing map path.")
+
+        builder, mtimes = self.maps.get(path, self._load_builder)
+        if self._image_mtimes(builder) != mtimes:
+            # Builders keep the tileset images and palette they were created with
+            self.maps.discard(path)
+            builder, _ = self.maps.get(path, self._load_builder)
+
+        return builder
+
+    def load(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        builder = self._builder(params.get("path"))
+        api = builder.map_api
+        height, width = api.get_size_in_px()
+        tile_height, tile_width = api.get_tile_size()
+
+        return {
+            "width": width,
+            "height": height,
+            "tile_width": tile_width,
+            "tile_height": tile_height,
+            "layers": [layer.name for layer in api.get_layers(LayerType.TILE)],
+        }
+
+    @staticmethod
+    def _layers(params: Dict[str, Any]) -> List[Tuple[str, TilesetImage.Priority]]:
+        layers = []
+        for name, priority in params.get("layers", []):
+            if priority not in PRIORITIES:
+                raise RequestError(f"Invalid priority '{priority}'. Options [lo, hi].")
+
+            layers.append((name, PRIORITIES[priority]))
+
+        return layers
+
+    def render(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        builder = self._builder(params.get("path"))
+        layers = self._layers(params)
+
+        rect = params.get("rect")
+        if rect is None:
+            tilemap_array = builder.render(layers)
+        elif params.get("tiles", False):
+            tilemap_array = builder.render_tiles(layers, Rect(*rect))
+        else:
+            tilemap_array = builder.render(layers, Rect(*rect))
+
+        result = {
+            "width": tilemap_array.shape[1],
+            "height": tilemap_array.shape[0],
+            "data": b64encode(tilemap_array.tobytes()).decode("ascii"),
+        }
+        if params.get("palette", False) and builder.palette is not None:
+            result["palette"] = builder.palette.as_list()
+
+        return result
+
+    def export(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        builder = self._builder(params.get("path"))
+        output_folder = Path(params.get("output_folder", "."))
+        output_folder.mkdir(parents=True, exist_ok=True)
+
+        saved, unchanged = [], []
+        for plane, (lo, hi) in params.get("planes", {}).items():
+            if plane not in ("bga", "bgb"):
+                raise RequestError(
+                    f"Invalid plane identifier: '{plane}'. Options [bga, bgb]."
+                )
+
+            output = output_folder / f"{Path(params['path']).stem}_{plane.upper()}.png"
+            if builder.save(str(output), lo, hi):
+                saved.append(str(output))
+            else:
+                unchanged.append(str(output))
+
+        return {"saved": saved, "unchanged": unchanged}
+
+    def evict(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        path = params.get("path")
+        if path:
+            self.maps.discard(path)
+        else:
+            self.maps.clear()
+            Tileset.image_cache.clear()
+
+        return self.stats(params)
+
+    def stats(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"maps": len(self.maps), "tilesets": len(Tileset.image_cache)}
+
+    async def handle(self, line: str) -> Optional[Dict[str, Any]]:
+        """Process a single request line and build its response"""
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            return {"id": None, "error": {"message": f"Invalid JSON: {e}"}}
+
+        request_id = request.get("id")
+        method = request.get("method")
+
+        if method == "shutdown":
+            self._stopped.set()
+            return {"id": request_id, "result": {}}
+
+        handler = self.methods.get(method)
+        if handler is None:
+            return {"id": request_id, "error": {"message": f"Unknown method: {method}"}}
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self.executor, handler, request.get("params", {})
+            )
+        except Exception as e:
+            return {
+                "id": request_id,
+                "error": {"type": e.__class__.__name__, "message": str(e)},
+            }
+
+        return {"id": request_id, "result": result}
+
+    async def _serve_stream(
+        self,
+        readline: Callable[[], Any],
+        write: Callable[[bytes], Any],
+    ) -> None:
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(line: str) -> None:
+            response = await self.handle(line)
+            async with lock:
+                await write((json.dumps(response) + "\n").encode())
+
+        stopped = asyncio.create_task(self._stopped.wait())
+        while True:
+            # Stop waiting for input as soon as a shutdown is requested
+            read = asyncio.ensure_future(readline())
+            await asyncio.wait({read, stopped}, return_when=asyncio.FIRST_COMPLETED)
+            if not read.done():
+                read.cancel()
+                break
+
+            line = read.result()
+            if not line:
+                break
+
+            line = line.decode() if isinstance(line, bytes) else line
+            if not line.strip():
+                continue
+
+            task = asyncio.create_task(respond(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+        stopped.cancel()
+
+    async def serve_stdio(self) -> None:
+        self._stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        lines: asyncio.Queue = asyncio.Queue()
+
+        # Blocking reads happen in a daemon thread so a pending read never keeps
+        # the process alive after a shutdown request
+        def read_stdin() -> None:
+            for line in sys.stdin:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+            loop.call_soon_threadsafe(lines.put_nowait, "")
+
+        threading.Thread(target=read_stdin, daemon=True).start()
+
+        async def write(data: bytes) -> None:
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+
+        try:
+            await self._serve_stream(lines.get, write)
+        finally:
+            self.executor.shutdown()
+
+    async def serve_unix(self, socket_path: Path) -> None:
+        self._stopped = asyncio.Event()
+        clients = set()
+
+        async def client(
+            reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+        ) -> None:
+            async def write(data: bytes) -> None:
+                writer.write(data)
+                await writer.drain()
+
+            task = asyncio.current_task()
+            clients.add(task)
+            try:
+                await self._serve_stream(reader.readline, write)
+            finally:
+                writer.close()
+                clients.discard(task)
+
+        server = await asyncio.start_unix_server(client, path=str(socket_path))
+        try:
+            async with server:
+                await self._stopped.wait()
+
+            # Let every connection finish its pending responses
+            if clients:
+                await asyncio.gather(*clients, return_exceptions=True)
+        finally:
+            self.executor.shutdown()
+            if socket_path.exists():
+                socket_path.unlink()
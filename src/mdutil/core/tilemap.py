@@ -0,0 +1,100 @@
+from pathlib import Path
+from typing import Sequence, Tuple, Union
+
+import numpy as np
+
+from mdutil.core.exceptions import TileLayerError, TilesetError
+from mdutil.core.img.palette import LINE_COLORS
+from mdutil.core.img.tileset import TilesetImage
+from mdutil.core.map_builder import MapImageBuilder
+from mdutil.core.tmx.model import (
+    FLIPPED_DIAGONALLY,
+    FLIPPED_HORIZONTALLY,
+    FLIPPED_VERTICALLY,
+    GID_MASK,
+)
+
+# Fields of a plane tilemap word
+TILE_PRIORITY = 0x8000
+TILE_PALETTE_SHIFT = 13
+TILE_VFLIP = 0x1000
+TILE_HFLIP = 0x0800
+TILE_INDEX_MASK = 0x07FF
+
+
+class TilemapBuilder:
+    """Build the tilemap words of a plane from the tile layers of a map.
+
+    Tiles are numbered in VRAM in gid order, every tileset right after the previous
+    one, starting at a base tile index. The palette line of every tile is the one it
+    takes once the palettes of all tilesets are merged, as in the rendered planes.
+    Every field of the words comes from lookup tables indexed by gid, so a layer is
+    converted with a few gathers.
+    """
+
+    def __init__(
+        self,
+        tiled_file_path: Union[str, Path],
+        tile_base: int = 0,
+    ) -> None:
+        self.map_builder = MapImageBuilder(tiled_file_path)
+        self.map_api = self.map_builder.map_api
+        self.tile_base = tile_base
+
+    def luts(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Tile index and palette line of every gid"""
+        tilesets = sorted(self.map_api.get_tilesets(), key=lambda ts: ts.first_gid)
+        size = max((ts.first_gid + ts.tile_count for ts in tilesets), default=1)
+
+        indexes = np.full(size, -1, dtype=np.int64)
+        lines = np.zeros(size, dtype=np.int64)
+        indexes[0] = 0
+
+        base = self.tile_base
+        for tileset in tilesets:
+            start, count = tileset.first_gid, tileset.tile_count
+            indexes[start : start + count] = base + np.arange(count)
+            tile_lines = tileset.image.tiles_lo.max(axis=(2, 3)).ravel() // LINE_COLORS
+            lines[start : start + min(count, len(tile_lines))] = tile_lines[:count]
+            base += count
+
+        if base - 1 > TILE_INDEX_MASK:
+            raise TilesetError(
+                f"The tilesets need tile indexes up to {base - 1}, more than "
+                f"{TILE_INDEX_MASK}."
+            )
+
+        return indexes, lines
+
+    def build(self, layers: Sequence[Tuple[str, TilesetImage.Priority]]) -> np.ndarray:
+        """Tilemap words of a combination of tile layers stacked in order, with shape
+        (rows, columns). Empty cells are 0."""
+        indexes, lines = self.luts()
+        rows, columns = self.map_api.get_size_in_tile()
+        words = np.zeros((rows, columns), dtype=np.uint16)
+
+        for name, priority in layers:
+            grid = self.map_api.get_gid_grid(name)
+            used = grid != 0
+            flags, gids = grid[used] & ~np.uint32(GID_MASK), grid[used] & GID_MASK
+
+            if (flags & FLIPPED_DIAGONALLY).any():
+                raise TileLayerError(
+                    f"Layer '{name}' has rotated tiles, the Megadrive can only flip."
+                )
+            known = gids < len(indexes)
+            known[known] = indexes[gids[known]] >= 0
+            if not known.all():
+                raise TilesetError(
+                    f"Gid: {gids[~known][0]} not found in tileset collection."
+                )
+
+            cells = indexes[gids] | lines[gids] << TILE_PALETTE_SHIFT
+            cells |= np.where(flags & FLIPPED_HORIZONTALLY, TILE_HFLIP, 0)
+            cells |= np.where(flags & FLIPPED_VERTICALLY, TILE_VFLIP, 0)
+            if priority == TilesetImage.Priority.HI:
+                cells |= TILE_PRIORITY
+
+            words[used] = cells
+
+        return words
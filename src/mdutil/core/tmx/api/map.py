@@ -3,8 +3,18 @@ from typing import List
 import numpy as np
 
 from mdutil.core.exceptions import *
-from mdutil.core.tmx.model import BaseLayer, LayerType, Object, TmxMap
-from mdutil.core.util import Size
+from mdutil.core.tmx.model import (
+    FLIPPED_DIAGONALLY,
+    FLIPPED_HORIZONTALLY,
+    FLIPPED_VERTICALLY,
+    GID_MASK,
+    BaseLayer,
+    LayerType,
+    Object,
+    Tileset,
+    TmxMap,
+)
+from mdutil.core.util import Point, Size
 
 
 class MapApi:
@@ -20,9 +30,13 @@ class MapApi:
     def get_size_in_px(self) -> Size:
         return Size(
             self._map.height * self._map.tile_height,
-            self._map.width * self._map.tile_height,
+            self._map.width * self._map.tile_width,
         )
 
+    def get_origin(self) -> Point:
+        """Position in tiles of the top left cell of the map"""
+        return Point(self._map.start_x, self._map.start_y)
+
     def get_tile_size(self) -> Size:
         return Size(self._map.tile_height, self._map.tile_width)
 
@@ -54,9 +68,82 @@ class MapApi:
 
         raise TiledMapError(f"Layer '{name}' not found in the map file.")
 
+    def get_gid_grid(self, name: str) -> np.ndarray:
+        """Gids of a tile layer over the whole map as an array of shape (rows, columns)"""
+        rows, columns = self.get_size_in_tile()
+        origin = self.get_origin()
+
+        grid = np.zeros((rows, columns), dtype=np.uint32)
+        layer = self.get_layer_by_name(LayerType.TILE, name)
+        cell_rows, cell_columns, gids = layer.cells_in(
+            origin.x, origin.y, columns, rows
+        )
+        grid[cell_rows, cell_columns] = gids
+
+        return grid
+
+    def get_property_lut(self, name: str, default: int = 0) -> np.ndarray:
+        """Lookup table with the value of a numeric tile property for every gid.
+
+        The empty gid 0 and tiles without the property take the default value.
+        """
+        size = max(
+            (tileset.first_gid + tileset.tile_count for tileset in self._map.tilesets),
+            default=1,
+        )
+        lut = np.full(size, default, dtype=np.int64)
+        for tileset in self._map.tilesets:
+            start = tileset.first_gid
+            lut[start : start + tileset.tile_count] = tileset.property_array(
+                name, default
+            )
+
+        return lut
+
+    def get_tilesets(self) -> List[Tileset]:
+        return self._map.tilesets
+
     def get_tile(self, gid: int, priority) -> np.ndarray:
         for tileset in self._map.tilesets:
             if gid in tileset:
                 return tileset.get_tile(gid, priority)
 
         raise TilesetError(f"Gid: {gid} not found in tileset collection.")
+
+    def get_tiles(self, gids: np.ndarray, priority) -> np.ndarray:
+        """Gather the tiles for an array of gids into an array of shape (n, h, w).
+
+        The flip flags of the gids are applied as tiled does: the diagonal flip first,
+        then the horizontal and vertical ones.
+        """
+        tile_size = self.get_tile_size()
+        flags = gids & ~np.uint32(GID_MASK)
+        gids = gids & GID_MASK
+
+        tiles = np.empty((len(gids), *tile_size), dtype=np.uint8)
+        found = np.zeros(len(gids), dtype=bool)
+
+        for tileset in self._map.tilesets:
+            mask = tileset.contains(gids)
+            if mask.any():
+                tiles[mask] = tileset.get_tiles(gids[mask], priority)
+                found |= mask
+
+        if not found.all():
+            raise TilesetError(
+                f"Gid: {gids[~found][0]} not found in tileset collection."
+            )
+
+        if flags.any():
+            diagonal = (flags & FLIPPED_DIAGONALLY) != 0
+            if diagonal.any():
+                if tile_size.width != tile_size.height:
+                    raise TilesetError("Only square tiles can be rotated.")
+                tiles[diagonal] = tiles[diagonal].swapaxes(1, 2)
+
+            horizontal = (flags & FLIPPED_HORIZONTALLY) != 0
+            tiles[horizontal] = tiles[horizontal][:, :, ::-1]
+            vertical = (flags & FLIPPED_VERTICALLY) != 0
+            tiles[vertical] = tiles[vertical][:, ::-1, :]
+
+        return tiles
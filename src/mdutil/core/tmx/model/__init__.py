@@ -1,15 +1,34 @@
-from .layer import BaseLayer, LayerType, ObjectLayer, TileLayer
+from .animation import AnimationFrame
+from .layer import (
+    FLIPPED_DIAGONALLY,
+    FLIPPED_HORIZONTALLY,
+    FLIPPED_VERTICALLY,
+    GID_MASK,
+    BaseLayer,
+    LayerType,
+    ObjectLayer,
+    TileLayer,
+)
 from .map import TmxMap, TmxMapFactory
+from .map_cache import MapCache
 from .object import Object
 from .property import CustomProperty
+from .tileset import Tileset
 
 __all__ = [
+    "AnimationFrame",
+    "FLIPPED_DIAGONALLY",
+    "FLIPPED_HORIZONTALLY",
+    "FLIPPED_VERTICALLY",
+    "GID_MASK",
     "BaseLayer",
     "LayerType",
     "ObjectLayer",
     "TileLayer",
     "TmxMap",
     "TmxMapFactory",
+    "MapCache",
     "Object",
     "CustomProperty",
+    "Tileset",
 ]
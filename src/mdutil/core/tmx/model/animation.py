@@ -0,0 +1,18 @@
+from typing import Any, Dict
+
+
+class AnimationFrame:
+    def __init__(self, tile_id: int, duration: int) -> None:
+        self.tile_id = tile_id
+        # Milliseconds the frame is shown
+        self.duration = duration
+
+    def __repr__(self) -> str:
+        return f"AnimationFrame(tile_id={self.tile_id}, duration={self.duration})"
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AnimationFrame":
+        return cls(
+            tile_id=int(data.get("tileid", 0)),
+            duration=int(data.get("duration", 0)),
+        )
@@ -1,10 +1,11 @@
-import gzip
-import io
+import os
+import threading
 import zlib
 from abc import ABC, abstractmethod
 from base64 import b64decode
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum, auto
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import zstandard as zstd
@@ -15,6 +16,12 @@ from mdutil.core.util import smart_repr
 from .object import Object
 from .property import CustomProperty
 
+# The high bits of a gid hold the flip and rotation flags of the cell
+GID_MASK = 0x0FFFFFFF
+FLIPPED_HORIZONTALLY = 0x80000000
+FLIPPED_VERTICALLY = 0x40000000
+FLIPPED_DIAGONALLY = 0x20000000
+
 
 class LayerType(Enum):
     TILE = auto()
@@ -61,27 +68,130 @@ class TileLayerIterator:
         return value
 
 
+class SparseTileData:
+    """Coordinate list with the position and gid of every non empty cell of a layer"""
+
+    def __init__(self, indices: np.ndarray, gids: np.ndarray, size: int) -> None:
+        self.indices = indices
+        self.gids = gids
+        self.size = size
+
+    def __len__(self) -> int:
+        return len(self.gids)
+
+    @property
+    def density(self) -> float:
+        return len(self.gids) / self.size if self.size else 0.0
+
+    def to_dense(self) -> np.ndarray:
+        tile_data = np.zeros(self.size, dtype=np.uint32)
+        tile_data[self.indices] = self.gids
+        return tile_data
+
+    @classmethod
+    def from_dense(cls, tile_data: np.ndarray) -> "SparseTileData":
+        indices = np.flatnonzero(tile_data)
+        return cls(indices, tile_data[indices], len(tile_data))
+
+
 class TileLayer(BaseLayer):
+    # Layers with a lower ratio of non empty cells only keep the sparse form
+    SPARSE_DENSITY = 0.25
+
     def __init__(
         self,
-        tile_data: List[int],
+        tile_data: Union[np.ndarray, SparseTileData],
         name: str,
         id_: int,
         width: int,
         height: int,
         properties: List[CustomProperty] = None,
+        start_x: int = 0,
+        start_y: int = 0,
     ) -> None:
         super().__init__(LayerType.TILE, name, id_, width, height, properties)
-        self.tile_data = tile_data
+
+        # Position of the top left cell. Only infinite maps have non zero values
+        self.start_x = start_x
+        self.start_y = start_y
+
+        if isinstance(tile_data, SparseTileData):
+            self.sparse = tile_data
+        else:
+            tile_data = np.asarray(tile_data, dtype=np.uint32)
+            self.sparse = SparseTileData.from_dense(tile_data)
+
+        if self.sparse.density < self.SPARSE_DENSITY:
+            self._tile_data = None
+        elif isinstance(tile_data, SparseTileData):
+            self._tile_data = tile_data.to_dense()
+        else:
+            self._tile_data = tile_data
+
+    @property
+    def is_sparse(self) -> bool:
+        return self._tile_data is None
+
+    @property
+    def tile_data(self) -> np.ndarray:
+        """Gid of every cell in row major order"""
+        if self._tile_data is None:
+            return self.sparse.to_dense()
+
+        return self._tile_data
 
     def __iter__(self) -> TileLayerIterator:
         return TileLayerIterator(self.tile_data)
 
     def __len__(self) -> int:
-        return len(self.tile_data)
+        return self.sparse.size
+
+    def cells_in(
+        self, x: int, y: int, width: int, height: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Find the non empty cells inside a rectangle.
+
+        Dense layers are sliced and sparse layers binary searched by row, so the cost
+        depends on the size of the rectangle and not on the size of the layer.
+
+        Args:
+            x (int): left of the rectangle in map tiles
+            y (int): top of the rectangle in map tiles
+            width (int): width of the rectangle in tiles
+            height (int): height of the rectangle in tiles
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: rows and columns relative to the
+            rectangle and the gid of every non empty cell
+        """
+        # Rectangle in layer coordinates, clipped to the layer
+        left, top = x - self.start_x, y - self.start_y
+        x0, x1 = max(left, 0), min(left + width, self.width)
+        y0, y1 = max(top, 0), min(top + height, self.height)
+
+        if x0 >= x1 or y0 >= y1 or not len(self.sparse):
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty, np.zeros(0, dtype=np.uint32)
+
+        if self._tile_data is not None:
+            grid = self._tile_data.reshape(self.height, self.width)[y0:y1, x0:x1]
+            rows, columns = np.nonzero(grid)
+            gids = grid[rows, columns]
+            rows += y0
+            columns += x0
+        else:
+            indices, gids = self.sparse.indices, self.sparse.gids
+            lo, hi = np.searchsorted(indices, (y0 * self.width, y1 * self.width))
+            rows, columns = np.divmod(indices[lo:hi], self.width)
+            inside = (columns >= x0) & (columns < x1)
+            rows, columns, gids = rows[inside], columns[inside], gids[lo:hi][inside]
+
+        return rows - top, columns - left, gids
 
     def __repr__(self) -> str:
-        description = [smart_repr(self, exclude=("properties", "type", "tile_data"))]
+        description = [
+            smart_repr(self, exclude=("properties", "type", "tile_data", "sparse"))
+        ]
         for prop in self.properties:
             description.append(f"   *{str(prop)}")
 
@@ -90,29 +200,23 @@ class TileLayer(BaseLayer):
     @classmethod
     def from_dict(cls, data: Dict[str, any]) -> "TileLayer":
         encoding = data.get("encoding", "csv")
-
-        if encoding == "csv":
-            tile_data = TileData.from_csv(data.get("data", []))
-        elif encoding == "base64":
-
-            tiles = data.get("data", "")
-            compression = data.get("compression", None)
-
-            match compression:
-                case None:
-                    tile_data = TileData.from_base64(tiles)
-                case "zlib":
-                    tile_data = TileData.from_base64_zlib(tiles)
-                case "gzip":
-                    tile_data = TileData.from_base64_gzip(tiles)
-                case "zstd":
-                    tile_data = TileData.from_base64_zstd(tiles)
-                case _:
-                    raise TileLayerError(
-                        f"Unsupported tile layer compression: {compression}"
-                    )
+        compression = data.get("compression", None)
+
+        start_x, start_y = 0, 0
+        width, height = data.get("width", 0), data.get("height", 0)
+
+        if "tile_data" in data:  # already decoded, restored from a map cache
+            tile_data = data["tile_data"]
+            start_x, start_y = data.get("startx", 0), data.get("starty", 0)
+        elif "chunks" in data:
+            tile_data, (start_x, start_y, width, height) = TileData.from_chunks(
+                data["chunks"], encoding, compression
+            )
         else:
-            raise TileLayerError(f"Unsupported tile layer encoding: {encoding}")
+            size = width * height
+            tile_data = TileData.decode(
+                data.get("data", []), encoding, compression, size or None
+            )
 
         properties = [
             CustomProperty.from_dict(prop) for prop in data.get("properties", [])
@@ -122,38 +226,185 @@ class TileLayer(BaseLayer):
             tile_data=tile_data,
             name=data.get("name", ""),
             id_=data.get("id", 0),
-            width=data.get("width", 0),
-            height=data.get("height", 0),
+            width=width,
+            height=height,
             properties=properties,
+            start_x=start_x,
+            start_y=start_y,
         )
 
 
 class TileData:
+    _local = threading.local()
+    _decode_executor: Optional[ThreadPoolExecutor] = None
+    _executor_lock = threading.Lock()
+
+    @classmethod
+    def _zstd_decompressor(cls) -> zstd.ZstdDecompressor:
+        # Decompression contexts are not thread safe, so every thread reuses its own
+        decomp = getattr(cls._local, "zstd", None)
+        if decomp is None:
+            decomp = cls._local.zstd = zstd.ZstdDecompressor()
+
+        return decomp
+
+    @classmethod
+    def _executor(cls) -> ThreadPoolExecutor:
+        with cls._executor_lock:
+            if cls._decode_executor is None:
+                cls._decode_executor = ThreadPoolExecutor(
+                    max_workers=os.cpu_count() or 1,
+                    thread_name_prefix="mdutil-decode",
+                )
+
+        return cls._decode_executor
+
+    @classmethod
+    def _reset_after_fork(cls) -> None:
+        # The pool threads don't exist in a forked child, which starts its own pool
+        cls._local = threading.local()
+        cls._decode_executor = None
+        cls._executor_lock = threading.Lock()
+
+    @classmethod
+    def map(cls, func: Callable[[Any], Any], items: Sequence[Any]) -> List[Any]:
+        """Apply func to every item in the shared decoding pool, keeping the order.
+
+        zlib and zstd release the GIL, so payloads decode in parallel. Nested calls
+        made from a pool worker, like the chunks of a layer decoded in the pool, run
+        serially in that worker so workers never block waiting for each other.
+        """
+        if len(items) < 2 or getattr(cls._local, "worker", False):
+            return [func(item) for item in items]
+
+        def run(item: Any) -> Any:
+            cls._local.worker = True
+            return func(item)
+
+        return list(cls._executor().map(run, items))
+
     @staticmethod
-    def from_base64(tile_data: str) -> List[int]:
-        return np.frombuffer(b64decode(tile_data), dtype=np.uint32).tolist()
+    def decode(
+        tile_data: Any,
+        encoding: str = "csv",
+        compression: Optional[str] = None,
+        size: Optional[int] = None,
+    ) -> np.ndarray:
+        """Decode a tile layer or chunk payload into an array of gids.
+
+        When the number of gids is known, compressed payloads are decompressed
+        straight into a buffer of that size, and any other size is an error.
+        """
+        if encoding == "csv":
+            gids = TileData.from_csv(tile_data)
+        elif encoding != "base64":
+            raise TileLayerError(f"Unsupported tile layer encoding: {encoding}")
+        else:
+            match compression:
+                case None | "":
+                    gids = TileData.from_base64(tile_data)
+                case "zlib":
+                    gids = TileData.from_base64_zlib(tile_data, size)
+                case "gzip":
+                    gids = TileData.from_base64_gzip(tile_data, size)
+                case "zstd":
+                    gids = TileData.from_base64_zstd(tile_data, size)
+                case _:
+                    raise TileLayerError(
+                        f"Unsupported tile layer compression: {compression}"
+                    )
+
+        if size is not None and len(gids) != size:
+            raise TileLayerError(f"Expected {size} tiles but the data has {len(gids)}.")
+
+        return gids
+
+    @classmethod
+    def from_chunks(
+        cls,
+        chunks: List[Dict[str, Any]],
+        encoding: str = "csv",
+        compression: Optional[str] = None,
+    ) -> Tuple[np.ndarray, Tuple[int, int, int, int]]:
+        """Decode the chunks of an infinite map layer in parallel and place them in
+        a single array bounding all of them.
+
+        Returns:
+            Tuple[np.ndarray, Tuple[int, int, int, int]]: the gids in row major order and
+            the bounds of the layer as (start_x, start_y, width, height) in tiles
+        """
+        if not chunks:
+            return np.zeros(0, dtype=np.uint32), (0, 0, 0, 0)
+
+        payloads = cls.map(
+            lambda chunk: cls.decode(
+                chunk.get("data", []),
+                encoding,
+                compression,
+                chunk["width"] * chunk["height"],
+            ),
+            chunks,
+        )
+
+        start_x = min(chunk["x"] for chunk in chunks)
+        start_y = min(chunk["y"] for chunk in chunks)
+        width = max(chunk["x"] + chunk["width"] for chunk in chunks) - start_x
+        height = max(chunk["y"] + chunk["height"] for chunk in chunks) - start_y
+
+        tile_data = np.zeros((height, width), dtype=np.uint32)
+        for chunk, payload in zip(chunks, payloads):
+            x, y = chunk["x"] - start_x, chunk["y"] - start_y
+            tile_data[y : y + chunk["height"], x : x + chunk["width"]] = (
+                payload.reshape(chunk["height"], chunk["width"])
+            )
+
+        return tile_data.ravel(), (start_x, start_y, width, height)
 
     @staticmethod
-    def from_base64_zlib(tile_data: str) -> List[int]:
-        return np.frombuffer(
-            zlib.decompress(b64decode(tile_data)), dtype=np.uint32
-        ).tolist()
+    def from_base64(tile_data: str) -> np.ndarray:
+        return np.frombuffer(b64decode(tile_data), dtype=np.uint32)
 
     @staticmethod
-    def from_base64_gzip(tile_data: str) -> List[int]:
-        with gzip.GzipFile(fileobj=io.BytesIO(b64decode(tile_data))) as f:
-            return np.frombuffer(f.read(), dtype=np.uint32).tolist()
+    def from_base64_zlib(tile_data: str, size: Optional[int] = None) -> np.ndarray:
+        # With a known size the output buffer is allocated once with its final length
+        bufsize = size * 4 if size else zlib.DEF_BUF_SIZE
+        raw = zlib.decompress(b64decode(tile_data), zlib.MAX_WBITS, bufsize)
+        return np.frombuffer(raw, dtype=np.uint32)
 
     @staticmethod
-    def from_base64_zstd(tile_data: str) -> List[int]:
-        decomp = zstd.ZstdDecompressor()
-        return np.frombuffer(
-            decomp.decompress(b64decode(tile_data)), dtype=np.uint32
-        ).tolist()
+    def from_base64_gzip(tile_data: str, size: Optional[int] = None) -> np.ndarray:
+        bufsize = size * 4 if size else zlib.DEF_BUF_SIZE
+        raw = zlib.decompress(b64decode(tile_data), zlib.MAX_WBITS | 16, bufsize)
+        return np.frombuffer(raw, dtype=np.uint32)
+
+    @classmethod
+    def from_base64_zstd(cls, tile_data: str, size: Optional[int] = None) -> np.ndarray:
+        decomp = cls._zstd_decompressor()
+        if size is None:
+            raw = decomp.decompress(b64decode(tile_data))
+            return np.frombuffer(raw, dtype=np.uint32)
+
+        # Decompress straight into the gid array
+        gids = np.empty(size, dtype=np.uint32)
+        buffer = memoryview(gids).cast("B")
+        written = 0
+        with decomp.stream_reader(b64decode(tile_data)) as reader:
+            while written < len(buffer):
+                count = reader.readinto(buffer[written:])
+                if not count:
+                    break
+                written += count
+
+            if written != len(buffer) or reader.read(1):
+                raise TileLayerError(
+                    f"Expected {size} tiles but the zstd data has a different size."
+                )
+
+        return gids
 
     @staticmethod
-    def from_csv(tile_data: List[str]) -> List[int]:
-        return [int(tile) for tile in tile_data]
+    def from_csv(tile_data: List[str]) -> np.ndarray:
+        return np.array(tile_data, dtype=np.uint32)
 
 
 class ObjectLayerIterator:
@@ -219,3 +470,6 @@ class ObjectLayer(BaseLayer):
             height=data.get("height", 0),
             properties=properties,
         )
+
+
+os.register_at_fork(after_in_child=TileData._reset_after_fork)
@@ -1,32 +1,124 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from mdutil.core.exceptions import *
 from mdutil.core.tmx.parser import *
-from mdutil.core.util import Size, smart_repr
+from mdutil.core.util import FileCache, Size, smart_repr
 
-from .layer import BaseLayer, LayerType, ObjectLayer, TileLayer
+from .layer import BaseLayer, LayerType, ObjectLayer, TileData, TileLayer
+from .map_cache import MapCache
 from .tileset import Tileset
 
+# Parsed external tilesets, shared by all the maps that reference them
+_tileset_cache = FileCache()
+
 
 class TmxMapFactory:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        cache: Optional[MapCache] = None,
+        use_cache: bool = True,
+        load_images: bool = True,
+    ) -> None:
+        self.cache = (cache or MapCache.default()) if use_cache else None
+        # Without it, tileset images are only decoded when they're first used
+        self.load_images = load_images
+
         self.parsers: Dict[str, TmxParser] = {
             ".json": JsonTmxParser(),
             ".tmj": JsonTmxParser(),
             ".tmx": XmlTmxParser(),
             ".xml": XmlTmxParser(),
         }
+        self.tileset_parsers: Dict[str, TmxParser] = {
+            ".json": JsonTsxParser(),
+            ".tsj": JsonTsxParser(),
+            ".tsx": XmlTsxParser(),
+            ".xml": XmlTsxParser(),
+        }
 
-    def from_file(self, file_path: Union[str, Path]) -> "TmxMap":
+    def parse(self, file_path: Union[str, Path]) -> Dict[str, Any]:
+        """Parse a tiled file into a dictionary without building the map"""
         path = Path(file_path)
+        return self._resolve(self._read(path), path)
+
+    def _read(self, path: Path) -> Dict[str, Any]:
         parser = self.parsers.get(path.suffix.lower())
         if not parser:
             raise TiledMapError(f"Unrecognized file format: {path}")
 
-        content = parser.parse(path)
-        content["path"] = path
-        return TmxMap.from_dict(content)
+        return parser.parse(path)
+
+    def _resolve(self, content: Dict[str, Any], path: Path) -> Dict[str, Any]:
+        return {
+            **content,
+            "path": path,
+            "tilesets": [
+                self._resolve_tileset(tileset, path)
+                for tileset in content.get("tilesets", [])
+            ],
+        }
+
+    def _resolve_tileset(self, data: Dict[str, Any], map_path: Path) -> Dict[str, Any]:
+        """Replace a reference to an external tileset with its parsed content"""
+        source = data.get("source")
+        if not source:
+            return data
+
+        path = map_path.parent / source
+        parser = self.tileset_parsers.get(path.suffix.lower())
+        if not parser:
+            raise TilesetError(f"Unrecognized tileset format: {path}")
+
+        def load(tileset_path: Path) -> Dict[str, Any]:
+            tileset = parser.parse(tileset_path)
+            # Image paths are relative to the tileset file
+            if "image" in tileset:
+                tileset["image"] = str(tileset_path.parent / tileset["image"])
+            return tileset
+
+        try:
+            tileset = _tileset_cache.get(path, load)
+        except FileNotFoundError as e:
+            raise TilesetError(f"External tileset not found: {path}") from e
+
+        return {**tileset, "firstgid": data.get("firstgid", 0)}
+
+    def from_file(self, file_path: Union[str, Path]) -> "TmxMap":
+        path = Path(file_path)
+
+        entry = None
+        content = None
+        if self.cache is not None and path.suffix.lower() in self.parsers:
+            entry = self.cache.entry(path)
+            content = self.cache.load(entry)
+
+        if content is not None:
+            return self._build(self._resolve(content, path))
+
+        content = self._read(path)
+        tmx_map = self._build(self._resolve(content, path))
+
+        if entry is not None:
+            self.cache.store(entry, content, tmx_map.layers[LayerType.TILE])
+
+        return tmx_map
+
+    def _build(self, content: Dict[str, Any]) -> "TmxMap":
+        tilesets = content.get("tilesets", [])
+        if not tilesets or not self.load_images:
+            return TmxMap.from_dict(content)
+
+        # Tileset images are decoded in worker threads while the layers are decoded
+        workers = min(len(tilesets), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            images = [
+                Tileset.prefetch_image(executor, tileset, content["path"])
+                for tileset in tilesets
+            ]
+            return TmxMap.from_dict(content, images)
 
 
 class TmxMap:
@@ -39,8 +131,14 @@ class TmxMap:
         layers: Dict[LayerType, List[BaseLayer]],
         tilesets: List[Tileset],
         path: Path,
+        infinite: bool = False,
+        start_x: int = 0,
+        start_y: int = 0,
     ) -> None:
         self.path = path
+        self.infinite = infinite
+        self.start_x = start_x
+        self.start_y = start_y
         self.width = width
         self.height = height
         self.tile_width = tile_width
@@ -67,7 +165,9 @@ class TmxMap:
         return "\n".join(description)
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any]) -> "TmxMap":
+    def from_dict(
+        cls, data: Dict[str, Any], images: Optional[List[Future]] = None
+    ) -> "TmxMap":
         layers = {
             LayerType.TILE: [],
             LayerType.OBJECT: [],
@@ -75,28 +175,62 @@ class TmxMap:
 
         tilesets = []
 
+        tile_layers = []
         for layer_data in data.get("layers", []):
             layer_type = layer_data["type"]
             if layer_type == "tilelayer":
-                layers[LayerType.TILE].append(TileLayer.from_dict(layer_data))
+                tile_layers.append(layer_data)
             elif layer_type == "objectgroup":
                 layers[LayerType.OBJECT].append(ObjectLayer.from_dict(layer_data))
             else:
                 raise TiledMapError(f"Unsupported layer type {layer_type}")
 
-        for tileset_data in data.get("tilesets", []):
-            tilesets.append(Tileset.from_dict(tileset_data, data.get("path")))
+        # Tile layers are decoded concurrently
+        layers[LayerType.TILE] = TileData.map(TileLayer.from_dict, tile_layers)
+
+        tileset_data = data.get("tilesets", [])
+        images = images or [None] * len(tileset_data)
+        for tileset, image in zip(tileset_data, images):
+            tilesets.append(Tileset.from_dict(tileset, data.get("path"), image))
+
+        infinite = str(data.get("infinite", 0)).lower() in ("1", "true")
+        if infinite:
+            # The map covers the bounds of all the chunks in its tile layers
+            start_x, start_y, width, height = cls._tile_layer_bounds(
+                layers[LayerType.TILE]
+            )
+        else:
+            start_x, start_y = 0, 0
+            width, height = data.get("width", 0), data.get("height", 0)
 
         return cls(
             path=data.get("path", None),
-            width=data.get("width", 0),
-            height=data.get("height", 0),
+            infinite=infinite,
+            start_x=start_x,
+            start_y=start_y,
+            width=width,
+            height=height,
             tile_width=data.get("tilewidth", 0),
             tile_height=data.get("tileheight", 0),
             layers=layers,
             tilesets=tilesets,
         )
 
+    @staticmethod
+    def _tile_layer_bounds(layers: List[TileLayer]) -> Tuple[int, int, int, int]:
+        layers = [layer for layer in layers if len(layer)]
+        if not layers:
+            return 0, 0, 0, 0
+
+        start_x = min(layer.start_x for layer in layers)
+        start_y = min(layer.start_y for layer in layers)
+        end_x = max(layer.start_x + layer.width for layer in layers)
+        end_y = max(layer.start_y + layer.height for layer in layers)
+
+        return start_x, start_y, end_x - start_x, end_y - start_y
+
     @classmethod
-    def from_file(self, file_path: Union[str, Path]) -> "TmxMap":
-        return TmxMapFactory().from_file(file_path)
+    def from_file(
+        self, file_path: Union[str, Path], load_images: bool = True
+    ) -> "TmxMap":
+        return TmxMapFactory(load_images=load_images).from_file(file_path)
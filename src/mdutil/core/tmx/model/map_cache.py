@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from mdutil.version import __version__
+
+from .layer import SparseTileData, TileLayer
+
+
+class MapCache:
+    """On disk cache of decoded tiled maps.
+
+    Snapshots are uncompressed npz files keyed by a hash of the map file content and
+    the mdutil version. Tile layers are stored as arrays, in their sparse form when
+    the layer is sparse, and everything else in the parsed map (attributes, tileset
+    references, object layers and properties) as a JSON document. External tilesets
+    are stored as references and resolved again on every load.
+    """
+
+    ENV_DIR = "MDUTIL_CACHE_DIR"
+    ENV_DISABLE = "MDUTIL_NO_CACHE"
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = Path(cache_dir)
+
+    @classmethod
+    def default(cls) -> Optional["MapCache"]:
+        """The user cache, or None when disabled through MDUTIL_NO_CACHE"""
+        if os.environ.get(cls.ENV_DISABLE):
+            return None
+
+        cache_dir = os.environ.get(cls.ENV_DIR)
+        if not cache_dir:
+            base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+            cache_dir = Path(base) / "mdutil" / "maps"
+
+        return cls(Path(cache_dir))
+
+    def entry(self, path: Path) -> Path:
+        """Snapshot file for the current content of a map file"""
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(__version__.encode())
+        digest.update(path.read_bytes())
+
+        return self.cache_dir / f"{digest.hexdigest()}.npz"
+
+    def load(self, entry: Path) -> Optional[Dict[str, Any]]:
+        """Restore the parsed content of a map with its tile layers already decoded"""
+        try:
+            if not entry.exists():
+                return None
+
+            with np.load(entry, allow_pickle=False) as snapshot:
+                content = json.loads(snapshot["meta"].tobytes())
+                for layer in content.get("layers", []):
+                    if layer.get("type") != "tilelayer":
+                        continue
+
+                    key = layer.pop("array")
+                    if layer.pop("sparse"):
+                        layer["tile_data"] = SparseTileData(
+                            snapshot[f"{key}_indices"].astype(np.intp),
+                            snapshot[f"{key}_gids"],
+                            layer["width"] * layer["height"],
+                        )
+                    else:
+                        layer["tile_data"] = snapshot[key]
+        except (OSError, ValueError, KeyError):
+            # A missing or unreadable snapshot is a cache miss
+            return None
+
+        return content
+
+    def store(
+        self, entry: Path, content: Dict[str, Any], tile_layers: List[TileLayer]
+    ) -> None:
+        """Save a snapshot of a map from its parsed content and its decoded layers"""
+        arrays: Dict[str, np.ndarray] = {}
+        layers = []
+
+        decoded = iter(tile_layers)
+        layer_index = 0
+        for layer_data in content.get("layers", []):
+            if layer_data.get("type") != "tilelayer":
+                layers.append(layer_data)
+                continue
+
+            layer = next(decoded)
+            key = f"layer_{layer_index}"
+            layer_index += 1
+            meta = {
+                attr: val
+                for attr, val in layer_data.items()
+                if attr not in ("data", "chunks", "encoding", "compression")
+            }
+            meta.update(
+                array=key,
+                sparse=layer.is_sparse,
+                width=layer.width,
+                height=layer.height,
+                startx=layer.start_x,
+                starty=layer.start_y,
+            )
+
+            if layer.is_sparse:
+                arrays[f"{key}_indices"] = layer.sparse.indices.astype(np.uint32)
+                arrays[f"{key}_gids"] = layer.sparse.gids
+            else:
+                arrays[key] = layer.tile_data
+
+            layers.append(meta)
+
+        meta = {attr: val for attr, val in content.items() if attr != "path"}
+        meta["layers"] = layers
+
+        try:
+            arrays["meta"] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+            # Write to a temporary file so concurrent readers never see partial files
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    np.savez(file, **arrays)
+                os.replace(tmp_path, entry)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except (OSError, TypeError, ValueError):
+            # The cache is an optimization, failing to write it is not an error
+            pass
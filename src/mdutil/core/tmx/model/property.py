@@ -15,6 +15,9 @@ class CustomProperty:
         elif value_type == "float":
             return float(value)
         elif value_type == "bool":
+            # Tmx files store booleans as the strings "true" and "false"
+            if isinstance(value, str):
+                return value.lower() == "true"
             return bool(value)
         elif value_type in ["string", "file"]:
             return str(value)
@@ -1,13 +1,21 @@
+from concurrent.futures import Executor, Future
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 import numpy as np
 
-from mdutil.core.img import TilesetImage
-from mdutil.core.util import Size, smart_repr
+from mdutil.core.exceptions import PropertyError
+from mdutil.core.img import Palette, TilesetImage
+from mdutil.core.util import FileCache, Size, smart_repr
+
+from .animation import AnimationFrame
+from .property import CustomProperty
 
 
 class Tileset:
+    # Decoded tileset images, shared by all the maps that use them
+    image_cache = FileCache()
+
     def __init__(
         self,
         base_path: Path,
@@ -20,6 +28,9 @@ class Tileset:
         tile_count: int,
         tile_height: int,
         tile_width: int,
+        image: Optional[Future] = None,
+        tile_properties: Optional[Dict[int, List[CustomProperty]]] = None,
+        tile_animations: Optional[Dict[int, List[AnimationFrame]]] = None,
     ) -> None:
         self.base_path = base_path
         self.columns = columns
@@ -31,25 +42,113 @@ class Tileset:
         self.tile_count = tile_count
         self.tile_height = tile_height
         self.tile_width = tile_width
+        self.tile_properties = tile_properties or {}
+        self.tile_animations = tile_animations or {}
+
+        # The image is decoded on first use, unless a decode was already started
+        self._image_future = image
+        self._tileset_image: Optional[TilesetImage] = None
 
-        self._load_image()
+    def _load_image(self) -> TilesetImage:
+        if self._image_future is not None:
+            # Join an image decode started while the map was being parsed
+            return self._image_future.result()
+
+        return self.load_image(
+            self.base_path,
+            self.image_name,
+            Size(self.tile_height, self.tile_width),
+            self.margin,
+            self.spacing,
+        )
 
-    def _load_image(self) -> None:
-        img_path = self.base_path.resolve().parent / self.image_name
+    @staticmethod
+    def load_image(
+        base_path: Path, image_name: str, tile_size: Size, margin: int, spacing: int
+    ) -> TilesetImage:
+        return Tileset.image_cache.get(
+            base_path.resolve().parent / image_name,
+            lambda path: TilesetImage(tile_size, path, margin, spacing),
+            key=(*tile_size, margin, spacing),
+        )
 
-        self._tileset_image = TilesetImage(
-            Size(self.tile_height, self.tile_width), img_path
+    @classmethod
+    def prefetch_image(
+        cls, executor: Executor, data: Dict[str, Any], base_path: Path
+    ) -> Future:
+        """Start decoding the image of a tileset in the background"""
+        return executor.submit(
+            cls.load_image,
+            base_path,
+            data.get("image", ""),
+            Size(data.get("tileheight", 0), data.get("tilewidth", 0)),
+            data.get("margin", 0),
+            data.get("spacing", 0),
         )
 
     def get_tile(self, gid: int, priority: TilesetImage.Priority) -> np.ndarray:
-        return self._tileset_image.get_tile(gid - self.first_gid, priority)
+        return self.image.get_tile(gid - self.first_gid, priority)
+
+    def get_tiles(
+        self, gids: np.ndarray, priority: TilesetImage.Priority
+    ) -> np.ndarray:
+        return self.image.get_tiles(gids - self.first_gid, priority)
 
     def get_palette(self) -> np.ndarray:
-        return self._tileset_image.get_pal()
+        return self.image.get_pal()
+
+    @property
+    def image(self) -> TilesetImage:
+        if self._tileset_image is None:
+            self._tileset_image = self._load_image()
+            self._image_future = None
+
+        return self._tileset_image
+
+    @property
+    def image_loaded(self) -> bool:
+        return self._tileset_image is not None
+
+    @property
+    def last_gid(self) -> int:
+        return self.first_gid + self.tile_count - 1
+
+    def remap_colors(self, lut: np.ndarray, palette: Palette) -> None:
+        """Remap the color indexes of the tileset image through a 256 entry LUT"""
+        self._tileset_image = self.image.remap(lut, palette)
+
+    def property_array(self, name: str, default: int = 0) -> np.ndarray:
+        """Value of a numeric tile property for every tile of the tileset.
+
+        Tiles that don't define the property take the default value. Booleans are
+        converted to 0 and 1.
+
+        Raises:
+            PropertyError: the property is defined with a non numeric type
+        """
+        values = np.full(self.tile_count, default, dtype=np.int64)
+        for tile_id, properties in self.tile_properties.items():
+            for prop in properties:
+                if prop.name != name:
+                    continue
+
+                if prop.value_type not in ("bool", "int", "object"):
+                    raise PropertyError(
+                        f"Tile property '{name}' of tile {tile_id} in tileset "
+                        f"'{self.name}' is a {prop.value_type}, not a number."
+                    )
+
+                if 0 <= tile_id < self.tile_count:
+                    values[tile_id] = int(prop.value)
+
+        return values
 
     def __contains__(self, gid: int) -> bool:
-        last_gid = self.first_gid + self.tile_count
-        return self.first_gid <= gid <= last_gid
+        return self.first_gid <= gid < self.first_gid + self.tile_count
+
+    def contains(self, gids: np.ndarray) -> np.ndarray:
+        """Vectorized membership test returning a boolean mask"""
+        return (gids >= self.first_gid) & (gids < self.first_gid + self.tile_count)
 
     def __repr__(self) -> str:
         return smart_repr(
@@ -64,7 +163,9 @@ class Tileset:
         )
 
     @classmethod
-    def from_dict(cls, data: Dict[str, Any], base_path: Path) -> "Tileset":
+    def from_dict(
+        cls, data: Dict[str, Any], base_path: Path, image: Optional[Future] = None
+    ) -> "Tileset":
         return cls(
             base_path=base_path,
             columns=data.get("columns", 0),
@@ -76,4 +177,20 @@ class Tileset:
             tile_count=data.get("tilecount", 0),
             tile_height=data.get("tileheight", 0),
             tile_width=data.get("tilewidth", 0),
+            image=image,
+            tile_properties={
+                tile["id"]: [
+                    CustomProperty.from_dict(prop)
+                    for prop in tile.get("properties", [])
+                ]
+                for tile in data.get("tiles", [])
+                if tile.get("properties")
+            },
+            tile_animations={
+                tile["id"]: [
+                    AnimationFrame.from_dict(frame) for frame in tile["animation"]
+                ]
+                for tile in data.get("tiles", [])
+                if tile.get("animation")
+            },
         )
@@ -1,7 +1,10 @@
 from .tmx_parser import JsonTmxParser, TmxParser, XmlTmxParser
+from .tsx_parser import JsonTsxParser, XmlTsxParser
 
 __all__ = [
     "JsonTmxParser",
+    "JsonTsxParser",
     "TmxParser",
     "XmlTmxParser",
+    "XmlTsxParser",
 ]
@@ -2,7 +2,7 @@ import json
 import xml.etree.ElementTree as ET
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import Any, Dict, Union
+from typing import Any, Dict, List, Union
 
 
 class TmxParser(ABC):
@@ -22,6 +22,40 @@ class XmlTmxParser(TmxParser):
         tree = ET.parse(file_path)
         return self._element_to_dict(tree.getroot())
 
+    def _tileset_to_dict(self, element: ET.Element) -> Dict[str, Any]:
+        tileset = self._element_to_dict(element)
+
+        # External tilesets only define firstgid and source
+        image = element.find("image")
+        if image is not None:
+            tileset["image"] = image.attrib["source"]
+            for attr in ("width", "height"):
+                if attr in image.attrib:
+                    tileset[f"image{attr}"] = int(image.attrib[attr])
+
+        return tileset
+
+    def _data_payload(self, element: ET.Element, layer: Dict[str, Any]) -> Any:
+        encoding = layer.get("encoding")
+        if encoding == "base64":
+            return element.text.strip()
+        elif encoding == "csv":
+            return element.text.strip().split(",")
+
+        # xml deprecated
+        return [dict(gid.items()).get("gid", 0) for gid in element.findall("tile")]
+
+    def _properties_to_list(self, element: ET.Element) -> List[Dict[str, Any]]:
+        properties = []
+        for attr in element.findall("property"):
+            prop = dict(attr.items())
+            if "type" not in prop:
+                prop["type"] = "string"
+
+            properties.append(prop)
+
+        return properties
+
     def _element_to_dict(self, element: ET.Element) -> Dict[str, Any]:
         result = dict(element.attrib)
 
@@ -37,36 +71,47 @@ class XmlTmxParser(TmxParser):
                 if "tilesets" not in result:
                     result["tilesets"] = []
 
-                tileset = self._element_to_dict(child)
-                tileset["image"] = child.find("image").attrib["source"]
-                result["tilesets"].append(tileset)
+                result["tilesets"].append(self._tileset_to_dict(child))
             elif child.tag == "data":
                 for attr, val in child.attrib.items():
                     result[attr] = val
-                if "encoding" in result.keys():
-                    if result["encoding"] == "base64":
-                        result["data"] = child.text.strip()
-                    elif result["encoding"] == "csv":
-                        result["data"] = child.text.strip().split(",")
-                else:  # xml deprecated
-                    result["data"] = [
-                        dict(gid.items()).get("gid", 0) for gid in child.findall("tile")
-                    ]
+
+                chunks = child.findall("chunk")
+                if chunks:  # infinite maps
+                    result["chunks"] = []
+                    for chunk in chunks:
+                        chunk_data = {
+                            attr: int(val) for attr, val in chunk.attrib.items()
+                        }
+                        chunk_data["data"] = self._data_payload(chunk, result)
+                        result["chunks"].append(chunk_data)
+                else:
+                    result["data"] = self._data_payload(child, result)
             elif child.tag == "object":
                 if "objects" not in result:
                     result["objects"] = []
                 result["objects"].append(self._element_to_dict(child))
+            elif child.tag == "tile":
+                if "tiles" not in result:
+                    result["tiles"] = []
+                result["tiles"].append(self._element_to_dict(child))
+            elif child.tag == "animation":
+                result["animation"] = [
+                    {attr: int(val) for attr, val in frame.attrib.items()}
+                    for frame in child.findall("frame")
+                ]
+            elif child.tag == "ellipse":
+                result["ellipse"] = True
+            elif child.tag == "polyline":
+                result["polyline"] = [
+                    dict(zip(("x", "y"), map(float, point.split(","))))
+                    for point in child.attrib.get("points", "").split()
+                ]
             elif child.tag == "properties":
                 if "properties" not in result:
                     result["properties"] = []
 
-                properties = child.findall("property")
-                for attr in properties:
-                    prop = dict(attr.items())
-                    if "type" not in prop:
-                        prop["type"] = "string"
-
-                    result["properties"].append(prop)
+                result["properties"].extend(self._properties_to_list(child))
 
         # Convert relevant string attributes to the expected type
         for attr in ["x", "y"]:
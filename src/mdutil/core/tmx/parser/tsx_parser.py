@@ -0,0 +1,15 @@
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Dict, Union
+
+from .tmx_parser import JsonTmxParser, XmlTmxParser
+
+
+class JsonTsxParser(JsonTmxParser):
+    pass
+
+
+class XmlTsxParser(XmlTmxParser):
+    def parse(self, file_path: Union[str, Path]) -> Dict[str, Any]:
+        tree = ET.parse(file_path)
+        return self._tileset_to_dict(tree.getroot())
@@ -0,0 +1,11 @@
+from .encoder import COMPRESSIONS, ENCODINGS, TileDataEncoder
+from .writer import JsonMapWriter, MapWriter, XmlMapWriter
+
+__all__ = [
+    "COMPRESSIONS",
+    "ENCODINGS",
+    "JsonMapWriter",
+    "MapWriter",
+    "TileDataEncoder",
+    "XmlMapWriter",
+]
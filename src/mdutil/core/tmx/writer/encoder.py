@@ -0,0 +1,96 @@
+import gzip
+import zlib
+from base64 import b64encode
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import zstandard as zstd
+
+from mdutil.core.exceptions import TileLayerError
+
+ENCODINGS = ("csv", "base64")
+COMPRESSIONS = ("zlib", "gzip", "zstd")
+
+# Codec defaults used when no compression level is given
+DEFAULT_LEVELS = {"zlib": zlib.Z_DEFAULT_COMPRESSION, "gzip": 9, "zstd": 3}
+
+
+class TileDataEncoder:
+    """Encode tile layer and chunk payloads, the inverse of TileData.
+
+    A single zstd compression context is created per encoder and reused for every
+    payload it encodes. With threads, zstd splits large payloads into jobs that are
+    compressed in parallel. Encoders are not thread safe.
+    """
+
+    def __init__(
+        self,
+        encoding: str = "base64",
+        compression: Optional[str] = "zstd",
+        level: Optional[int] = None,
+        threads: int = -1,
+    ) -> None:
+        if encoding not in ENCODINGS:
+            raise TileLayerError(f"Unsupported tile layer encoding: {encoding}")
+
+        compression = compression or None
+        if compression is not None:
+            if encoding == "csv":
+                raise TileLayerError("Csv tile layers can't be compressed.")
+            if compression not in COMPRESSIONS:
+                raise TileLayerError(
+                    f"Unsupported tile layer compression: {compression}"
+                )
+
+        self.encoding = encoding
+        self.compression = compression
+        self.level = (
+            DEFAULT_LEVELS[compression] if level is None and compression else level
+        )
+
+        self._zstd = None
+        if compression == "zstd":
+            self._zstd = zstd.ZstdCompressor(level=self.level, threads=threads)
+
+    @property
+    def attributes(self) -> Dict[str, str]:
+        """Encoding attributes of the tile layers written with this encoder"""
+        attributes = {"encoding": self.encoding}
+        if self.compression:
+            attributes["compression"] = self.compression
+
+        return attributes
+
+    def compress(self, raw: bytes) -> bytes:
+        match self.compression:
+            case None:
+                return raw
+            case "zlib":
+                return zlib.compress(raw, self.level)
+            case "gzip":
+                # A fixed mtime keeps the output reproducible
+                return gzip.compress(raw, compresslevel=self.level, mtime=0)
+            case "zstd":
+                return self._zstd.compress(raw)
+
+    def encode(self, gids: np.ndarray) -> str:
+        """Encode gids as a base64 payload"""
+        raw = np.ascontiguousarray(gids, dtype="<u4").tobytes()
+        return b64encode(self.compress(raw)).decode("ascii")
+
+    def to_json(self, gids: np.ndarray) -> Union[str, List[int]]:
+        """Payload of a tile layer or chunk in a tmj file"""
+        if self.encoding == "csv":
+            return np.asarray(gids, dtype=np.uint32).tolist()
+
+        return self.encode(gids)
+
+    def to_xml(self, gids: np.ndarray, width: int) -> str:
+        """Text of a data or chunk element in a tmx file"""
+        if self.encoding != "csv":
+            return self.encode(gids)
+
+        rows = np.asarray(gids, dtype=np.uint32).reshape(-1, max(width, 1))
+        return (
+            "\n" + ",\n".join(",".join(map(str, row)) for row in rows.tolist()) + "\n"
+        )
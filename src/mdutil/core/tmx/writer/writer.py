@@ -0,0 +1,259 @@
+import json
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, TextIO
+
+from .encoder import TileDataEncoder
+
+# Keys of the tiled json layout written as child elements in tmx files
+_XML_CHILDREN = (
+    "layers",
+    "tilesets",
+    "properties",
+    "objects",
+    "chunks",
+    "data",
+    "tiles",
+    "animation",
+    "polyline",
+    "ellipse",
+    "point",
+    "image",
+    "imagewidth",
+    "imageheight",
+    "encoding",
+    "compression",
+    "type",
+)
+
+_XML_TAGS = {
+    "tilelayer": "layer",
+    "objectgroup": "objectgroup",
+    "group": "group",
+    "imagelayer": "imagelayer",
+}
+
+
+def _xml_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+
+    return str(value)
+
+
+def _xml_attributes(data: Dict[str, Any], exclude=_XML_CHILDREN) -> Dict[str, str]:
+    return {
+        attr: _xml_value(val)
+        for attr, val in data.items()
+        if attr not in exclude and not isinstance(val, (list, dict))
+    }
+
+
+class MapWriter(ABC):
+    """Streaming writer of tiled maps.
+
+    The map attributes, properties and tilesets are written by begin() and every layer
+    as soon as it's given, so a document is never held in memory. Everything follows
+    the tiled json layout, with the gids of tile layers and chunks given as arrays in
+    their "data" key and encoded with the writer encoder.
+    """
+
+    def __init__(self, file: TextIO, encoder: Optional[TileDataEncoder] = None) -> None:
+        self.file = file
+        self.encoder = encoder or TileDataEncoder()
+
+    @abstractmethod
+    def begin(
+        self,
+        attributes: Dict[str, Any],
+        properties: List[Dict[str, Any]],
+        tilesets: List[Dict[str, Any]],
+    ) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_layer(self, layer: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def end(self) -> None:
+        raise NotImplementedError
+
+
+class JsonMapWriter(MapWriter):
+    def __init__(self, file: TextIO, encoder: Optional[TileDataEncoder] = None) -> None:
+        super().__init__(file, encoder)
+        self._layers = 0
+
+    def begin(
+        self,
+        attributes: Dict[str, Any],
+        properties: List[Dict[str, Any]],
+        tilesets: List[Dict[str, Any]],
+    ) -> None:
+        header = {
+            attr: val
+            for attr, val in attributes.items()
+            if attr not in ("layers", "properties", "tilesets")
+        }
+        if properties:
+            header["properties"] = properties
+        header["tilesets"] = tilesets
+
+        # The layers array is left open and filled by write_layer
+        self.file.write(json.dumps(header, indent=1)[:-2])
+        self.file.write(',\n "layers":[')
+
+    def _encode(self, layer: Dict[str, Any]) -> Dict[str, Any]:
+        layer = dict(layer)
+        if layer.get("type") == "tilelayer":
+            layer.pop("encoding", None)
+            layer.pop("compression", None)
+            layer.update(self.encoder.attributes)
+
+            if "chunks" in layer:
+                layer["chunks"] = [
+                    {**chunk, "data": self.encoder.to_json(chunk["data"])}
+                    for chunk in layer["chunks"]
+                ]
+            else:
+                layer["data"] = self.encoder.to_json(layer["data"])
+        elif layer.get("type") == "group":
+            layer["layers"] = [self._encode(child) for child in layer["layers"]]
+
+        return layer
+
+    def write_layer(self, layer: Dict[str, Any]) -> None:
+        self.file.write("," if self._layers else "")
+        self.file.write("\n  " + json.dumps(self._encode(layer)))
+        self._layers += 1
+
+    def end(self) -> None:
+        self.file.write("\n ]\n}\n")
+
+
+class XmlMapWriter(MapWriter):
+    def begin(
+        self,
+        attributes: Dict[str, Any],
+        properties: List[Dict[str, Any]],
+        tilesets: List[Dict[str, Any]],
+    ) -> None:
+        root = ET.Element("map", _xml_attributes(attributes))
+        start_tag = ET.tostring(root, encoding="unicode")[: -len(" />")] + ">"
+
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.file.write(start_tag + "\n")
+
+        if properties:
+            self.write_element(self._properties(properties))
+        for tileset in tilesets:
+            self.write_element(self._tileset(tileset))
+
+    def write_element(self, element: ET.Element) -> None:
+        """Write an element that is already in the tmx layout as a child of the map"""
+        element.tail = None
+        ET.indent(element, space=" ", level=1)
+        self.file.write(" " + ET.tostring(element, encoding="unicode") + "\n")
+
+    def write_layer(self, layer: Dict[str, Any]) -> None:
+        self.write_element(self._layer(layer))
+
+    def end(self) -> None:
+        self.file.write("</map>\n")
+
+    @staticmethod
+    def _properties(properties: List[Dict[str, Any]]) -> ET.Element:
+        element = ET.Element("properties")
+        for prop in properties:
+            value = prop.get("value", "")
+            if isinstance(value, bool):
+                value = "true" if value else "false"
+
+            attrib = {"name": prop["name"]}
+            if prop.get("type", "string") != "string":
+                attrib["type"] = prop["type"]
+            attrib["value"] = _xml_value(value)
+            ET.SubElement(element, "property", attrib)
+
+        return element
+
+    def _with_properties(
+        self, tag: str, data: Dict[str, Any], exclude=_XML_CHILDREN
+    ) -> ET.Element:
+        element = ET.Element(tag, _xml_attributes(data, exclude))
+        if data.get("properties"):
+            element.append(self._properties(data["properties"]))
+
+        return element
+
+    def _tileset(self, tileset: Dict[str, Any]) -> ET.Element:
+        element = self._with_properties("tileset", tileset)
+        if "image" in tileset:
+            image = ET.SubElement(element, "image", {"source": tileset["image"]})
+            for attr in ("width", "height"):
+                if f"image{attr}" in tileset:
+                    image.set(attr, _xml_value(tileset[f"image{attr}"]))
+
+        for tile in tileset.get("tiles", []):
+            tile_element = self._with_properties("tile", tile)
+            if "animation" in tile:
+                animation = ET.SubElement(tile_element, "animation")
+                for frame in tile["animation"]:
+                    ET.SubElement(animation, "frame", _xml_attributes(frame))
+            element.append(tile_element)
+
+        return element
+
+    def _object(self, obj: Dict[str, Any]) -> ET.Element:
+        element = self._with_properties("object", obj, exclude=_XML_CHILDREN[:-1])
+        if obj.get("ellipse"):
+            ET.SubElement(element, "ellipse")
+        if obj.get("point"):
+            ET.SubElement(element, "point")
+        if "polyline" in obj:
+            points = " ".join(
+                f"{_xml_value(point['x'])},{_xml_value(point['y'])}"
+                for point in obj["polyline"]
+            )
+            ET.SubElement(element, "polyline", {"points": points})
+
+        return element
+
+    def _layer(self, layer: Dict[str, Any]) -> ET.Element:
+        layer_type = layer.get("type", "tilelayer")
+        element = self._with_properties(
+            _XML_TAGS.get(layer_type, layer_type),
+            layer,
+            exclude=_XML_CHILDREN + ("startx", "starty", "transparentcolor"),
+        )
+
+        if layer_type == "tilelayer":
+            data = ET.SubElement(element, "data", self.encoder.attributes)
+            if "chunks" in layer:
+                for chunk in layer["chunks"]:
+                    chunk_element = ET.SubElement(
+                        data, "chunk", _xml_attributes(chunk, exclude=("data",))
+                    )
+                    chunk_element.text = self.encoder.to_xml(
+                        chunk["data"], chunk["width"]
+                    )
+            else:
+                data.text = self.encoder.to_xml(layer["data"], layer.get("width", 0))
+        elif layer_type == "objectgroup":
+            for obj in layer.get("objects", []):
+                element.append(self._object(obj))
+        elif layer_type == "group":
+            for child in layer.get("layers", []):
+                element.append(self._layer(child))
+        elif layer_type == "imagelayer" and layer.get("image"):
+            image = ET.SubElement(element, "image", {"source": layer["image"]})
+            if "transparentcolor" in layer:
+                image.set("trans", layer["transparentcolor"].lstrip("#"))
+            for attr in ("width", "height"):
+                if f"image{attr}" in layer:
+                    image.set(attr, _xml_value(layer[f"image{attr}"]))
+
+        return element
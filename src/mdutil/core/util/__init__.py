@@ -1,2 +1,4 @@
-from .data_type import Point, Size
+from .cache import FileCache
+from .data_type import Point, Rect, Size
 from .helper import smart_repr
+from .output import atomic_write, content_digest, write_if_changed
@@ -0,0 +1,70 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional, Tuple, Union
+
+
+class FileCache:
+    """Per process cache of values derived from files.
+
+    Entries are keyed by the resolved file path and an optional extra key, and are
+    reloaded when the modification time of the file changes. When max_entries is set
+    the least recently used entries are evicted.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None) -> None:
+        self._entries: OrderedDict[Tuple[Path, Hashable], Tuple[int, Any]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+
+    def get(
+        self,
+        path: Union[str, Path],
+        loader: Callable[[Path], Any],
+        key: Hashable = None,
+    ) -> Any:
+        path = Path(path).resolve()
+        mtime = os.stat(path).st_mtime_ns
+
+        with self._lock:
+            entry = self._entries.get((path, key))
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end((path, key))
+                return entry[1]
+
+        value = loader(path)
+        with self._lock:
+            self._entries[(path, key)] = (mtime, value)
+            self._entries.move_to_end((path, key))
+            self._evict()
+
+        return value
+
+    def _evict(self) -> None:
+        if self.max_entries is None:
+            return
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def resize(self, max_entries: Optional[int]) -> None:
+        with self._lock:
+            self.max_entries = max_entries
+            self._evict()
+
+    def discard(self, path: Union[str, Path]) -> None:
+        """Drop all the entries of a file"""
+        path = Path(path).resolve()
+        with self._lock:
+            for entry in [entry for entry in self._entries if entry[0] == path]:
+                del self._entries[entry]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -13,21 +13,23 @@ def smart_repr(obj: Any, exclude: Tuple[str] = ()) -> str:
         str: A string representation of the object
     """
 
-    # Get all public attributes
+    # Get all public attributes. Properties are never evaluated, they may be costly
     attributes = {
-        name: getattr(obj, name) for name in dir(obj) if not name.startswith("_")
+        name: getattr(obj, name)
+        for name in dir(obj)
+        if not name.startswith("_")
+        and name not in exclude
+        and not isinstance(getattr(type(obj), name, None), property)
     }
 
     # Perform filtering
     valid_attrs = []
     for name, val in attributes.items():
-        # Skip methods and properties
-        if callable(val) or isinstance(val, property):
+        # Skip methods
+        if callable(val):
             continue
 
         # Skip empty values
-        if name in exclude:
-            continue
         if val is None:
             continue
         if isinstance(val, (list, dict, set, tuple, str, int, float, bool)) and not val:
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import BinaryIO, Callable, Sequence, Union
+
+import numpy as np
+
+HASH_SUFFIX = ".hash"
+
+
+def content_digest(*parts: Union[bytes, str, np.ndarray]) -> str:
+    """Hash of the content an output file is generated from"""
+    digest = hashlib.blake2b(digest_size=20)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            digest.update(f"{part.dtype.str}{part.shape}".encode())
+            part = np.ascontiguousarray(part).tobytes()
+        elif isinstance(part, str):
+            part = part.encode()
+        digest.update(part)
+
+    return digest.hexdigest()
+
+
+def _sidecar(path: Path) -> Path:
+    return path.with_name(path.name + HASH_SUFFIX)
+
+
+def _stamp(digest: str, path: Path) -> str:
+    stat = os.stat(path)
+    return f"{digest} {stat.st_size} {stat.st_mtime_ns}\n"
+
+
+def atomic_write(path: Union[str, Path], write: Callable[[BinaryIO], None]) -> None:
+    """Write a file through a temporary file renamed over it, so readers never see a
+    partial file. The file is created with the permissions given by the umask."""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "xb") as file:
+            write(file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def write_if_changed(
+    path: Union[str, Path],
+    content: Sequence[Union[bytes, str, np.ndarray]],
+    write: Callable[[BinaryIO], None],
+) -> bool:
+    """Write an output file only when the content it's generated from changed.
+
+    The hash of the content is kept in a sidecar file along with the size and
+    modification time of the output, so outputs that are deleted or edited by hand
+    are written again. Unchanged outputs keep their modification time, which avoids
+    rebuilding everything that depends on them.
+
+    Args:
+        path (Union[str, Path]): output file
+        content (Sequence[Union[bytes, str, np.ndarray]]): everything the output is
+        generated from, including any format options
+        write (Callable[[BinaryIO], None]): writes the output to a binary file
+
+    Returns:
+        bool: whether the output was written
+    """
+    path = Path(path)
+    sidecar = _sidecar(path)
+    digest = content_digest(*content)
+
+    try:
+        if sidecar.read_text() == _stamp(digest, path):
+            return False
+    except OSError:
+        pass
+
+    atomic_write(path, write)
+    atomic_write(sidecar, lambda file: file.write(_stamp(digest, path).encode()))
+
+    return True
@@ -0,0 +1,248 @@
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from mdutil.core.exceptions import TiledMapError
+from mdutil.core.image_writer import ImageWriter, save_image
+from mdutil.core.img.palette import LINE_COLORS, Palette, PaletteAllocator
+from mdutil.core.img.tileset import TilesetImage
+from mdutil.core.map_builder import MapImageBuilder
+from mdutil.core.tmx.model import LayerType, TmxMapFactory
+from mdutil.core.util import Rect, Size
+
+
+@dataclass
+class WorldMap:
+    path: Path
+    x: int
+    y: int
+
+
+@dataclass
+class _MapRender:
+    tilemap_array: np.ndarray
+    x: int
+    y: int
+    palette: Optional[Palette]
+    used_lines: List[int]
+
+
+def load_world(world_path: Union[str, Path]) -> List[WorldMap]:
+    """Read the maps of a tiled world file and their offsets in pixels.
+
+    Maps listed explicitly come first, followed by the files next to the world that
+    match its patterns, in name order.
+    """
+    world_path = Path(world_path)
+    try:
+        with open(world_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+    except (OSError, json.JSONDecodeError) as e:
+        raise TiledMapError(f"Can't read world file {world_path}: {e}") from e
+
+    base = world_path.resolve().parent
+    maps = {}
+    for entry in data.get("maps", []):
+        path = base / entry["fileName"]
+        maps.setdefault(path, WorldMap(path, entry.get("x", 0), entry.get("y", 0)))
+
+    for pattern in data.get("patterns", []):
+        regexp = re.compile(pattern["regexp"])
+        for path in sorted(base.iterdir()):
+            match = regexp.fullmatch(path.name)
+            if match is None or path in maps:
+                continue
+
+            x = int(match.group(1)) * pattern.get("multiplierX", 1)
+            y = int(match.group(2)) * pattern.get("multiplierY", 1)
+            maps[path] = WorldMap(
+                path, x + pattern.get("offsetX", 0), y + pattern.get("offsetY", 0)
+            )
+
+    for world_map in maps.values():
+        if not world_map.path.exists():
+            raise TiledMapError(f"World map not found: {world_map.path}")
+
+    return list(maps.values())
+
+
+def _map_bounds(path: Path) -> Rect:
+    """Area covered by a map in pixels, from its parsed content without decoding it"""
+    content = TmxMapFactory().parse(path)
+    tile_width, tile_height = content.get("tilewidth", 0), content.get("tileheight", 0)
+
+    if str(content.get("infinite", 0)).lower() not in ("1", "true"):
+        return Rect(
+            0,
+            0,
+            content.get("width", 0) * tile_width,
+            content.get("height", 0) * tile_height,
+        )
+
+    chunks = [
+        chunk
+        for layer in content.get("layers", [])
+        if layer.get("type") == "tilelayer"
+        for chunk in layer.get("chunks", [])
+    ]
+    if not chunks:
+        return Rect(0, 0, 0, 0)
+
+    x = min(chunk["x"] for chunk in chunks)
+    y = min(chunk["y"] for chunk in chunks)
+    right = max(chunk["x"] + chunk["width"] for chunk in chunks)
+    bottom = max(chunk["y"] + chunk["height"] for chunk in chunks)
+
+    return Rect(
+        x * tile_width,
+        y * tile_height,
+        (right - x) * tile_width,
+        (bottom - y) * tile_height,
+    )
+
+
+def _render_map(
+    path: Path, layers: Sequence[Tuple[str, TilesetImage.Priority]]
+) -> _MapRender:
+    builder = MapImageBuilder(path)
+    api = builder.map_api
+
+    # Maps of a world don't need to define every layer
+    names = {layer.name for layer in api.get_layers(LayerType.TILE)}
+    tilemap_array = builder.render([layer for layer in layers if layer[0] in names])
+
+    origin = api.get_origin()
+    tile_size = api.get_tile_size()
+    used_lines = np.unique((tilemap_array & 0x7F) // LINE_COLORS).tolist()
+
+    return _MapRender(
+        tilemap_array,
+        origin.x * tile_size.width,
+        origin.y * tile_size.height,
+        builder.palette,
+        used_lines,
+    )
+
+
+class WorldImageBuilder:
+    """Render the maps of a tiled world and stitch them into a single image.
+
+    Maps are rendered in parallel worker processes and copied into a buffer allocated
+    once for the whole world, optionally a memory mapped npy file. The palettes of all
+    maps are merged into the four palette lines. Where maps overlap, the last map in
+    the world file wins.
+    """
+
+    def __init__(
+        self, world_path: Union[str, Path], jobs: Optional[int] = None
+    ) -> None:
+        self.world_path = Path(world_path)
+        self.maps = load_world(world_path)
+        self.jobs = jobs or os.cpu_count() or 1
+
+        self.palette: Optional[Palette] = None
+
+    def render(
+        self,
+        layers: Sequence[Tuple[str, TilesetImage.Priority]],
+        buffer_path: Optional[Path] = None,
+    ) -> np.ndarray:
+        """Render a combination of tile layers over the whole world.
+
+        Args:
+            layers (Sequence[Tuple[str, TilesetImage.Priority]]): layer names and their
+            priority, stacked in order
+            buffer_path (Optional[Path]): npy file used as a memory mapped buffer
+
+        Returns:
+            np.ndarray: the world color indexes, from its top left map corner
+        """
+        with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+            paths = [world_map.path for world_map in self.maps]
+            bounds = [
+                Rect(
+                    world_map.x + rect.x, world_map.y + rect.y, rect.width, rect.height
+                )
+                for world_map, rect in zip(self.maps, pool.map(_map_bounds, paths))
+            ]
+
+            left = min((rect.x for rect in bounds), default=0)
+            top = min((rect.y for rect in bounds), default=0)
+            width = max((rect.x + rect.width for rect in bounds), default=0) - left
+            height = max((rect.y + rect.height for rect in bounds), default=0) - top
+
+            if buffer_path is not None:
+                world = np.lib.format.open_memmap(
+                    buffer_path, mode="w+", dtype=np.uint8, shape=(height, width)
+                )
+            else:
+                world = np.zeros((height, width), dtype=np.uint8)
+
+            allocator = PaletteAllocator()
+            fallback = None
+            renders = pool.map(_render_map, paths, [layers] * len(paths))
+            for world_map, result in zip(self.maps, renders):
+                if result.palette is None:
+                    continue
+                fallback = fallback or result.palette
+                lut = allocator.add(result.palette, result.used_lines)
+
+                x, y = world_map.x + result.x - left, world_map.y + result.y - top
+                rows, columns = result.tilemap_array.shape
+                area = world[y : y + rows, x : x + columns]
+                if PaletteAllocator.is_identity(lut):
+                    area[...] = result.tilemap_array
+                else:
+                    area[...] = lut[result.tilemap_array]
+
+        if buffer_path is not None:
+            world.flush()
+
+        self.palette = allocator.merged_palette(fallback)
+        return world
+
+    def save(
+        self,
+        output_path: Union[str, Path],
+        lo_layer: Optional[str] = None,
+        hi_layer: Optional[str] = None,
+        split: Optional[Size] = None,
+        buffer_path: Optional[Path] = None,
+        writer: Optional[ImageWriter] = None,
+    ) -> List[Tuple[Path, bool]]:
+        """Save a world plane with an image writer, png by default, as a single image
+        or as a grid of images of a given size. Images that are up to date are left
+        untouched.
+
+        Returns:
+            List[Tuple[Path, bool]]: every image and whether it was written
+        """
+        world = self.render(
+            MapImageBuilder._plane_layers(lo_layer, hi_layer), buffer_path
+        )
+        output_path = Path(output_path)
+
+        if split is None:
+            parts = [(output_path, world)]
+        else:
+            parts = [
+                (
+                    output_path.with_name(
+                        f"{output_path.stem}_{row}_{column}{output_path.suffix}"
+                    ),
+                    world[y : y + split.height, x : x + split.width],
+                )
+                for row, y in enumerate(range(0, world.shape[0], split.height))
+                for column, x in enumerate(range(0, world.shape[1], split.width))
+            ]
+
+        return [
+            (path, save_image(path, tilemap_array, self.palette, writer))
+            for path, tilemap_array in parts
+        ]
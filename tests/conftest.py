@@ -3,6 +3,11 @@ import os
 from click.testing import CliRunner
 from mdutil.cli import cli
 
+@pytest.fixture
+def runner():
+    """Creates a click test runner."""
+    return CliRunner()
+
 @pytest.fixture
 def cli_runner(runner):
     """Creates an isolated file system for testing."""
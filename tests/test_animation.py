@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from mdutil.core import MapBuilderError
+from mdutil.core.animation import TileAnimation, TileAnimationBuilder
+
+
+def builder(dma_budget=4096, max_period=3600):
+    # The schedule only depends on the animations given to it, not on the map
+    animation_builder = TileAnimationBuilder.__new__(TileAnimationBuilder)
+    animation_builder.budget_tiles = dma_budget // 32
+    animation_builder.max_period = max_period
+    return animation_builder
+
+
+def animation(slot, sources, durations):
+    return TileAnimation(slot, np.array(sources), np.array(durations))
+
+
+ANIMATIONS = [
+    # Slots and sources contiguous with the next one, changing at the same time
+    animation(100, [0, 4, 8], [8, 8, 8]),
+    animation(101, [1, 5, 9], [8, 8, 8]),
+    animation(102, [2, 6, 10], [8, 8, 8]),
+    animation(110, [20, 21], [3, 5]),
+    # Frames showing the same tile twice in a row upload nothing the second time
+    animation(120, [30, 30, 31], [4, 4, 4]),
+    animation(130, [40], [24]),
+]
+
+
+def frame_at(animation, time):
+    """Source tile an animation shows at a vblank"""
+    ends = np.cumsum(animation.durations)
+    return int(animation.sources[np.searchsorted(ends, time % ends[-1], "right")])
+
+
+def replay(animations, schedule, cycles):
+    """VRAM contents after every vblank, playing the transfers of the schedule"""
+    vram = {}
+    states = []
+    for time in range(cycles * schedule.period):
+        first, count = schedule.index[time % schedule.period].tolist()
+        for source, slot, tiles in schedule.transfers[first : first + count].tolist():
+            for offset in range(tiles):
+                vram[slot + offset] = source + offset
+        states.append({a.slot: vram.get(a.slot) for a in animations})
+
+    return states
+
+
+def assert_follows(animations, schedule, cycles=4):
+    """Check every animated slot shows the current frame of its animation, or one
+    shown at most max_delay vblanks ago"""
+    states = replay(animations, schedule, cycles)
+
+    # Uploads spilled from the end of a cycle land in the next one, so the first
+    # cycle only warms up
+    for time in range(schedule.period, cycles * schedule.period):
+        for a in animations:
+            expected = {
+                frame_at(a, time - delay) for delay in range(schedule.max_delay + 1)
+            }
+            assert states[time][a.slot] in expected, (time, a.slot)
+
+
+@pytest.mark.parametrize("dma_budget", [4096, 32])
+def test_vram_follows_the_animations(dma_budget):
+    schedule = builder(dma_budget).schedule(ANIMATIONS)
+    assert schedule.period == 24
+    assert_follows(ANIMATIONS, schedule)
+
+    # Every vblank stays within the budget
+    tiles = [
+        int(schedule.transfers[first : first + count, 2].astype(int).sum())
+        for first, count in schedule.index.astype(int).tolist()
+    ]
+    assert max(tiles) == schedule.peak_tiles <= dma_budget // 32
+
+
+def test_default_budget_has_no_delay():
+    schedule = builder().schedule(ANIMATIONS)
+    assert schedule.max_delay == 0
+    # The three contiguous animations are coalesced into single transfers
+    assert [0, 100, 3] in schedule.transfers.tolist()
+
+
+def test_single_tile_budget_delays_uploads():
+    schedule = builder(32).schedule(ANIMATIONS)
+    assert schedule.peak_tiles == 1
+    assert schedule.max_delay > 0
+
+
+def test_spill_wraps_around_the_cycle():
+    # Both tiles change on the first and last vblanks of the cycle, so the second
+    # upload of the last vblank goes first on the next cycle
+    animations = [
+        animation(0, [0, 1], [5, 1]),
+        animation(5, [10, 11], [5, 1]),
+    ]
+    schedule = builder(32).schedule(animations)
+    assert schedule.period == 6
+    assert schedule.max_delay == 2
+
+    first, count = schedule.index[0].tolist()
+    assert schedule.transfers[first : first + count].tolist() == [[11, 5, 1]]
+    assert_follows(animations, schedule)
+
+
+def test_over_budget_animations_are_rejected():
+    animations = [animation(slot, [0, 1], [1, 1]) for slot in range(0, 10, 2)]
+    with pytest.raises(MapBuilderError):
+        builder(64).schedule(animations)
+
+
+def test_long_periods_are_rejected():
+    animations = [animation(0, [0, 1], [7, 6]), animation(1, [0, 1], [11, 6])]
+    with pytest.raises(MapBuilderError):
+        builder(max_period=200).schedule(animations)
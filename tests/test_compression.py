@@ -0,0 +1,199 @@
+import random
+
+import pytest
+
+from mdutil.cli import cli
+from mdutil.core import CompressionError
+from mdutil.core.compression import (
+    CODECS,
+    AplibCodec,
+    Lz4wCodec,
+    compress,
+    save_compressed,
+)
+
+# Streams of the aPLib encoder checked with the reference depacker, a port of the
+# aPLib 1.1.1 C sources
+APLIB_VECTORS = [
+    (b"a", "61c000"),
+    (b"Hello", "4838656cb06f00"),
+    (b"aaaaaaaaaaaaaaaa", "61ad01b000"),
+    (b"abcabcabcabcabcabc", "612b6263036c00"),
+    (b"\x00\x01\x00\x01\x00\x00\x00\x00\x02\x00", "006c01050302e18000"),
+    (
+        bytes(range(32)) * 2,
+        "0000010203040506070800090a0b0c0d0e0f1000111213141516171801191a1b1c1d1e1f5f"
+        "209800",
+    ),
+    (
+        b"The quick brown fox jumps over the lazy dog. "
+        b"The quick brown fox jumps over the lazy cat.",
+        "5400686520717569636bec620e726f776ece66ae78806a756d7073ede47665757260743f6c"
+        "617a79ea64fe67752ea52df163d7db2e0000",
+    ),
+]
+
+
+def random_bytes(size: int, seed: int = 0) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+def repetitive_bytes(size: int, seed: int = 0) -> bytes:
+    """Bytes with the runs and repeats of tilemaps and tiles"""
+    rng = random.Random(seed)
+    data = bytearray()
+    while len(data) < size:
+        if data and rng.random() < 0.5:
+            start = rng.randrange(len(data))
+            data += data[start : start + rng.randrange(2, 300)]
+        else:
+            data += bytes([rng.randrange(8)]) * rng.randrange(1, 40)
+
+    return bytes(data[:size])
+
+
+SAMPLES = [
+    b"\x00",
+    b"\x00\x00",
+    b"ab",
+    b"\xff" * 1000,
+    bytes(range(256)) * 4,
+    random_bytes(1000),
+    repetitive_bytes(5000, seed=1),
+    repetitive_bytes(70000, seed=2),
+]
+
+
+@pytest.mark.parametrize("raw, packed", APLIB_VECTORS)
+def test_aplib_vectors(raw, packed):
+    codec = AplibCodec()
+    assert codec.compress(raw) == bytes.fromhex(packed)
+    assert codec.decompress(bytes.fromhex(packed)) == raw
+
+
+@pytest.mark.parametrize("data", SAMPLES)
+def test_aplib_round_trip(data):
+    codec = AplibCodec()
+    assert codec.decompress(codec.compress(data)) == data
+
+
+def test_aplib_round_trip_far_offsets():
+    # Matches past the 1280 and 32000 byte offsets get longer length bonuses
+    block = random_bytes(200, seed=3)
+    data = block + random_bytes(2000, seed=4) + block + random_bytes(40000) + block
+
+    codec = AplibCodec()
+    assert codec.decompress(codec.compress(data)) == data
+
+
+@pytest.mark.parametrize("data", SAMPLES)
+def test_aplib_reference_depacker(data):
+    aplib = pytest.importorskip("aplib")
+    assert aplib.decompress(AplibCodec().compress(data)) == data
+
+
+def test_aplib_rejects_empty_data():
+    with pytest.raises(CompressionError):
+        AplibCodec().compress(b"")
+
+
+def test_aplib_rejects_truncated_stream():
+    with pytest.raises(CompressionError):
+        AplibCodec().decompress(AplibCodec().compress(random_bytes(100))[:-3])
+
+
+@pytest.mark.parametrize("data", [b""] + [s for s in SAMPLES if len(s) % 2 == 0])
+def test_lz4w_round_trip(data):
+    codec = Lz4wCodec()
+    assert codec.decompress(codec.compress(data)) == data
+
+
+def test_lz4w_rejects_odd_sizes():
+    with pytest.raises(CompressionError):
+        Lz4wCodec().compress(b"abc")
+
+
+def test_lz4w_runs_longer_than_a_match():
+    data = b"\x12\x34" * (Lz4wCodec.MAX_MATCH * 5 + 3)
+
+    codec = Lz4wCodec()
+    packed = codec.compress(data)
+    assert codec.decompress(packed) == data
+    assert len(packed) < len(data) // 4
+
+
+def test_lz4w_longest_offset():
+    words = Lz4wCodec.MAX_OFFSET
+    block = random_bytes(words * 2, seed=5)
+
+    codec = Lz4wCodec()
+    packed = codec.compress(block + block)
+    assert codec.decompress(packed) == block + block
+    assert len(packed) < len(block) + 100
+
+    # One word further away the repeat is out of reach
+    block = random_bytes((words + 1) * 2, seed=5)
+    packed = codec.compress(block + block[: Lz4wCodec.MAX_MATCH * 2])
+    assert len(packed) > len(block)
+
+
+def test_lz4w_rejects_invalid_offset():
+    # A match of 2 words from 1 word back with nothing written yet
+    with pytest.raises(CompressionError):
+        Lz4wCodec().decompress(b"\x01\x00\x00\x00")
+
+
+def test_lz4w_is_not_registered():
+    assert "lz4w" not in CODECS
+
+
+def test_best_keeps_incompressible_data():
+    data = random_bytes(4096)
+    codec, packed = compress(data)
+    assert codec.name == "none"
+    assert packed == data
+
+
+def test_best_picks_smallest_output():
+    data = repetitive_bytes(4096)
+    codec, packed = compress(data)
+    assert codec.name == "aplib"
+    assert codec.decompress(packed) == data
+
+
+def test_save_compressed_appends_suffix(tmp_path):
+    path, codec, written = save_compressed(
+        tmp_path / "level.1_attr", b"\x00" * 64, "aplib"
+    )
+    assert path == tmp_path / "level.1_attr.apl"
+    assert written
+    assert codec.decompress(path.read_bytes()) == b"\x00" * 64
+
+    assert not save_compressed(tmp_path / "level.1_attr", b"\x00" * 64, "aplib")[2]
+
+
+def test_compress_command(cli_runner):
+    data = repetitive_bytes(2000)
+    with open("data.bin", "wb") as file:
+        file.write(data)
+
+    result = cli_runner.invoke(cli, ["compress", "-c", "aplib", "data.bin"])
+    assert result.exit_code == 0, result.output
+    with open("data.apl", "rb") as file:
+        assert AplibCodec().decompress(file.read()) == data
+
+    result = cli_runner.invoke(cli, ["compress", "-c", "best", "-o", "out", "data.bin"])
+    assert result.exit_code == 0, result.output
+    assert "aplib" in result.output
+
+
+def test_compress_command_keeps_source(cli_runner):
+    data = random_bytes(100)
+    with open("data.bin", "wb") as file:
+        file.write(data)
+
+    result = cli_runner.invoke(cli, ["compress", "-c", "none", "data.bin"])
+    assert result.exit_code != 0
+    assert "would replace it" in result.output
+    with open("data.bin", "rb") as file:
+        assert file.read() == data
@@ -0,0 +1,29 @@
+import pytest
+
+from mdutil.core import MapBuilderError
+from mdutil.core.contact_sheet import _thumbnail_names
+
+
+def test_thumbnails_are_named_after_maps(tmp_path):
+    paths = [tmp_path / "a.tmx", tmp_path / "levels" / "b.tmj"]
+    assert _thumbnail_names(paths) == ["a", "b"]
+
+
+def test_maps_sharing_a_name_in_different_folders(tmp_path):
+    paths = [
+        tmp_path / "area1" / "map.tmx",
+        tmp_path / "area2" / "map.tmx",
+        tmp_path / "area2" / "other.tmx",
+    ]
+    assert _thumbnail_names(paths) == ["area1_map", "area2_map", "other"]
+
+
+def test_maps_sharing_a_name_in_the_same_folder(tmp_path):
+    paths = [tmp_path / "out.tmx", tmp_path / "out.tmj"]
+    assert _thumbnail_names(paths) == ["out_tmx", "out_tmj"]
+
+
+def test_clashing_thumbnail_names_are_rejected(tmp_path):
+    paths = [tmp_path / "a_b" / "map.tmx", tmp_path / "a" / "b" / "map.tmx"]
+    with pytest.raises(MapBuilderError):
+        _thumbnail_names(paths)
@@ -0,0 +1,182 @@
+import io
+import struct
+import zlib
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from mdutil.core import MapBuilderError
+from mdutil.core.image_writer import (
+    ADAPTIVE,
+    PNG_FILTERS,
+    PNG_SIGNATURE,
+    NpyWriter,
+    PngWriter,
+    RawWriter,
+    _adler32_combine,
+    save_image,
+)
+from mdutil.core.img.palette import Palette
+
+
+def indexed_image(height=45, width=37, seed=0):
+    rng = np.random.default_rng(seed)
+    # Runs of colors and noise, so every filter has something to work with
+    image = np.repeat(rng.integers(0, 64, (height, width // 4 + 1)), 4, axis=1)
+    image[:, ::5] = rng.integers(0, 256, (height, len(image[0, ::5])))
+    return image[:, :width].astype(np.uint8)
+
+
+def rgba_image(height=45, width=37, seed=1):
+    rng = np.random.default_rng(seed)
+    gradient = np.add.outer(np.arange(height), np.arange(width)) % 256
+    image = np.stack([gradient, gradient[::-1], rng.integers(0, 256, gradient.shape)])
+    alpha = np.where(rng.random(gradient.shape) < 0.2, 0, 255)
+    return np.dstack([*image, alpha]).astype(np.uint8)
+
+
+def palette():
+    image = Image.new("P", (1, 1))
+    image.putpalette(
+        [
+            (index * 7 + channel * 40) % 256
+            for index in range(256)
+            for channel in range(3)
+        ]
+    )
+    return Palette.from_image(image)
+
+
+def encode(writer, image, pal=None):
+    file = io.BytesIO()
+    writer.write(file, image, pal)
+    return file.getvalue()
+
+
+def chunks(data):
+    """Type and content of every chunk of a png file"""
+    assert data.startswith(PNG_SIGNATURE)
+    pos = len(PNG_SIGNATURE)
+    found = []
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        chunk_type, content = data[pos + 4 : pos + 8], data[pos + 8 : pos + 8 + length]
+        (crc,) = struct.unpack(">I", data[pos + 8 + length : pos + 12 + length])
+        assert crc == zlib.crc32(chunk_type + content)
+        found.append((chunk_type, content))
+        pos += 12 + length
+
+    return found
+
+
+def decoded_rows(data):
+    """Filtered rows of a png file, inflated with zlib"""
+    return zlib.decompress(
+        b"".join(content for kind, content in chunks(data) if kind == b"IDAT")
+    )
+
+
+@pytest.mark.parametrize("png_filter", PNG_FILTERS + [ADAPTIVE])
+@pytest.mark.parametrize("level", [0, 1, 6, 9])
+@pytest.mark.parametrize("chunk_size", [1, 100, 1 << 20])
+def test_rgba_images(png_filter, level, chunk_size):
+    image = rgba_image()
+    data = encode(PngWriter(level, png_filter, jobs=4, chunk_size=chunk_size), image)
+
+    with Image.open(io.BytesIO(data)) as decoded:
+        assert decoded.mode == "RGBA"
+        assert (np.array(decoded) == image).all()
+
+    rows = decoded_rows(data)
+    assert len(rows) == image.shape[0] * (image.shape[1] * 4 + 1)
+    filters = rows[:: image.shape[1] * 4 + 1]
+    if png_filter != ADAPTIVE:
+        assert set(filters) == {PNG_FILTERS.index(png_filter)}
+
+
+@pytest.mark.parametrize("png_filter", PNG_FILTERS + [ADAPTIVE, None])
+@pytest.mark.parametrize("chunk_size", [1, 150, 1 << 20])
+def test_indexed_images(png_filter, chunk_size):
+    image, pal = indexed_image(), palette()
+    data = encode(PngWriter(6, png_filter, jobs=3, chunk_size=chunk_size), image, pal)
+
+    with Image.open(io.BytesIO(data)) as decoded:
+        assert decoded.mode == "P"
+        assert (np.array(decoded) == image).all()
+        assert decoded.getpalette() == pal.palette.ravel().tolist()
+
+    rows = decoded_rows(data)
+    assert len(rows) == image.shape[0] * (image.shape[1] + 1)
+    if png_filter is None:
+        assert set(rows[:: image.shape[1] + 1]) == {0}
+
+
+@pytest.mark.parametrize("png_filter", PNG_FILTERS + [ADAPTIVE])
+def test_grayscale_images(png_filter):
+    image = indexed_image(seed=2)
+    data = encode(PngWriter(9, png_filter, chunk_size=64), image)
+
+    with Image.open(io.BytesIO(data)) as decoded:
+        assert decoded.mode == "L"
+        assert (np.array(decoded) == image).all()
+
+
+def test_ranges_get_their_own_chunks():
+    image = indexed_image(height=40)
+    data = encode(PngWriter(chunk_size=image.shape[1] * 10), image)
+    assert [kind for kind, _ in chunks(data)].count(b"IDAT") == 4
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (1, 300), (300, 1), (0, 5)])
+def test_image_sizes(shape):
+    image = np.arange(np.prod(shape), dtype=np.uint8).reshape(shape)
+    data = encode(PngWriter(chunk_size=16), image)
+    if not image.size:
+        assert len(decoded_rows(data)) == shape[0]
+        return
+
+    with Image.open(io.BytesIO(data)) as decoded:
+        assert (np.array(decoded) == image).all()
+
+
+def test_output_doesnt_depend_on_threads():
+    image = rgba_image(height=120)
+    outputs = {
+        encode(PngWriter(png_filter=ADAPTIVE, jobs=jobs, chunk_size=500), image)
+        for jobs in (1, 2, 7)
+    }
+    assert len(outputs) == 1
+
+
+def test_adler32_combine():
+    data = bytes(range(256)) * 300
+    for split in (0, 1, 5552, 20000, len(data)):
+        first, second = data[:split], data[split:]
+        assert _adler32_combine(
+            zlib.adler32(first), zlib.adler32(second), len(second)
+        ) == zlib.adler32(data)
+
+
+def test_invalid_options():
+    with pytest.raises(MapBuilderError):
+        PngWriter(level=10)
+    with pytest.raises(MapBuilderError):
+        PngWriter(png_filter="median")
+
+
+def test_raw_and_npy_writers():
+    image = rgba_image()
+    assert encode(RawWriter(), image) == image.tobytes()
+    assert (np.load(io.BytesIO(encode(NpyWriter(), image))) == image).all()
+
+
+def test_save_image_skips_unchanged_images(tmp_path):
+    path = tmp_path / "image.png"
+    image, pal = indexed_image(), palette()
+
+    assert save_image(path, image, pal)
+    assert not save_image(path, image, pal)
+    assert save_image(path, image, pal, PngWriter(level=9))
+    with Image.open(path) as decoded:
+        assert (np.array(decoded) == image).all()
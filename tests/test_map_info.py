@@ -0,0 +1,55 @@
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from mdutil.core import inspect_map
+
+MAP = """<?xml version="1.0" encoding="UTF-8"?>
+<map version="1.10" orientation="orthogonal" renderorder="right-down" width="4"
+ height="3" tilewidth="8" tileheight="8" infinite="0">
+ <tileset firstgid="1" name="ts" tilewidth="8" tileheight="8" tilecount="4"
+  columns="2">
+  <image source="ts.png" width="16" height="16"/>
+ </tileset>
+ <layer id="1" name="lo" width="4" height="3">
+  <data encoding="csv">{}</data>
+ </layer>
+</map>
+"""
+
+
+def save_map(folder, gids):
+    image = Image.fromarray(np.zeros((16, 16), dtype=np.uint8), mode="P")
+    image.putpalette([0] * 768)
+    image.save(folder / "ts.png")
+
+    path = folder / "map.tmx"
+    path.write_text(MAP.format(",".join(str(gid) for gid in gids)))
+    return path
+
+
+def test_tile_usage(tmp_path):
+    path = save_map(tmp_path, [0, 1, 1, 2, 4, 4, 4, 0, 0, 0, 0, 0])
+    layer = inspect_map(path).layers[0]
+
+    assert layer.cells == 6
+    assert layer.used_tiles == 3
+    assert layer.tileset_tiles == {"ts": 3}
+    assert layer.unknown_cells == 0
+    assert layer.empty_ratio == 0.5
+
+
+def test_stray_gids_are_counted_without_sizing_the_counts(tmp_path):
+    path = save_map(tmp_path, [1, 5, 200000000, 200000000, 7, 0, 0, 0, 0, 0, 0, 0])
+
+    tracemalloc.start()
+    layer = inspect_map(path).layers[0]
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert peak < 16 << 20
+    assert layer.cells == 5
+    assert layer.used_tiles == 4
+    assert layer.tileset_tiles == {"ts": 1}
+    assert layer.unknown_cells == 4
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from mdutil.core import MapBuilderError
+from mdutil.core.plane_stream import PlaneStreamBuilder
+from mdutil.core.util import Size
+
+
+def builder(plane_size=Size(32, 64)):
+    # The strips don't depend on the map, only on the tilemap given to them
+    stream = PlaneStreamBuilder.__new__(PlaneStreamBuilder)
+    stream.plane_size = plane_size
+    return stream
+
+
+def test_column_strips():
+    tilemap = np.arange(40 * 70, dtype=np.uint16).reshape(40, 70)
+    strips = builder().strips(tilemap, columns=True)
+
+    assert (strips.words == tilemap.T).all()
+    assert strips.increment == 128
+    # Columns of 40 cells wrap once around a 32 row plane
+    assert strips.index[1].tolist() == [2, 2]
+    assert strips.segments[2].tolist() == [40 * 2, 32, 2]
+    assert strips.segments[3].tolist() == [40 * 2 + 64, 8, 2]
+
+
+def test_row_strips():
+    tilemap = np.arange(40 * 70, dtype=np.uint16).reshape(40, 70)
+    strips = builder().strips(tilemap, columns=False)
+
+    assert strips.increment == 2
+    assert strips.index[33].tolist() == [66, 2]
+    assert strips.segments[66].tolist() == [33 * 70 * 2, 64, 1 * 64 * 2]
+    assert strips.segments[67].tolist() == [33 * 70 * 2 + 128, 6, 1 * 64 * 2]
+
+
+def test_index_overflow_is_rejected():
+    # 1024 columns wrapping 64 times around a 32 row plane
+    tilemap = np.zeros((2048, 1024), dtype=np.uint16)
+    with pytest.raises(MapBuilderError):
+        builder().strips(tilemap, columns=True)
+
+    # 1024 columns wrapping 63 times still fit
+    tilemap = np.zeros((2016, 1024), dtype=np.uint16)
+    strips = builder().strips(tilemap, columns=True)
+    assert strips.index[-1].tolist() == [1023 * 63, 63]
@@ -0,0 +1,39 @@
+import numpy as np
+from PIL import Image
+
+from mdutil.core.img.palette import PaletteAllocator
+from mdutil.core.img.tileset import TilesetImage
+from mdutil.core.util import Size
+
+MARGIN = 1
+SPACING = 2
+
+
+def save_tileset(path, lines, gutter_color):
+    """Indexed tileset with a tile per palette line, surrounded by gutter pixels"""
+    size = MARGIN * 2 + len(lines) * 8 + (len(lines) - 1) * SPACING
+    pixels = np.full((MARGIN * 2 + 8, size), gutter_color, dtype=np.uint8)
+    for index, line in enumerate(lines):
+        x = MARGIN + index * (8 + SPACING)
+        pixels[MARGIN : MARGIN + 8, x : x + 8] = line * 16 + 1 + np.arange(8) % 15
+
+    image = Image.fromarray(pixels, mode="P")
+    image.putpalette(list(range(256)) * 3)
+    image.save(path)
+
+
+def test_used_lines_skip_margin_and_spacing(tmp_path):
+    path = tmp_path / "tileset.png"
+    save_tileset(path, [0, 1], gutter_color=3 * 16 + 5)
+
+    tileset = TilesetImage(Size(8, 8), path, MARGIN, SPACING)
+    assert tileset.used_lines() == [0, 1]
+
+
+def test_gutter_colors_dont_take_palette_lines(tmp_path):
+    path = tmp_path / "tileset.png"
+    save_tileset(path, [0, 1, 2, 3], gutter_color=5 * 16 + 5)
+
+    tileset = TilesetImage(Size(8, 8), path, MARGIN, SPACING)
+    lut = PaletteAllocator().add(tileset.palette, tileset.used_lines())
+    assert (lut[:64] == np.arange(64)).all()